@@ -0,0 +1,639 @@
+"""
+Asynchronous client for the IONOS Cloud DNS API.
+
+Calls are sent with httpx over HTTP/2, so that the concurrent record
+operations of a batch are multiplexed over a single connection. This module
+needs the ``async`` extra: ``pip install certbot-dns-ionos-cloud[async]``.
+"""
+
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar, cast
+
+import httpx
+from certbot import errors
+from certbot.plugins import dns_common
+
+from certbot_dns_ionos_cloud import plan, throttle, tokens
+from certbot_dns_ionos_cloud.ionos import (
+    CHALLENGE_PREFIX,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_PROVISIONING_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    _created_records,
+    _group_by_zone,
+    _handle_response,
+    _is_txt_record,
+    _known_deletes,
+    _merge_writes,
+    _merge_zone_results,
+    _new_txt_record,
+    _NotFoundError,
+    _page_params,
+    _ProvisioningWait,
+    _raise_failures,
+    _raise_token_failures,
+    _read_page,
+    _record_call,
+    _records_filter,
+    _resolved_zones,
+    _Retries,
+    _split_by_token,
+    _split_stale,
+    _Write,
+    _ZoneIndex,
+    dns_api_base_url,
+)
+from certbot_dns_ionos_cloud.metrics import Metrics
+from certbot_dns_ionos_cloud.zone_cache import ZoneCache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _AsyncIONOSClient(object):
+    """
+    Asynchronous counterpart of `_IONOSClient`, with the same batch operations.
+
+    All coroutines of a client must run on the same event loop. At most
+    ``max_concurrency`` calls are in flight at once. The logic that does no
+    I/O is shared with `_IONOSClient`, only the calls are sent differently.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = dns_api_base_url,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: tuple[float, float] = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+        zone_cache: ZoneCache | None = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        provisioning_timeout: float = DEFAULT_PROVISIONING_TIMEOUT,
+        max_retries: int = throttle.DEFAULT_MAX_RETRIES,
+        rate_limit: float = 0,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        metrics: Metrics | None = None,
+        record_prefix: str = CHALLENGE_PREFIX,
+        zone_relist_interval: float | None = None,
+    ):
+        logger.debug("creating asynchronous IONOS Client")
+        self.base_url = base_url.rstrip("/")
+        self.provisioning_timeout = provisioning_timeout
+        self.max_retries = max_retries
+        self._rate_limiter = throttle.TokenBucket(rate_limit) if rate_limit > 0 else None
+        self.retry_count = 0
+        self.throttle_seconds = 0.0
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.zone_cache = zone_cache if zone_cache is not None else ZoneCache()
+        self.page_size = page_size
+        self.record_prefix = record_prefix
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._zone_index = _ZoneIndex(zone_relist_interval)
+        self._zone_items: AsyncIterator[dict] | None = None
+        self._zone_lock = asyncio.Lock()
+        self.session = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+            limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size
+            ),
+            http2=True,
+        )
+
+    @property
+    def zone_relist_interval(self) -> float | None:
+        return self._zone_index.relist_interval
+
+    async def aclose(self) -> None:
+        await self.session.aclose()
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        retry_check: Callable[[], Awaitable[Any]] | None = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Send a request to the IONOS API, retrying transient failures.
+
+        See `_IONOSClient._request`.
+        """
+        started = time.perf_counter()
+        retries = _Retries(method, path, self.max_retries, retry_check is not None)
+        resp = None
+        try:
+            while True:
+                if self._rate_limiter is not None:
+                    waited = self._rate_limiter.reserve()
+                    if waited:
+                        self.throttle_seconds += waited
+                        logger.debug("throttled %s %s for %.2fs", method, path, waited)
+                        await asyncio.sleep(waited)
+
+                resp = None
+                error = None
+                try:
+                    async with self._semaphore:
+                        resp = await self.session.request(
+                            method, f"{self.base_url}{path}", **kwargs
+                        )
+                except httpx.HTTPError as e:
+                    error = errors.PluginError(
+                        "Error communicating with IONOS API: {0}".format(e)
+                    )
+                else:
+                    if resp.status_code not in throttle.RETRYABLE_STATUS_CODES:
+                        return _handle_response(resp)
+
+                delay = retries.next_delay(resp, error)
+                if delay is None:
+                    if error is not None:
+                        raise error
+                    return _handle_response(resp)
+                self.retry_count += 1
+                await asyncio.sleep(delay)
+
+                if retry_check is not None:
+                    applied = await retry_check()
+                    if applied is not None:
+                        logger.debug(
+                            "%s %s was already applied, not retrying", method, path
+                        )
+                        return applied
+        finally:
+            _record_call(self.metrics, retries, resp, started, kwargs.get("json"))
+
+    async def add_txt_records(
+        self, challenges: list[tuple[str, str, str]]
+    ) -> dict[tuple[str, str, str], tuple[str, str]]:
+        """
+        Add the TXT records of many challenges at once.
+
+        See `_IONOSClient.add_txt_records`.
+        """
+        written = await self._apply(challenges, self._plan_add)
+        if self.provisioning_timeout > 0:
+            with self.metrics.phase("provisioning_wait"):
+                await self._wait_for_provisioning(written)
+        return _created_records(written)
+
+    async def del_txt_records(
+        self,
+        challenges: list[tuple[str, str, str]],
+        created: dict[tuple[str, str, str], tuple[str, str]] | None = None,
+    ) -> None:
+        """
+        Delete the TXT records of many challenges at once.
+
+        See `_IONOSClient.del_txt_records`.
+        """
+        known, remaining = _known_deletes(challenges, created, self._delete_record)
+        await self._apply(remaining, self._plan_delete, known)
+
+    async def plan_txt_records(
+        self, challenges: list[tuple[str, str, str]], action: str = plan.CREATE
+    ) -> list[plan.Change]:
+        """
+        Compute the writes of a batch without making them, e.g. for a dry run.
+
+        See `_IONOSClient.plan_txt_records`.
+        """
+        zones = await self.resolve_zones([challenge[0] for challenge in challenges])
+        failures: list[tuple[tuple[str, str, str], errors.PluginError]] = []
+        groups = _group_by_zone(challenges, zones, failures)
+        results = await self._gather(
+            [
+                partial(self._plan_zone, *zone, group, action)
+                for zone, group in groups.items()
+            ]
+        )
+        changes = _merge_zone_results(groups, results, failures)
+        _raise_failures(failures)
+        return changes
+
+    async def _plan_add(
+        self, zone_id: str, zone_name: str, challenges: list[tuple[str, str, str]]
+    ) -> list[_Write]:
+        changes = await self._plan_zone(zone_id, zone_name, challenges, plan.CREATE)
+        return [self._write_for(change) for change in changes]
+
+    async def _plan_delete(
+        self, zone_id: str, zone_name: str, challenges: list[tuple[str, str, str]]
+    ) -> list[_Write]:
+        changes = await self._plan_zone(zone_id, zone_name, challenges, plan.DELETE)
+        return [self._write_for(change) for change in changes]
+
+    async def _plan_zone(
+        self,
+        zone_id: str,
+        zone_name: str,
+        challenges: list[tuple[str, str, str]],
+        action: str,
+    ) -> list[plan.Change]:
+        index = plan.RecordIndex(self.record_prefix)
+        names = [plan.relative_record_name(c[1], zone_name) for c in challenges]
+        for name_filter in plan.name_filters(names):
+            async for record_item in self.iter_records(zone_id, name_filter):
+                index.add(zone_id, record_item)
+        return plan.plan_changes(index, zone_id, zone_name, challenges, action)
+
+    def _write_for(self, change: plan.Change) -> _Write:
+        if change.action == plan.CREATE:
+            call = partial(
+                self._insert_txt_record, change.zone_id, change.name, change.content
+            )
+        else:
+            call = partial(self._delete_record, change.zone_id, change.record_id)
+        return _Write(change.challenge, change.zone_id, call)
+
+    async def _apply(
+        self,
+        challenges: list[tuple[str, str, str]],
+        planner: Callable[
+            [str, str, list[tuple[str, str, str]]], Awaitable[list[_Write]]
+        ],
+        writes: list[_Write] | None = None,
+    ) -> list[tuple[_Write, Any]]:
+        """
+        Plan the writes for every zone of the challenges, then run them.
+
+        See `_IONOSClient._apply`.
+        """
+        written, failures = await self._apply_once(
+            challenges, planner, use_cache=True, writes=writes or []
+        )
+        stale, failures = _split_stale(failures)
+        if stale:
+            logger.debug("retrying %d challenges with stale zones", len(stale))
+            for domain, _, _ in stale:
+                self.zone_cache.invalidate(domain)
+            self._reset_zone_index()
+            retried, failures_after_retry = await self._apply_once(
+                stale, planner, use_cache=False, writes=[]
+            )
+            written += retried
+            failures += failures_after_retry
+        self.zone_cache.save()
+        _raise_failures(failures)
+        return written
+
+    async def _apply_once(
+        self,
+        challenges: list[tuple[str, str, str]],
+        planner: Callable[
+            [str, str, list[tuple[str, str, str]]], Awaitable[list[_Write]]
+        ],
+        use_cache: bool,
+        writes: list[_Write],
+    ) -> tuple[
+        list[tuple[_Write, Any]], list[tuple[tuple[str, str, str], errors.PluginError]]
+    ]:
+        failures: list[tuple[tuple[str, str, str], errors.PluginError]] = []
+        with self.metrics.phase("zone_resolution"):
+            zones = await self.resolve_zones(
+                [challenge[0] for challenge in challenges], use_cache
+            )
+        groups = _group_by_zone(challenges, zones, failures)
+
+        with self.metrics.phase("record_lookup"):
+            plans = await self._gather(
+                [partial(planner, *zone, group) for zone, group in groups.items()]
+            )
+        writes = writes + _merge_zone_results(groups, plans, failures)
+
+        with self.metrics.phase("write"):
+            results = await self._gather([write.call for write in writes])
+        return _merge_writes(writes, results, failures), failures
+
+    @staticmethod
+    async def _gather(
+        calls: list[Callable[[], Awaitable[T]]],
+    ) -> list[tuple[T | None, errors.PluginError | None]]:
+        """
+        Run coroutines concurrently and collect their results in order.
+
+        :returns: A (result, error) pair per call.
+        :rtype: list
+        """
+
+        async def run(call: Callable[[], Awaitable[T]]) -> tuple[T | None, Any]:
+            try:
+                return await call(), None
+            except errors.PluginError as e:
+                return None, e
+
+        return list(await asyncio.gather(*(run(call) for call in calls)))
+
+    async def _wait_for_provisioning(self, written: list[tuple[_Write, Any]]) -> None:
+        """
+        Wait until the API reports all written records as provisioned.
+
+        See `_IONOSClient._wait_for_provisioning`.
+        """
+        wait = _ProvisioningWait(written, self.provisioning_timeout, self.record_prefix)
+        delay = wait.next_delay()
+        while delay is not None:
+            await asyncio.sleep(delay)
+            results = await self._gather(
+                [
+                    partial(self._poll_provisioning_states, wait, zone_id, name_filters)
+                    for zone_id, name_filters in wait.polls()
+                ]
+            )
+            for _, error in results:
+                if error is not None:
+                    raise error
+            delay = wait.next_delay()
+
+    async def _poll_provisioning_states(
+        self, wait: _ProvisioningWait, zone_id: str, name_filters: list[str]
+    ) -> None:
+        for name_filter in name_filters:
+            async for record in self.iter_records(zone_id, name_filter):
+                if not wait.check(zone_id, record):
+                    return
+
+    async def delete_records(
+        self, records: list[tuple[str, str]]
+    ) -> list[errors.PluginError | None]:
+        """
+        Delete records by ID, concurrently.
+
+        See `_IONOSClient.delete_records`.
+        """
+        return [
+            error
+            for _, error in await self._gather(
+                [partial(self._delete_record, *record) for record in records]
+            )
+        ]
+
+    async def check_token(self) -> None:
+        """
+        Check with a single call that the API accepts the token.
+
+        :raises certbot.errors.PluginError: if the call fails.
+        """
+        try:
+            await self._request("GET", "/zones", params=_page_params({}, 0, 1))
+        except errors.PluginError as e:
+            raise errors.PluginError(
+                "Could not access the IONOS API with the token: {0}".format(e)
+            )
+
+    async def resolve_zones(
+        self, domains: list[str], use_cache: bool = True
+    ) -> dict[str, tuple[str, str] | errors.PluginError]:
+        """
+        Resolve the zones of many domains concurrently.
+
+        See `_IONOSClient.resolve_zones`.
+        """
+        domains = sorted(set(domains))
+        results = await self._gather(
+            [partial(self._resolve_zone, domain, use_cache) for domain in domains]
+        )
+        return _resolved_zones(domains, results)
+
+    async def _resolve_zone(self, domain: str, use_cache: bool = True) -> tuple[str, str]:
+        if use_cache:
+            cached = self.zone_cache.get(domain)
+            if cached is not None:
+                return cached
+
+        zone = await self._find_zone(domain)
+        if zone is None:
+            raise errors.PluginError("Domain not known")
+        logger.debug("domain found: %s in zone %s with id: %s", domain, zone[1], zone[0])
+        self.zone_cache.set(domain, *zone)
+        return zone
+
+    async def _find_zone(self, domain: str) -> tuple[str, str] | None:
+        """
+        Find the zone for a given domain.
+
+        See `_IONOSClient._find_zone`.
+        """
+        zone = await self._find_indexed_zone(domain)
+        if zone is None and self._zone_index.is_stale():
+            logger.debug("%s is not in the listed zones, listing them again", domain)
+            async with self._zone_lock:
+                self._reset_zone_index()
+            zone = await self._find_indexed_zone(domain)
+        return zone
+
+    async def _find_indexed_zone(self, domain: str) -> tuple[str, str] | None:
+        guesses = dns_common.base_domain_name_guesses(domain)
+        async with self._zone_lock:
+            try:
+                while self._zone_index.needs_listing(guesses):
+                    if self._zone_items is None:
+                        self._zone_items = self.iter_zones()
+                    zone_item = await anext(self._zone_items, None)
+                    if zone_item is None:
+                        self._zone_items = None
+                        self._zone_index.finish()
+                    else:
+                        self._zone_index.add(zone_item)
+            except Exception:
+                # see `_IONOSClient._find_indexed_zone`
+                self._reset_zone_index()
+                raise
+        return self._zone_index.find(guesses)
+
+    def _reset_zone_index(self) -> None:
+        self._zone_index.reset()
+        self._zone_items = None
+
+    def iter_zones(self, zone_name: str | None = None) -> AsyncIterator[dict]:
+        """
+        Iterate over the zones of the account, fetching pages lazily.
+
+        :param str zone_name: Only list zones whose name contains this value.
+        """
+        params = {"filter.zoneName": zone_name} if zone_name else {}
+        return self._paginate("/zones", params)
+
+    def iter_records(
+        self, zone_id: str | None = None, name: str | None = None
+    ) -> AsyncIterator[dict]:
+        """
+        Iterate over DNS records, fetching pages lazily.
+
+        :param str zone_id: Only list records of this zone.
+        :param str name: Only list records whose name contains this value.
+        """
+        return self._paginate("/records", _records_filter(zone_id, name))
+
+    async def get_nameservers(self, domain: str) -> list[str]:
+        """
+        Get the authoritative nameservers of the zone managing a domain.
+
+        :param str domain: The domain.
+        :returns: The host names of the nameservers, as reported by the API.
+        :rtype: list
+        :raises certbot.errors.PluginError: if the zone cannot be found.
+        """
+        zone_id, _ = await self._resolve_zone(domain)
+        if zone_id not in self._zone_index.nameservers:
+            self._zone_index.remember_nameservers(
+                await self._request("GET", f"/zones/{zone_id}")
+            )
+        return self._zone_index.nameservers.get(zone_id, [])
+
+    async def _paginate(self, path: str, params: dict) -> AsyncIterator[dict]:
+        offset: int | None = 0
+        while offset is not None:
+            response = await self._request(
+                "GET", path, params=_page_params(params, offset, self.page_size)
+            )
+            items, offset = _read_page(response, offset, self.page_size)
+            for item in items:
+                yield item
+
+    async def _delete_record(self, zone_id: str, record_id: str) -> None:
+        logger.debug("delete TXT record: %s", record_id)
+        try:
+            await self._request("DELETE", f"/zones/{zone_id}/records/{record_id}")
+        except _NotFoundError:
+            logger.debug("TXT record %s is already gone", record_id)
+
+    async def _insert_txt_record(
+        self, zone_id: str, record_name: str, record_content: str
+    ) -> Any:
+        new_record = _new_txt_record(record_name, record_content)
+
+        async def find_created() -> dict | None:
+            async for record in self.iter_records(zone_id, record_name):
+                if _is_txt_record(record, record_name, record_content):
+                    return record
+            return None
+
+        created = await self._request(
+            "POST",
+            f"/zones/{zone_id}/records",
+            retry_check=find_created,
+            json=new_record,
+        )
+        logger.debug("create with payload: %s", new_record)
+        return created
+
+
+class _AsyncTokenRoutedClient(object):
+    """
+    Spreads the operations of a batch over one asynchronous client per token.
+
+    See `_TokenRoutedClient`.
+    """
+
+    def __init__(
+        self, clients: dict[str, _AsyncIONOSClient], routes: list[tokens.TokenRoute]
+    ):
+        self.clients = clients
+        self.routes = routes
+        self.zone_cache = clients[tokens.DEFAULT_LABEL].zone_cache
+
+    @property
+    def retry_count(self) -> int:
+        return sum(client.retry_count for client in self.clients.values())
+
+    @property
+    def throttle_seconds(self) -> float:
+        return sum(client.throttle_seconds for client in self.clients.values())
+
+    async def aclose(self) -> None:
+        for client in self.clients.values():
+            await client.aclose()
+
+    def client_for(self, domain: str) -> _AsyncIONOSClient:
+        return self.clients[tokens.route_domain(self.routes, domain)]
+
+    async def check_token(self) -> None:
+        await self._each(
+            {label: client.check_token for label, client in self.clients.items()}
+        )
+
+    async def resolve_zones(
+        self, domains: list[str], use_cache: bool = True
+    ) -> dict[str, tuple[str, str] | errors.PluginError]:
+        resolved: dict[str, tuple[str, str] | errors.PluginError] = {}
+        groups = _split_by_token(self.routes, domains, lambda domain: domain)
+        for zones in (
+            await self._each(
+                {
+                    label: partial(self.clients[label].resolve_zones, group, use_cache)
+                    for label, group in groups.items()
+                }
+            )
+        ).values():
+            resolved.update(zones)
+        return resolved
+
+    async def get_nameservers(self, domain: str) -> list[str]:
+        return await self.client_for(domain).get_nameservers(domain)
+
+    async def add_txt_records(
+        self, challenges: list[tuple[str, str, str]]
+    ) -> dict[tuple[str, str, str], tuple[str, str]]:
+        created: dict[tuple[str, str, str], tuple[str, str]] = {}
+        groups = _split_by_token(self.routes, challenges, lambda c: c[0])
+        for records in (
+            await self._each(
+                {
+                    label: partial(self.clients[label].add_txt_records, group)
+                    for label, group in groups.items()
+                }
+            )
+        ).values():
+            created.update(records)
+        return created
+
+    async def del_txt_records(
+        self,
+        challenges: list[tuple[str, str, str]],
+        created: dict[tuple[str, str, str], tuple[str, str]] | None = None,
+    ) -> None:
+        groups = _split_by_token(self.routes, challenges, lambda c: c[0])
+        await self._each(
+            {
+                label: partial(self.clients[label].del_txt_records, group, created)
+                for label, group in groups.items()
+            }
+        )
+
+    async def plan_txt_records(
+        self, challenges: list[tuple[str, str, str]], action: str = plan.CREATE
+    ) -> list[plan.Change]:
+        changes: list[plan.Change] = []
+        groups = _split_by_token(self.routes, challenges, lambda c: c[0])
+        for group_changes in (
+            await self._each(
+                {
+                    label: partial(self.clients[label].plan_txt_records, group, action)
+                    for label, group in groups.items()
+                }
+            )
+        ).values():
+            changes.extend(group_changes)
+        return changes
+
+    async def _each(self, calls: dict[str, Callable[[], Awaitable[T]]]) -> dict[str, T]:
+        labels = list(calls)
+        succeeded: dict[str, T] = {}
+        failures = []
+        for label, (result, error) in zip(
+            labels, await _AsyncIONOSClient._gather([calls[label] for label in labels])
+        ):
+            if error is not None:
+                failures.append((label, error))
+            else:
+                succeeded[label] = cast(T, result)
+        _raise_token_failures(failures)
+        return succeeded
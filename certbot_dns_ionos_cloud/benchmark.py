@@ -0,0 +1,256 @@
+"""
+Benchmarks the authenticator against the local fake IONOS Cloud DNS API.
+
+Each scenario runs ``perform`` and ``cleanup`` for a number of SANs spread
+over a number of zones, and reports the API calls, the wall time and the
+peak memory allocated by Python. Run it with::
+
+    python -m certbot_dns_ionos_cloud.benchmark --sans 1,10,100,500 --zones 10
+
+The fake server runs in the same process, so its allocations are part of
+the peak memory. They grow with the number of records in the same way for
+every version of the plugin, so the numbers stay comparable.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+from unittest.mock import patch
+
+import josepy as jose
+from acme import challenges, messages
+from certbot import achallenges
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from certbot_dns_ionos_cloud.fake_api import FakeIONOSServer
+from certbot_dns_ionos_cloud.ionos import Authenticator
+
+DEFAULT_SANS = (1, 10, 100, 500)
+DEFAULT_ZONES = 10
+DEFAULT_LATENCY = 0.01
+PLUGIN_NAME = "dns-ionos-cloud"
+
+
+def plugin_defaults() -> dict[str, Any]:
+    """
+    Collect the default value of every option of the authenticator.
+
+    :returns: The defaults, keyed by the config attribute of the option.
+    :rtype: dict
+    """
+    defaults: dict[str, Any] = {}
+
+    def add(name: str, default: Any = None, **unused_kwargs: Any) -> None:
+        defaults[_config_key(name)] = default
+
+    Authenticator.add_parser_arguments(add)
+    return defaults
+
+
+def build_achalls(
+    domains: list[str], account_key: jose.JWK
+) -> list[achallenges.AnnotatedChallenge]:
+    """
+    Build a pending DNS-01 challenge for every domain.
+
+    :param list domains: The domains to validate.
+    :param account_key: The ACME account key.
+    :returns: The annotated challenges.
+    :rtype: list
+    """
+    achalls: list[achallenges.AnnotatedChallenge] = []
+    for domain in domains:
+        challb = messages.ChallengeBody(
+            chall=challenges.DNS01(token=os.urandom(32)),
+            uri="https://acme.invalid/chall",
+            status=messages.STATUS_PENDING,
+        )
+        achalls.append(
+            achallenges.KeyAuthorizationAnnotatedChallenge(
+                challb=challb,
+                identifier=messages.Identifier(
+                    typ=messages.IDENTIFIER_FQDN, value=domain
+                ),
+                account_key=account_key,
+            )
+        )
+    return achalls
+
+
+def run_scenario(
+    sans: int,
+    zones: int,
+    account_key: jose.JWK,
+    options: dict[str, Any] | None = None,
+    **server_options: Any,
+) -> dict[str, Any]:
+    """
+    Run ``perform`` and ``cleanup`` for one scenario against a fresh server.
+
+    :param int sans: The number of names on the certificate.
+    :param int zones: The number of zones the names are spread over.
+    :param account_key: The ACME account key.
+    :param dict options: Plugin options overriding the defaults, keyed by
+    config attribute.
+    :param server_options: Passed on to `FakeIONOSServer`.
+    :returns: The measurements of the scenario.
+    :rtype: dict
+    """
+    zone_names = [f"zone{i}.example" for i in range(zones)]
+    domains = [f"host{i}.{zone_names[i % zones]}" for i in range(sans)]
+    achalls = build_achalls(domains, account_key)
+
+    with tempfile.TemporaryDirectory() as work_dir, FakeIONOSServer(
+        zone_names, **server_options
+    ) as server:
+        credentials = os.path.join(work_dir, "credentials.ini")
+        with open(credentials, "w") as f:
+            f.write("dns_ionos_cloud_token = benchmark\n")
+        os.chmod(credentials, 0o600)
+
+        config = argparse.Namespace(**plugin_defaults())
+        setattr(config, _config_key("credentials"), credentials)
+        setattr(config, _config_key("endpoint"), server.url)
+        setattr(config, _config_key("propagation-seconds"), 0)
+        config.work_dir = work_dir
+        for key, value in (options or {}).items():
+            setattr(config, key, value)
+        authenticator = Authenticator(config, PLUGIN_NAME)
+
+        tracemalloc.start()
+        try:
+            started = time.perf_counter()
+            authenticator.perform(achalls)
+            performed = time.perf_counter()
+            perform_calls = server.total_calls
+            authenticator.cleanup(achalls)
+            finished = time.perf_counter()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        leftover = sum(len(records) for records in server.records.values())
+
+        return {
+            "sans": sans,
+            "zones": zones,
+            "perform_calls": perform_calls,
+            "cleanup_calls": server.total_calls - perform_calls,
+            "calls": dict(sorted(server.calls.items())),
+            "perform_seconds": round(performed - started, 4),
+            "cleanup_seconds": round(finished - performed, 4),
+            "peak_memory_bytes": peak,
+            "leftover_records": leftover,
+        }
+
+
+def _config_key(option: str) -> str:
+    return f"{PLUGIN_NAME}-{option}".replace("-", "_")
+
+
+def _parse_option(value: str) -> tuple[str, Any]:
+    name, sep, raw = value.partition("=")
+    key = _config_key(name.strip())
+    defaults = plugin_defaults()
+    if not sep or key not in defaults:
+        raise argparse.ArgumentTypeError(f"unknown plugin option: {value}")
+    default = defaults[key]
+    if isinstance(default, bool):
+        return key, raw.lower() in ("1", "true", "yes")
+    if isinstance(default, (int, float)):
+        return key, type(default)(raw)
+    return key, raw
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sans",
+        default=",".join(str(n) for n in DEFAULT_SANS),
+        help="Comma separated numbers of SANs, one scenario each.",
+    )
+    parser.add_argument("--zones", type=int, default=DEFAULT_ZONES)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=DEFAULT_LATENCY,
+        help="Seconds the fake API waits before answering each call.",
+    )
+    parser.add_argument("--max-page-size", type=int, default=1000)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--provisioning-polls", type=int, default=1)
+    parser.add_argument(
+        "-o",
+        "--option",
+        action="append",
+        type=_parse_option,
+        default=[],
+        metavar="NAME=VALUE",
+        help="Override a plugin option, e.g. max-concurrency=8.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args(argv)
+
+    account_key = jose.JWKRSA(
+        key=rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    )
+
+    results = []
+    for sans in (int(n) for n in args.sans.split(",")):
+        # the plugin notifies the user of the propagation wait
+        with patch("certbot.display.util.notify"):
+            result = run_scenario(
+                sans,
+                min(args.zones, sans),
+                account_key,
+                options=dict(args.option),
+                latency=args.latency,
+                max_page_size=args.max_page_size,
+                rate_limit_rate=args.rate_limit_rate,
+                error_rate=args.error_rate,
+                provisioning_polls=args.provisioning_polls,
+            )
+        results.append(result)
+        if not args.json:
+            _print_result(results[-1], header=len(results) == 1)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+def _print_result(result: dict[str, Any], header: bool) -> None:
+    row = "{:>6} {:>6} {:>14} {:>14} {:>12} {:>12} {:>10}"
+    if header:
+        print(
+            row.format(
+                "sans",
+                "zones",
+                "perform calls",
+                "cleanup calls",
+                "perform s",
+                "cleanup s",
+                "peak MiB",
+            )
+        )
+    print(
+        row.format(
+            result["sans"],
+            result["zones"],
+            result["perform_calls"],
+            result["cleanup_calls"],
+            "{:.3f}".format(result["perform_seconds"]),
+            "{:.3f}".format(result["cleanup_seconds"]),
+            "{:.1f}".format(result["peak_memory_bytes"] / 2**20),
+        )
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
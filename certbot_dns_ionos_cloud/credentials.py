@@ -0,0 +1,54 @@
+"""Builds IONOS API clients from the credentials file of the plugin, for the commands."""
+
+from typing import Any
+
+from certbot.plugins import dns_common
+
+from certbot_dns_ionos_cloud import endpoints, tokens
+from certbot_dns_ionos_cloud.ionos import (
+    _IONOSClient,
+    _TokenRoutedClient,
+    dns_api_base_url,
+)
+
+CREDENTIALS_PREFIX = "dns_ionos_cloud_"
+
+
+def client_from_credentials(
+    path: str, endpoint: str | None = None, **options: Any
+) -> _IONOSClient | _TokenRoutedClient:
+    """
+    Build a client from the credentials file of the plugin.
+
+    Like the plugin, the file may route zones to extra tokens, and name the
+    endpoint or candidate endpoints to pick the fastest of.
+
+    :param str path: The credentials INI file.
+    :param str endpoint: The base URL of the API, if not the one of the file.
+    :param options: Passed on to `_IONOSClient`.
+    :returns: A client, routing zones to their token if the file has several.
+    :raises certbot.errors.PluginError: if the file has no token, invalid
+    routes, or no reachable candidate endpoint.
+    """
+    credentials = dns_common.CredentialsConfiguration(
+        path, lambda var: CREDENTIALS_PREFIX + var
+    )
+    credentials.require({"token": "access token for the IONOS API"})
+    token = credentials.conf("token") or ""
+    routes = tokens.token_routes(credentials)
+    candidates = credentials.conf("endpoints")
+    if not endpoint:
+        endpoint = credentials.conf("endpoint")
+    if not endpoint and candidates:
+        endpoint = endpoints.select_endpoint(
+            endpoints.split_candidates(candidates), token
+        )
+
+    options["base_url"] = endpoint or dns_api_base_url
+    client = _IONOSClient(token, **options)
+    if not routes:
+        return client
+    clients = {tokens.DEFAULT_LABEL: client}
+    for route in routes:
+        clients[route.label] = _IONOSClient(route.token, **options)
+    return _TokenRoutedClient(clients, routes)
@@ -0,0 +1,322 @@
+"""
+Keeps an IONOS API client warm between the hook calls of ACME clients.
+
+The daemon listens on a Unix socket for the requests that
+`certbot_dns_ionos_cloud.hook` sends, one JSON object per line. It keeps
+its connection pool, its zone cache and the IDs of the records it created
+between requests, and writes the requests that arrive within a short
+window as a single batch.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from typing import Any
+
+from certbot import errors
+
+from certbot_dns_ionos_cloud import plan
+from certbot_dns_ionos_cloud.credentials import client_from_credentials
+from certbot_dns_ionos_cloud.ionos import (
+    CHALLENGE_PREFIX,
+    _IONOSClient,
+    _TokenRoutedClient,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_WINDOW = 0.2
+ACTIONS = ("add", "delete")
+
+
+class _Pending(object):
+    """A challenge waiting for the batch it is written in."""
+
+    __slots__ = ("challenge", "done", "error")
+
+    def __init__(self, challenge: tuple[str, str, str]):
+        self.challenge = challenge
+        self.done = threading.Event()
+        self.error: errors.PluginError | None = None
+
+
+class HookDaemon(object):
+    """
+    Writes the challenge records requested by hook calls in batches.
+
+    The first request of a batch waits for the batch window, then writes
+    all requests for the same action that arrived in the meantime with a
+    single batch call of the client. The IDs of created records are kept,
+    so that they can be deleted without a lookup.
+
+    :param client: The client to write the records with.
+    :param float batch_window: Seconds to wait for more requests.
+    """
+
+    def __init__(
+        self,
+        client: _IONOSClient | _TokenRoutedClient,
+        batch_window: float = DEFAULT_BATCH_WINDOW,
+    ):
+        self.client = client
+        self.batch_window = batch_window
+        self.created: dict[tuple[str, str, str], tuple[str, str]] = {}
+        self._queues: dict[str, list[_Pending]] = {action: [] for action in ACTIONS}
+        self._queue_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def handle_request(self, request: Any) -> dict[str, Any]:
+        """
+        Answer a hook request.
+
+        :param dict request: The ``action`` (add or delete), the ``domain``
+        and the ``validation`` of a challenge.
+        :returns: ``ok``, and the ``error`` if the request failed.
+        :rtype: dict
+        """
+        if (
+            not isinstance(request, dict)
+            or request.get("action") not in ACTIONS
+            or not isinstance(request.get("domain"), str)
+            or not isinstance(request.get("validation"), str)
+        ):
+            return {"ok": False, "error": "malformed request"}
+        challenge = challenge_for(request["domain"], request["validation"])
+        try:
+            self.submit(request["action"], challenge)
+        except errors.PluginError as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": True}
+
+    def submit(self, action: str, challenge: tuple[str, str, str]) -> None:
+        """
+        Add or delete the TXT record of a challenge, batched with others.
+
+        :param str action: ``add`` or ``delete``.
+        :param tuple challenge: (domain, record name, record content).
+        :raises certbot.errors.PluginError: if the batch failed.
+        """
+        pending = _Pending(challenge)
+        with self._queue_lock:
+            queue = self._queues[action]
+            queue.append(pending)
+            leader = len(queue) == 1
+
+        if leader:
+            if self.batch_window > 0:
+                time.sleep(self.batch_window)
+            with self._queue_lock:
+                batch = self._queues[action]
+                self._queues[action] = []
+            self._write(action, batch)
+
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+
+    def _write(self, action: str, batch: list[_Pending]) -> None:
+        challenges = list(dict.fromkeys(pending.challenge for pending in batch))
+        logger.debug("writing a batch of %d %s requests", len(challenges), action)
+        error: errors.PluginError | None = errors.PluginError("The batch was interrupted")
+        try:
+            with self._write_lock:
+                if action == "add":
+                    self.created.update(self.client.add_txt_records(challenges))
+                else:
+                    self.client.del_txt_records(challenges, self.created)
+                    for challenge in challenges:
+                        self.created.pop(challenge, None)
+            error = None
+        except errors.PluginError as e:
+            # the batch call reports all failures at once, so every request
+            # of the batch gets the same error
+            error = e
+        except Exception as e:
+            logger.exception("writing a batch of %s requests failed", action)
+            error = errors.PluginError(f"Unexpected error: {e!r}")
+        finally:
+            # the other requests of the batch wait for the leader, so they
+            # must be released however the batch ended
+            for pending in batch:
+                pending.error = error
+                pending.done.set()
+
+
+def challenge_for(domain: str, validation: str) -> tuple[str, str, str]:
+    """
+    Build the challenge of a domain as passed by a hook.
+
+    The challenge of a wildcard name is validated at the name it covers.
+
+    :param str domain: The domain, e.g. ``*.example.com``.
+    :param str validation: The content of the TXT record.
+    :returns: (domain, record name, record content)
+    :rtype: tuple
+    """
+    domain = domain.strip(".").lower().removeprefix("*.")
+    return domain, f"{CHALLENGE_PREFIX}.{domain}", validation
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    hook_daemon: HookDaemon
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: _Server
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            response: dict[str, Any] = {"ok": False, "error": "malformed request"}
+        else:
+            response = self.server.hook_daemon.handle_request(request)
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+def make_server(path: str, hook_daemon: HookDaemon) -> _Server:
+    """
+    Bind the Unix socket of a daemon, readable by the current user only.
+
+    A socket file left behind by an earlier daemon is replaced, but neither
+    other files nor the socket of a daemon that still answers.
+
+    :param str path: The path of the socket.
+    :param hook_daemon: The daemon answering the requests.
+    :returns: The server, ready for ``serve_forever``.
+    :raises certbot.errors.PluginError: if the path is taken.
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        pass
+    else:
+        if not stat.S_ISSOCK(mode):
+            raise errors.PluginError(f"{path} exists and is not a socket")
+        if _is_listening(path):
+            raise errors.PluginError(f"Another daemon is listening on {path}")
+        os.remove(path)
+    umask = os.umask(0o177)
+    try:
+        server = _Server(path, _Handler)
+    finally:
+        os.umask(umask)
+    server.hook_daemon = hook_daemon
+    return server
+
+
+def _is_listening(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def run_request(args: Any, request: dict[str, str]) -> dict[str, Any]:
+    """
+    Answer a single hook request without a daemon.
+
+    :param args: The parsed arguments of the hook.
+    :param dict request: The request.
+    :returns: The response.
+    :rtype: dict
+    """
+    try:
+        client = client_from_credentials(args.credentials, args.endpoint)
+    except errors.Error as e:
+        return {"ok": False, "error": str(e)}
+    try:
+        return HookDaemon(client, batch_window=0).handle_request(request)
+    finally:
+        client.close()
+
+
+def print_plan(args: Any) -> int:
+    """
+    Print the records that adding or deleting challenges would write.
+
+    Only zones and records are listed, nothing is written.
+
+    :param args: The parsed arguments of the ``plan`` command of the hook.
+    :returns: The exit code.
+    :rtype: int
+    """
+    validations = (
+        args.validation * len(args.domain)
+        if len(args.validation) == 1
+        else args.validation
+    )
+    challenges = [
+        challenge_for(domain, validation)
+        for domain, validation in zip(args.domain, validations)
+    ]
+    try:
+        client = client_from_credentials(args.credentials, args.endpoint)
+        try:
+            changes = client.plan_txt_records(
+                challenges, plan.DELETE if args.delete else plan.CREATE
+            )
+        finally:
+            client.close()
+    except errors.Error as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    for change in changes:
+        print(change.describe())
+    if not changes:
+        print("No changes")
+    return 0
+
+
+def serve(args: Any) -> int:
+    """
+    Run the daemon until it is interrupted.
+
+    :param args: The parsed arguments of the ``serve`` command of the hook.
+    :returns: The exit code.
+    :rtype: int
+    """
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(levelname)s %(name)s: %(message)s",
+    )
+    try:
+        client = client_from_credentials(
+            args.credentials,
+            args.endpoint,
+            max_concurrency=args.max_concurrency,
+            rate_limit=args.rate_limit,
+            zone_relist_interval=args.zone_relist_seconds,
+        )
+    except errors.Error as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        server = make_server(args.socket, HookDaemon(client, args.batch_window))
+    except errors.Error as e:
+        client.close()
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    logger.info("listening on %s", args.socket)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        client.close()
+    return 0
@@ -0,0 +1,143 @@
+"""Picks the fastest healthy IONOS Cloud DNS API endpoint out of candidates."""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from certbot import errors
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROBE_TIMEOUT = 5
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+
+
+def probe(url: str, token: str, timeout: float = DEFAULT_PROBE_TIMEOUT) -> float | None:
+    """
+    Time a minimal zone listing on an endpoint.
+
+    :param str url: The base URL of the endpoint.
+    :param str token: The API token.
+    :param float timeout: Seconds to wait for the connection and the answer.
+    :returns: The seconds the call took, or None if the endpoint is unhealthy.
+    :rtype: float
+    """
+    started = time.perf_counter()
+    try:
+        resp = requests.get(
+            f"{url.rstrip('/')}/zones",
+            headers={"Authorization": f"Bearer {token}"},
+            params={"offset": 0, "limit": 1},
+            timeout=timeout,
+        )
+    except requests.exceptions.RequestException as e:
+        logger.debug("probing %s failed: %s", url, e)
+        return None
+    elapsed = time.perf_counter() - started
+    if resp.status_code != 200:
+        logger.debug("probing %s failed with status %d", url, resp.status_code)
+        return None
+    logger.debug("%s answered in %.3fs", url, elapsed)
+    return elapsed
+
+
+def split_candidates(value: str | list[str]) -> list[str]:
+    """
+    Split a comma separated list of endpoints, e.g. of an option.
+
+    :param value: The list, already split by configobj if it has a comma.
+    :rtype: list
+    """
+    if isinstance(value, str):
+        # configobj only splits values with a comma into lists
+        value = value.split(",")
+    return [c.strip() for c in value if c.strip()]
+
+
+def select_endpoint(
+    candidates: list[str],
+    token: str,
+    cache_path: str | None = None,
+    ttl: float = DEFAULT_CACHE_TTL,
+    timeout: float = DEFAULT_PROBE_TIMEOUT,
+) -> str:
+    """
+    Pick the candidate endpoint that answers fastest.
+
+    All candidates are probed concurrently. The choice is kept in a cache
+    file for the TTL, as long as the candidates stay the same, so that only
+    the first run in that time pays for the probes.
+
+    :param list candidates: The base URLs of the endpoints.
+    :param str token: The API token.
+    :param str cache_path: The file to cache the choice in, if any.
+    :param float ttl: Seconds to keep the choice.
+    :param float timeout: Seconds to wait for each probe.
+    :returns: The base URL of the fastest healthy endpoint.
+    :rtype: str
+    :raises certbot.errors.PluginError: if no candidate is healthy.
+    """
+    if not candidates:
+        raise errors.PluginError("No IONOS API endpoints to pick from")
+    cached = _load(cache_path, candidates, ttl) if cache_path and ttl > 0 else None
+    if cached is not None:
+        logger.debug("using cached endpoint %s", cached)
+        return cached
+
+    with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+        latencies = list(executor.map(lambda url: probe(url, token, timeout), candidates))
+    healthy = [
+        (latency, url)
+        for url, latency in zip(candidates, latencies)
+        if latency is not None
+    ]
+    if not healthy:
+        raise errors.PluginError(
+            "None of the IONOS API endpoints is reachable: {0}".format(
+                ", ".join(candidates)
+            )
+        )
+    endpoint = min(healthy)[1]
+    logger.info("Using the fastest IONOS API endpoint %s", endpoint)
+    if cache_path and ttl > 0:
+        _save(cache_path, candidates, endpoint)
+    return endpoint
+
+
+def _load(path: str, candidates: list[str], ttl: float) -> str | None:
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable endpoint cache %s: %s", path, e)
+        return None
+    if (
+        not isinstance(entry, dict)
+        or entry.get("candidates") != candidates
+        or entry.get("endpoint") not in candidates
+        or not isinstance(entry.get("ts"), (int, float))
+        or entry["ts"] + ttl < time.time()
+    ):
+        return None
+    return entry["endpoint"]
+
+
+def _save(path: str, candidates: list[str], endpoint: str) -> None:
+    directory = os.path.dirname(path) or "."
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".endpoint")
+        with os.fdopen(fd, "w") as f:
+            json.dump(
+                {"candidates": candidates, "endpoint": endpoint, "ts": time.time()}, f
+            )
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Could not write endpoint cache %s: %s", path, e)
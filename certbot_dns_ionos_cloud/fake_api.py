@@ -0,0 +1,314 @@
+"""A local stand-in for the IONOS Cloud DNS API, used to benchmark the plugin."""
+
+import collections
+import datetime
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_PAGE_SIZE = 100
+NAMESERVERS = ["ns-ic.ui-dns.com", "ns-ic.ui-dns.de", "ns-ic.ui-dns.org"]
+
+_RECORDS_PATH = re.compile(r"^/zones/([^/]+)/records(?:/([^/]+))?$")
+_ZONE_PATH = re.compile(r"^/zones/([^/]+)$")
+
+
+class FakeIONOSServer(object):
+    """
+    Serves the zone and record endpoints of the IONOS Cloud DNS API from memory.
+
+    Every call is counted by method and endpoint. Latency, the maximum page
+    size, failures and asynchronous provisioning can be configured to mimic
+    the behaviour of the real API.
+
+    :param list zones: The names of the zones of the account.
+    :param float latency: Seconds to wait before answering each call.
+    :param int max_page_size: Upper bound for the ``limit`` of listings.
+    :param float rate_limit_rate: Share of calls answered with 429.
+    :param float error_rate: Share of calls answered with 503.
+    :param int provisioning_polls: Number of times a created record is
+    listed as ``PROVISIONING`` before it becomes ``AVAILABLE``.
+    :param int seed: Seed for the injected failures, to make runs repeatable.
+    """
+
+    def __init__(
+        self,
+        zones: list[str],
+        latency: float = 0.0,
+        max_page_size: int = 1000,
+        rate_limit_rate: float = 0.0,
+        error_rate: float = 0.0,
+        provisioning_polls: int = 0,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.max_page_size = max_page_size
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.provisioning_polls = provisioning_polls
+        self.calls: collections.Counter[str] = collections.Counter()
+        self.zones: dict[str, dict] = {}
+        self.records: dict[str, dict[str, dict]] = {}
+        self._polls: dict[str, int] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        for zone_name in zones:
+            self.add_zone(zone_name)
+
+        handler = type("_Handler", (_Handler,), {"fake": self})
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """The base URL to point the client at."""
+        host, port = self._httpd.socket.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def total_calls(self) -> int:
+        """The number of calls received so far."""
+        return sum(self.calls.values())
+
+    def add_zone(self, zone_name: str) -> str:
+        """
+        Add a zone to the account.
+
+        :param str zone_name: The name of the zone.
+        :returns: The ID of the zone.
+        :rtype: str
+        """
+        zone_id = str(uuid.uuid4())
+        self.zones[zone_id] = {
+            "id": zone_id,
+            "type": "zone",
+            "metadata": {"state": "AVAILABLE", "nameservers": list(NAMESERVERS)},
+            "properties": {"zoneName": zone_name, "enabled": True},
+        }
+        self.records[zone_id] = {}
+        return zone_id
+
+    def start(self) -> "FakeIONOSServer":
+        """Serve calls on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving calls and close the listening socket."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeIONOSServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def handle(
+        self, method: str, path: str, query: dict[str, str], body: dict | None
+    ) -> tuple[int, dict | None, dict[str, str]]:
+        """
+        Answer a call.
+
+        :returns: The status code, the JSON body and extra headers.
+        :rtype: tuple
+        """
+        records_match = _RECORDS_PATH.match(path)
+        zone_match = _ZONE_PATH.match(path)
+        endpoint = path
+        if records_match:
+            endpoint = "/zones/{zoneId}/records" + (
+                "/{recordId}" if records_match.group(2) else ""
+            )
+        elif zone_match:
+            endpoint = "/zones/{zoneId}"
+
+        with self._lock:
+            self.calls[f"{method} {endpoint}"] += 1
+            roll = self._random.random()
+        if self.latency:
+            time.sleep(self.latency)
+        if roll < self.rate_limit_rate:
+            return 429, _error(429, "rate limit exceeded"), {"Retry-After": "0"}
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 503, _error(503, "service unavailable"), {}
+
+        with self._lock:
+            if method == "GET" and path == "/zones":
+                return 200, self._list_zones(query), {}
+            if method == "GET" and path == "/records":
+                return 200, self._list_records(query), {}
+            if method == "GET" and zone_match and zone_match.group(1) in self.zones:
+                return 200, self.zones[zone_match.group(1)], {}
+            if records_match and records_match.group(1) in self.records:
+                return self._write_record(
+                    method, records_match.group(1), records_match.group(2), body
+                )
+        return 404, _error(404, "not found"), {}
+
+    def _list_zones(self, query: dict[str, str]) -> dict:
+        zone_name = query.get("filter.zoneName")
+        items = [
+            zone
+            for zone in self.zones.values()
+            if not zone_name or zone_name in zone["properties"]["zoneName"]
+        ]
+        return self._page("/zones", items, query)
+
+    def _list_records(self, query: dict[str, str]) -> dict:
+        zone_id = query.get("filter.zoneId")
+        name = query.get("filter.name", "")
+        items = [
+            record
+            for zone_records in (
+                [self.records.get(zone_id, {})] if zone_id else self.records.values()
+            )
+            for record in zone_records.values()
+            if name in record["properties"]["name"]
+        ]
+        return self._page("/records", items, query, visit=self._advance_provisioning)
+
+    def _advance_provisioning(self, record: dict) -> None:
+        polls = self._polls.get(record["id"])
+        if polls is None:
+            return
+        if polls <= 0:
+            record["metadata"]["state"] = "AVAILABLE"
+            del self._polls[record["id"]]
+        else:
+            self._polls[record["id"]] = polls - 1
+
+    def _write_record(
+        self, method: str, zone_id: str, record_id: str | None, body: dict | None
+    ) -> tuple[int, dict | None, dict[str, str]]:
+        zone_records = self.records[zone_id]
+        if method == "POST" and record_id is None:
+            record = self._new_record(zone_id, (body or {}).get("properties") or {})
+            zone_records[record["id"]] = record
+            return 202, record, {}
+        if record_id not in zone_records:
+            return 404, _error(404, "record not found"), {}
+        if method == "PUT":
+            zone_records[record_id]["properties"].update(
+                (body or {}).get("properties") or {}
+            )
+            return 202, zone_records[record_id], {}
+        if method == "DELETE":
+            del zone_records[record_id]
+            self._polls.pop(record_id, None)
+            return 202, None, {}
+        return 404, _error(404, "not found"), {}
+
+    def _new_record(self, zone_id: str, properties: dict) -> dict:
+        record_id = str(uuid.uuid4())
+        zone_name = self.zones[zone_id]["properties"]["zoneName"]
+        name = properties.get("name", "")
+        state = "PROVISIONING" if self.provisioning_polls > 0 else "AVAILABLE"
+        if self.provisioning_polls > 0:
+            self._polls[record_id] = self.provisioning_polls - 1
+        return {
+            "id": record_id,
+            "type": "record",
+            "metadata": {
+                "state": state,
+                "zoneId": zone_id,
+                "fqdn": f"{name}.{zone_name}" if name else zone_name,
+                "createdDate": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            },
+            "properties": {
+                "name": name,
+                "type": properties.get("type", "TXT"),
+                "content": properties.get("content", ""),
+                "ttl": properties.get("ttl", 3600),
+                "enabled": True,
+            },
+        }
+
+    def _page(
+        self,
+        path: str,
+        items: list[dict],
+        query: dict[str, str],
+        visit: Callable[[dict], None] | None = None,
+    ) -> dict:
+        offset = int(query.get("offset", 0))
+        limit = min(int(query.get("limit", DEFAULT_PAGE_SIZE)), self.max_page_size)
+        selected = items[offset:][:limit]
+        if visit is not None:
+            for item in selected:
+                visit(item)
+        # copies, so that later changes do not leak into answers being sent
+        page = [json.loads(json.dumps(item)) for item in selected]
+        links = {"self": f"{path}?offset={offset}&limit={limit}"}
+        if offset + limit < len(items):
+            links["next"] = f"{path}?offset={offset + limit}&limit={limit}"
+        return {
+            "type": "collection",
+            "items": page,
+            "offset": offset,
+            "limit": limit,
+            "_links": links,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeIONOSServer
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_PUT(self) -> None:
+        self._dispatch("PUT")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _dispatch(self, method: str) -> None:
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+
+        status: int
+        body: dict | None
+        headers: dict[str, str]
+
+        if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+            status, body, headers = 401, _error(401, "unauthorized"), {}
+        else:
+            try:
+                parsed = json.loads(raw_body) if raw_body else None
+            except ValueError:
+                status, body, headers = 400, _error(400, "malformed body"), {}
+            else:
+                status, body, headers = self.fake.handle(method, url.path, query, parsed)
+
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def _error(status: int, message: str) -> dict:
+    return {"httpStatus": status, "messages": [{"message": message}]}
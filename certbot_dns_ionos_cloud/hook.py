@@ -0,0 +1,172 @@
+"""
+Adds and deletes a challenge record from the manual hooks of ACME clients.
+
+For certbot, the domain and the validation are taken from the
+``CERTBOT_DOMAIN`` and ``CERTBOT_VALIDATION`` variables::
+
+    export CERTBOT_DNS_IONOS_CLOUD_SOCKET=/run/certbot-dns-ionos-cloud.sock
+    certbot certonly --manual --preferred-challenges dns \\
+        --manual-auth-hook "certbot-dns-ionos-cloud-hook auth" \\
+        --manual-cleanup-hook "certbot-dns-ionos-cloud-hook cleanup"
+
+Other clients can pass ``--domain`` and ``--validation``. With ``--socket``,
+the request is sent to a daemon started with ``serve``, and only the
+standard library is imported, so that each hook call starts quickly. With
+``--credentials`` instead, the record is written by the hook process itself.
+``plan`` prints the records that would be written, with read-only calls.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+SOCKET_VARIABLE = "CERTBOT_DNS_IONOS_CLOUD_SOCKET"
+DEFAULT_TIMEOUT = 300
+
+
+def send(path: str, request: dict, timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """
+    Send a request to the daemon and wait for its response.
+
+    :param str path: The Unix socket of the daemon.
+    :param dict request: The request.
+    :param float timeout: Seconds to wait for the response.
+    :returns: The response.
+    :rtype: dict
+    :raises OSError: if the daemon cannot be reached.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise OSError("the daemon closed the connection without a response")
+    return json.loads(line)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Manual hook and daemon for IONOS Cloud DNS challenge records."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command, help_text in [
+        ("auth", "Add the TXT record of a challenge."),
+        ("cleanup", "Delete the TXT record of a challenge."),
+    ]:
+        hook = commands.add_parser(command, help=help_text)
+        hook.add_argument(
+            "--domain",
+            default=os.environ.get("CERTBOT_DOMAIN"),
+            help="The domain to validate. (Default: $CERTBOT_DOMAIN)",
+        )
+        hook.add_argument(
+            "--validation",
+            default=os.environ.get("CERTBOT_VALIDATION"),
+            help="The content of the TXT record. (Default: $CERTBOT_VALIDATION)",
+        )
+        hook.add_argument(
+            "--socket",
+            default=os.environ.get(SOCKET_VARIABLE),
+            help=f"Unix socket of a running daemon. (Default: ${SOCKET_VARIABLE})",
+        )
+        hook.add_argument(
+            "--credentials",
+            help="Credentials INI file of the dns-ionos-cloud plugin, to write the"
+            + " record without a daemon.",
+        )
+        hook.add_argument("--endpoint")
+        hook.add_argument(
+            "--propagation-seconds",
+            type=float,
+            default=0,
+            help="Seconds to wait after adding the record. (Default: 0)",
+        )
+
+    dry_run = commands.add_parser(
+        "plan", help="Print the records a hook call would write, without writing them."
+    )
+    dry_run.add_argument("--domain", action="append", required=True)
+    dry_run.add_argument(
+        "--validation",
+        action="append",
+        required=True,
+        help="The content of the TXT record, once per domain or once for all.",
+    )
+    dry_run.add_argument(
+        "--delete", action="store_true", help="Plan the cleanup instead of the addition."
+    )
+    dry_run.add_argument("--credentials", required=True)
+    dry_run.add_argument("--endpoint")
+
+    serve = commands.add_parser("serve", help="Run the daemon.")
+    serve.add_argument("--socket", required=True, help="Unix socket to listen on.")
+    serve.add_argument(
+        "--credentials",
+        required=True,
+        help="Credentials INI file of the dns-ionos-cloud plugin.",
+    )
+    serve.add_argument("--endpoint")
+    serve.add_argument(
+        "--batch-window",
+        type=float,
+        default=0.2,
+        help="Seconds to collect requests into one batch. (Default: %(default)s)",
+    )
+    serve.add_argument(
+        "--zone-relist-seconds",
+        type=float,
+        default=60,
+        help="Seconds after which a domain missing from the listed zones lists them"
+        + " again, to find zones created while the daemon runs. (Default: %(default)s)",
+    )
+    serve.add_argument("--max-concurrency", type=int, default=4)
+    serve.add_argument("--rate-limit", type=float, default=0)
+    serve.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command in ("serve", "plan"):
+        from certbot_dns_ionos_cloud import daemon
+
+        if args.command == "plan":
+            if len(args.validation) not in (1, len(args.domain)):
+                parser.error("give one validation, or one per domain")
+            return daemon.print_plan(args)
+        return daemon.serve(args)
+
+    if not args.domain or not args.validation:
+        parser.error("the domain and the validation are required")
+    request = {
+        "action": "add" if args.command == "auth" else "delete",
+        "domain": args.domain,
+        "validation": args.validation,
+    }
+    if args.socket:
+        try:
+            response = send(args.socket, request)
+        except (OSError, ValueError) as e:
+            print(
+                f"Error: cannot reach the daemon at {args.socket}: {e}", file=sys.stderr
+            )
+            return 2
+    elif args.credentials:
+        from certbot_dns_ionos_cloud import daemon
+
+        response = daemon.run_request(args, request)
+    else:
+        parser.error("either --socket or --credentials is required")
+
+    if not response.get("ok"):
+        print(f"Error: {response.get('error')}", file=sys.stderr)
+        return 1
+    if args.command == "auth" and args.propagation_seconds > 0:
+        time.sleep(args.propagation_seconds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,65 @@
 """DNS Authenticator for IONOS."""
 
+import asyncio
 import json
 import logging
+import os
+import threading
+import time
 
 import requests
+import requests.adapters
 
-from certbot import errors
+from acme import challenges
+from certbot import achallenges, errors
+from certbot.display import util as display_util
 from certbot.plugins import dns_common
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Iterator,
+    NamedTuple,
+    TypeVar,
+)
+
+from certbot_dns_ionos_cloud import endpoints, plan, propagation, throttle, tokens
+from certbot_dns_ionos_cloud.metrics import Metrics
+from certbot_dns_ionos_cloud.zone_cache import DEFAULT_MAX_ENTRIES, ZoneCache
+
+if TYPE_CHECKING:
+    from certbot_dns_ionos_cloud.async_client import (
+        _AsyncIONOSClient,
+        _AsyncTokenRoutedClient,
+    )
 
 logger = logging.getLogger(__name__)
 
 dns_api_base_url = "https://dns.de-fra.ionos.com"
 
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_PROVISIONING_TIMEOUT = 60
+
+DEFAULT_PAGE_SIZE = 1000
+
+CHALLENGE_PREFIX = "_acme-challenge"
+
+STATE_AVAILABLE = "AVAILABLE"
+STATE_FAILED = "FAILED"
+PROVISIONING_INITIAL_DELAY = 0.5
+PROVISIONING_MAX_DELAY = 5
+
+T = TypeVar("T")
+
+ZONE_CACHE_FILE = "ionos-cloud-zone-cache.json"
+ENDPOINT_CACHE_FILE = "ionos-cloud-endpoint.json"
+
 
 class Authenticator(dns_common.DNSAuthenticator):
     """DNS Authenticator for IONOS
@@ -23,6 +70,14 @@ class Authenticator(dns_common.DNSAuthenticator):
     def __init__(self, *args, **kwargs):
         super(Authenticator, self).__init__(*args, **kwargs)
         self.credentials = None
+        self._client = None
+        self._created_records = {}
+        self._metrics = Metrics()
+        self._routes = {}
+        self._resolvers = None
+        self._async_client = None
+        self._loop = None
+        self._endpoint = None
 
     @classmethod
     def add_parser_arguments(cls, add):
@@ -30,6 +85,143 @@ class Authenticator(dns_common.DNSAuthenticator):
             add, default_propagation_seconds=120
         )
         add("credentials", help="credentials INI file.")
+        add(
+            "endpoint",
+            default=None,
+            help="Base URL of the IONOS Cloud DNS API. Can also be set as"
+            + " endpoint in the credentials file. (Default: {0})".format(
+                dns_api_base_url
+            ),
+        )
+        add(
+            "endpoints",
+            default=None,
+            help="Comma separated base URLs of candidate IONOS Cloud DNS API"
+            + " endpoints. The fastest healthy one is used, unless an endpoint"
+            + " is set. Can also be set as endpoints in the credentials file.",
+        )
+        add(
+            "endpoint-cache-ttl",
+            type=int,
+            default=endpoints.DEFAULT_CACHE_TTL,
+            help="Seconds to keep the endpoint picked out of the candidates in a"
+            + " cache file in the certbot work directory. 0 probes on every run.",
+        )
+        add(
+            "pool-size",
+            type=int,
+            default=DEFAULT_POOL_SIZE,
+            help="Number of keep-alive connections kept open to the IONOS API.",
+        )
+        add(
+            "connect-timeout",
+            type=float,
+            default=DEFAULT_CONNECT_TIMEOUT,
+            help="Seconds to wait for a connection to the IONOS API.",
+        )
+        add(
+            "read-timeout",
+            type=float,
+            default=DEFAULT_READ_TIMEOUT,
+            help="Seconds to wait for a response from the IONOS API.",
+        )
+        add(
+            "preflight",
+            action="store_true",
+            default=False,
+            help="Check the token and resolve the zone of every requested domain"
+            + " before the ACME order is created, failing with all unresolvable"
+            + " names at once.",
+        )
+        add(
+            "wait-until-visible",
+            action="store_true",
+            default=False,
+            help="Poll the authoritative nameservers and continue as soon as they"
+            + " serve all TXT records, waiting at most the propagation seconds.",
+        )
+        add(
+            "nameservers",
+            default=None,
+            help="Comma separated nameservers (host or host:port) to poll instead of"
+            + " the ones the IONOS API reports for the zone.",
+        )
+        add(
+            "challenge-zone",
+            default=None,
+            help="Zone that the _acme-challenge names of all domains are delegated"
+            + " to with a CNAME. All TXT records are written to this zone.",
+        )
+        add(
+            "follow-cname",
+            action="store_true",
+            default=False,
+            help="Look up the CNAME of each _acme-challenge name and write the TXT"
+            + " record to its target.",
+        )
+        add(
+            "async",
+            action="store_true",
+            default=False,
+            help="Send the API calls of a batch concurrently from an asyncio event"
+            + " loop over HTTP/2. Needs the async extra of this plugin.",
+        )
+        add(
+            "max-concurrency",
+            type=int,
+            default=DEFAULT_MAX_CONCURRENCY,
+            help="Maximum number of TXT records written to the IONOS API at once.",
+        )
+        add(
+            "max-retries",
+            type=int,
+            default=throttle.DEFAULT_MAX_RETRIES,
+            help="Number of times a rate limited or failed IONOS API call is retried.",
+        )
+        add(
+            "rate-limit",
+            type=float,
+            default=0,
+            help="Maximum number of IONOS API calls per second. 0 disables the limit.",
+        )
+        add(
+            "page-size",
+            type=int,
+            default=DEFAULT_PAGE_SIZE,
+            help="Number of zones or records fetched per IONOS API listing call.",
+        )
+        add(
+            "provisioning-timeout",
+            type=int,
+            default=DEFAULT_PROVISIONING_TIMEOUT,
+            help="Seconds to wait for the IONOS API to report new TXT records as"
+            + " AVAILABLE before the propagation wait starts. 0 disables the check.",
+        )
+        add(
+            "metrics-file",
+            default=None,
+            help="Write a JSON report of the IONOS API calls and phase timings"
+            + " of each run to this file.",
+        )
+        add(
+            "prometheus-file",
+            default=None,
+            help="Write the metrics of each run to this file, for the node"
+            + " exporter textfile collector.",
+        )
+        add(
+            "zone-cache-ttl",
+            type=int,
+            default=0,
+            help="Seconds to keep zone IDs in a cache file in the certbot work"
+            + " directory. 0 keeps them in memory for the current run only.",
+        )
+        add(
+            "zone-cache-size",
+            type=int,
+            default=DEFAULT_MAX_ENTRIES,
+            help="Maximum number of zone IDs kept in the cache file.",
+        )
 
     def more_info(self) -> str:
         return (
@@ -37,6 +229,10 @@ class Authenticator(dns_common.DNSAuthenticator):
             + " challenge using the IONOS REST API."
         )
 
+    def prepare(self) -> None:
+        if self.conf("preflight"):
+            self._preflight(self.config.domains or [])
+
     def _setup_credentials(self) -> None:
         self.credentials = self._configure_credentials(
             "credentials",
@@ -45,14 +241,846 @@ class Authenticator(dns_common.DNSAuthenticator):
             {"token": "access token for the IONOS API"},
         )
 
-    def _perform(self, domain, validation_name, validation) -> None:
-        _IONOSClient(self.credentials.conf("token")).add_txt_record(
-            domain, validation_name, validation
+    def perform(
+        self, achalls: list[achallenges.AnnotatedChallenge]
+    ) -> list[challenges.ChallengeResponse]:
+        self._setup_credentials()
+        self._attempt_cleanup = True
+
+        responses = []
+        for achall in achalls:
+            responses.append(achall.response(achall.account_key))
+        records = self._challenges(achalls)
+        with self._metrics.phase("perform"):
+            if self.conf("async"):
+                created = self._run(self._get_async_client().add_txt_records(records))
+            else:
+                created = self._get_ionos_client().add_txt_records(records)
+            self._created_records.update(created)
+
+        with self._metrics.phase("propagation_wait"):
+            if self.conf("wait-until-visible"):
+                self._wait_until_visible(records)
+            else:
+                display_util.notify(
+                    "Waiting %d seconds for DNS changes to propagate"
+                    % self.conf("propagation-seconds")
+                )
+                time.sleep(self.conf("propagation-seconds"))
+        return responses
+
+    def cleanup(self, achalls: list[achallenges.AnnotatedChallenge]) -> None:
+        try:
+            if self._attempt_cleanup:
+                records = self._challenges(achalls)
+                client: (
+                    _IONOSClient
+                    | _TokenRoutedClient
+                    | _AsyncIONOSClient
+                    | _AsyncTokenRoutedClient
+                )
+                with self._metrics.phase("cleanup"):
+                    if self.conf("async"):
+                        client = self._get_async_client()
+                        self._run(client.del_txt_records(records, self._created_records))
+                    else:
+                        client = self._get_ionos_client()
+                        client.del_txt_records(records, self._created_records)
+                logger.debug(
+                    "IONOS API calls were retried %d times and throttled for %.2fs",
+                    client.retry_count,
+                    client.throttle_seconds,
+                )
+        finally:
+            self._close_clients()
+            self._write_metrics()
+
+    def _preflight(self, domains: list[Any]) -> None:
+        """
+        Check that the token works and that the zones of all domains are known.
+
+        The zones are resolved concurrently into the zone cache of the client
+        that ``perform`` uses later.
+
+        :param list domains: The requested domains, wildcards included, as
+        strings or certbot name objects.
+        :raises certbot.errors.PluginError: if the token is rejected, or if
+        the zones of some domains cannot be resolved.
+        """
+        # certbot 5 passes its own name objects instead of strings
+        names = sorted({str(d).removeprefix("*.") for d in domains})
+        if not names:
+            return
+        self._setup_credentials()
+        records = [(name, f"{CHALLENGE_PREFIX}.{name}", "") for name in names]
+        if self.conf("challenge-zone") or self.conf("follow-cname"):
+            records = self._route_to_challenge_zone(records)
+
+        zone_domains = [record[0] for record in records]
+        try:
+            with self._metrics.phase("preflight"):
+                if self.conf("async"):
+                    async_client = self._get_async_client()
+                    self._run(async_client.check_token())
+                    zones = self._run(async_client.resolve_zones(zone_domains))
+                    async_client.zone_cache.save()
+                else:
+                    client = self._get_ionos_client()
+                    client.check_token()
+                    zones = client.resolve_zones(zone_domains)
+                    client.zone_cache.save()
+
+            unresolvable = [
+                (name, zones[zone_domain])
+                for name, zone_domain in zip(names, zone_domains)
+                if isinstance(zones[zone_domain], errors.PluginError)
+            ]
+            if unresolvable:
+                raise errors.PluginError(
+                    "The IONOS zones of {0} domains cannot be resolved:\n{1}".format(
+                        len(unresolvable),
+                        "\n".join(f"{name}: {error}" for name, error in unresolvable),
+                    )
+                )
+        except errors.PluginError:
+            # certbot stops before perform and cleanup, which would close them
+            self._close_clients()
+            raise
+        logger.debug("pre-flight check resolved the zones of %d domains", len(names))
+
+    def _write_metrics(self) -> None:
+        """Log the timings of the run and write the configured reports."""
+        summary = self._metrics.summary()
+        logger.debug(
+            "%d IONOS API calls, phase timings: %s", summary["calls"], summary["phases"]
+        )
+        for option, write in [
+            ("metrics-file", self._metrics.write_json),
+            ("prometheus-file", self._metrics.write_prometheus),
+        ]:
+            path = self.conf(option)
+            if not path:
+                continue
+            try:
+                write(path)
+            except OSError as e:
+                logger.warning("Could not write metrics to %s: %s", path, e)
+
+    def _wait_until_visible(self, records: list[tuple[str, str, str]]) -> None:
+        """
+        Poll the authoritative nameservers until they serve all records.
+
+        Waits at most the configured propagation time. If the nameservers of
+        a zone are unknown, the full propagation time is waited instead.
+        """
+        max_wait = self.conf("propagation-seconds")
+        expected: dict[str, set[str]] = {}
+        nameservers: dict[str, list[tuple[str, int]]] = {}
+        for domain, validation_name, validation in records:
+            expected.setdefault(validation_name, set()).add(validation)
+            if validation_name not in nameservers:
+                nameservers[validation_name] = self._nameservers_for(domain)
+
+        if not all(nameservers.values()):
+            logger.warning("Nameservers of some zones are unknown, not polling them")
+            display_util.notify(
+                "Waiting %d seconds for DNS changes to propagate" % max_wait
+            )
+            time.sleep(max_wait)
+            return
+
+        display_util.notify(
+            "Waiting up to %d seconds for DNS changes to reach the authoritative"
+            " nameservers" % max_wait
         )
+        if not propagation.wait_for_txt_records(expected, nameservers, timeout=max_wait):
+            logger.warning(
+                "TXT records not visible on all nameservers after %d seconds", max_wait
+            )
+
+    def _nameservers_for(self, domain: str) -> list[tuple[str, int]]:
+        if self.conf("nameservers"):
+            return [
+                propagation.parse_nameserver(ns)
+                for ns in self.conf("nameservers").split(",")
+            ]
+        if self.conf("async"):
+            found = self._run(self._get_async_client().get_nameservers(domain))
+        else:
+            found = self._get_ionos_client().get_nameservers(domain)
+        return [(ns, propagation.DNS_PORT) for ns in found]
+
+    def _challenges(
+        self, achalls: list[achallenges.AnnotatedChallenge]
+    ) -> list[tuple[str, str, str]]:
+        records = []
+        for achall in achalls:
+            domain = achall.identifier.value
+            records.append(
+                (
+                    domain,
+                    achall.validation_domain_name(domain),
+                    achall.validation(achall.account_key),
+                )
+            )
+        if self.conf("challenge-zone") or self.conf("follow-cname"):
+            records = self._route_to_challenge_zone(records)
+        return records
+
+    def _route_to_challenge_zone(
+        self, records: list[tuple[str, str, str]]
+    ) -> list[tuple[str, str, str]]:
+        """
+        Move the challenge records into the zone their names are delegated to.
+
+        ``_acme-challenge.<domain>`` is a CNAME to the name the record is
+        written to. The target is looked up in DNS if CNAMEs are followed,
+        and is ``_acme-challenge.<domain>.<challenge zone>`` otherwise. With
+        a challenge zone, all records are written with it as their domain,
+        so they share a single zone resolution and batch.
+
+        :raises certbot.errors.PluginError: if a CNAME cannot be looked up or
+        points outside of the challenge zone.
+        """
+        challenge_zone = (self.conf("challenge-zone") or "").strip(".").lower()
+        missing = sorted({name for _, name, _ in records if name not in self._routes})
+        targets: dict[str, str | None] = {}
+        if self.conf("follow-cname") and missing:
+            with ThreadPoolExecutor(max_workers=min(32, len(missing))) as executor:
+                targets = dict(zip(missing, executor.map(self._cname_target, missing)))
+
+        for name in missing:
+            target = targets.get(name)
+            if target is None and challenge_zone:
+                target = f"{name}.{challenge_zone}"
+                if self.conf("follow-cname"):
+                    logger.warning("%s is not a CNAME, using %s", name, target)
+            elif target is not None and challenge_zone:
+                if target != challenge_zone and not target.endswith("." + challenge_zone):
+                    raise errors.PluginError(
+                        "{0} is a CNAME to {1}, which is outside of the challenge"
+                        " zone {2}".format(name, target, challenge_zone)
+                    )
+            self._routes[name] = target
+
+        routed = []
+        for domain, name, validation in records:
+            target = self._routes[name]
+            if target is None:
+                routed.append((domain, name, validation))
+            else:
+                routed.append((challenge_zone or target, target, validation))
+        return routed
+
+    def _cname_target(self, name: str) -> str | None:
+        if self._resolvers is None:
+            self._resolvers = propagation.system_resolvers()
+        for server in self._resolvers:
+            try:
+                target = propagation.query_cname(server, name)
+            except propagation.DNSQueryError as e:
+                logger.debug("looking up the CNAME of %s failed: %s", name, e)
+                continue
+            logger.debug("%s is a CNAME to %s", name, target)
+            return target.rstrip(".").lower() if target else None
+        raise errors.PluginError(f"Could not look up the CNAME of {name}")
+
+    def _perform(self, domain, validation_name, validation) -> None:
+        self._get_ionos_client().add_txt_record(domain, validation_name, validation)
 
     def _cleanup(self, domain, validation_name, validation) -> None:
-        _IONOSClient(self.credentials.conf("token")).del_txt_record(
-            domain, validation_name, validation
+        self._get_ionos_client().del_txt_record(domain, validation_name, validation)
+
+    def _get_ionos_client(self) -> "_IONOSClient | _TokenRoutedClient":
+        # one client per token and run, so that all challenges share its
+        # connection pool and rate limiter
+        if self._client is None:
+            options = self._client_options()
+            routes = tokens.token_routes(self.credentials)
+            client = _IONOSClient(self.credentials.conf("token"), **options)
+            if routes:
+                clients = {tokens.DEFAULT_LABEL: client}
+                for route in routes:
+                    clients[route.label] = _IONOSClient(route.token, **options)
+                self._client = _TokenRoutedClient(clients, routes)
+            else:
+                self._client = client
+        return self._client
+
+    def _get_async_client(self) -> "_AsyncIONOSClient | _AsyncTokenRoutedClient":
+        if self._async_client is None:
+            options = self._client_options()
+            routes = tokens.token_routes(self.credentials)
+            try:
+                from certbot_dns_ionos_cloud.async_client import (
+                    _AsyncIONOSClient,
+                    _AsyncTokenRoutedClient,
+                )
+
+                # httpx only imports h2 once a client with HTTP/2 is created
+                async_client = _AsyncIONOSClient(
+                    self.credentials.conf("token"), **options
+                )
+                if routes:
+                    async_clients = {tokens.DEFAULT_LABEL: async_client}
+                    for route in routes:
+                        async_clients[route.label] = _AsyncIONOSClient(
+                            route.token, **options
+                        )
+                    self._async_client = _AsyncTokenRoutedClient(async_clients, routes)
+                else:
+                    self._async_client = async_client
+            except ImportError as e:
+                raise errors.PluginError(
+                    "--{0} needs httpx with HTTP/2 support, install it with: pip"
+                    " install certbot-dns-ionos-cloud[async] ({1})".format(
+                        self.option_name("async"), e
+                    )
+                )
+        return self._async_client
+
+    def _get_endpoint(self) -> str:
+        """
+        Get the base URL of the API.
+
+        The options win over the credentials file, and an endpoint wins over
+        candidates to pick from.
+        """
+        if self._endpoint is None:
+            self._endpoint = dns_api_base_url
+            for source in (self.conf, self.credentials.conf):
+                endpoint = source("endpoint")
+                candidates = source("endpoints")
+                if endpoint:
+                    self._endpoint = endpoint
+                    break
+                if candidates:
+                    self._endpoint = endpoints.select_endpoint(
+                        endpoints.split_candidates(candidates),
+                        self.credentials.conf("token"),
+                        cache_path=os.path.join(
+                            self.config.work_dir, ENDPOINT_CACHE_FILE
+                        ),
+                        ttl=self.conf("endpoint-cache-ttl"),
+                        timeout=self.conf("connect-timeout"),
+                    )
+                    break
+        return self._endpoint
+
+    def _client_options(self) -> dict[str, Any]:
+        return dict(
+            base_url=self._get_endpoint(),
+            pool_size=self.conf("pool-size"),
+            timeout=(self.conf("connect-timeout"), self.conf("read-timeout")),
+            zone_cache=ZoneCache(
+                os.path.join(self.config.work_dir, ZONE_CACHE_FILE),
+                ttl=self.conf("zone-cache-ttl"),
+                max_entries=self.conf("zone-cache-size"),
+            ),
+            max_concurrency=self.conf("max-concurrency"),
+            provisioning_timeout=self.conf("provisioning-timeout"),
+            max_retries=self.conf("max-retries"),
+            rate_limit=self.conf("rate-limit"),
+            page_size=self.conf("page-size"),
+            metrics=self._metrics,
+            record_prefix="" if self.conf("follow-cname") else CHALLENGE_PREFIX,
+        )
+
+    def _run(self, coroutine: Awaitable[T]) -> T:
+        # a single event loop per run, so that the client and its HTTP/2
+        # connections are reused between perform and cleanup
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coroutine)
+
+    def _close_clients(self) -> None:
+        """Release the connection pools of the run, and its event loop."""
+        try:
+            if self._client is not None:
+                self._client.close()
+        finally:
+            self._client = None
+            self._close_event_loop()
+
+    def _close_event_loop(self) -> None:
+        if self._loop is None:
+            return
+        try:
+            if self._async_client is not None:
+                self._loop.run_until_complete(self._async_client.aclose())
+        finally:
+            self._loop.close()
+            self._loop = None
+            self._async_client = None
+
+
+def _size_of(value: Any) -> int:
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (dict, list)):
+        return len(json.dumps(value))
+    return 0
+
+
+def _raise_failures(
+    failures: list[tuple[tuple[str, str, str], errors.PluginError]],
+) -> None:
+    if len(failures) == 1:
+        raise failures[0][1]
+    if failures:
+        raise errors.PluginError(
+            "{0} TXT record operations failed:\n{1}".format(
+                len(failures),
+                "\n".join(f"{c[1]}: {error}" for c, error in failures),
+            )
+        )
+
+
+class _NotFoundError(errors.PluginError):
+    """The IONOS API answered with 404 Not Found."""
+
+
+class _Write(NamedTuple):
+    """A pending write to the IONOS API and the challenge it serves."""
+
+    challenge: tuple[str, str, str]
+    zone_id: str
+    call: Callable[[], Any]
+
+
+# The helpers below hold the logic that does no I/O, so that `_IONOSClient`
+# and its asynchronous counterpart only differ in how they send calls.
+
+
+def _handle_response(resp: Any) -> Any:
+    if resp.status_code == 404:
+        raise _NotFoundError("Received non OK status from IONOS API 404")
+    if resp.status_code != 200 and resp.status_code != 202:
+        raise errors.PluginError(
+            "Received non OK status from IONOS API {0}".format(resp.status_code)
+        )
+    if not resp.content:
+        return None
+    try:
+        return resp.json()
+    except json.decoder.JSONDecodeError:
+        raise errors.PluginError("API response with non JSON: {0}".format(resp.text))
+
+
+class _Retries(object):
+    """
+    Decides which failed attempts of a call to the IONOS API are retried.
+
+    Rate limited (429) and server error responses as well as connection
+    errors are retried with exponential backoff, honouring Retry-After.
+    POST is not idempotent, so it is only retried if the client can check
+    whether a failed attempt was applied anyway.
+    """
+
+    def __init__(self, method: str, path: str, max_retries: int, can_check: bool):
+        self.method = method
+        self.path = path
+        self.max_retries = max_retries
+        self.can_check = can_check
+        self.attempt = 0
+
+    def next_delay(self, resp: Any, error: Exception | None) -> float | None:
+        """
+        Get how long to wait before retrying a failed attempt.
+
+        :param resp: The retryable response, or None if the call failed.
+        :param Exception error: The error if the call failed.
+        :returns: The seconds to wait, or None if the call is not retried.
+        :rtype: float
+        """
+        if self.attempt >= self.max_retries or (
+            self.method == "POST" and not self.can_check
+        ):
+            return None
+        retry_after = (
+            throttle.parse_retry_after(resp.headers.get("Retry-After"))
+            if resp is not None
+            else None
+        )
+        delay = throttle.backoff_delay(self.attempt, retry_after)
+        self.attempt += 1
+        logger.debug(
+            "retrying %s %s in %.2fs after %s (retry %d of %d)",
+            self.method,
+            self.path,
+            delay,
+            resp.status_code if resp is not None else error,
+            self.attempt,
+            self.max_retries,
+        )
+        return delay
+
+
+def _record_call(
+    metrics: Metrics, retries: _Retries, resp: Any, started: float, payload: Any
+) -> None:
+    metrics.record_call(
+        retries.method,
+        retries.path,
+        resp.status_code if resp is not None else None,
+        time.perf_counter() - started,
+        retries.attempt,
+        request_bytes=_size_of(payload),
+        response_bytes=_size_of(resp.content if resp is not None else None),
+    )
+
+
+def _page_params(params: dict, offset: int, page_size: int) -> dict:
+    return {**params, "offset": offset, "limit": page_size}
+
+
+def _read_page(response: Any, offset: int, page_size: int) -> tuple[list, int | None]:
+    """
+    Read a page of a listing.
+
+    If the API does not say whether a next page exists, a full page is
+    taken to mean that one may follow.
+
+    :returns: The items of the page, and the offset of the next page or
+    None if this is the last one.
+    :rtype: tuple
+    """
+    items = response.get("items") or []
+    links = response.get("_links")
+    if links is not None:
+        has_next = bool(links.get("next"))
+    else:
+        has_next = len(items) >= page_size
+    if not items or not has_next:
+        return items, None
+    return items, offset + len(items)
+
+
+class _ZoneIndex(object):
+    """
+    The zones of an account by name, filled in as a client lists them.
+
+    The client owns the listing and its lock, the index decides whether the
+    listing has to go on and when it is too old to trust.
+    """
+
+    def __init__(self, relist_interval: float | None = None):
+        self.relist_interval = relist_interval
+        self.zones: dict[str, str] = {}
+        self.nameservers: dict[str, list[str]] = {}
+        self.complete = False
+        self._listed_at = 0.0
+
+    def needs_listing(self, guesses: list[str]) -> bool:
+        """
+        Whether more zones must be listed to resolve a domain.
+
+        A zone named exactly like the domain ends the listing, as no other
+        zone could be a better match.
+
+        :param list guesses: The zone names of the domain, longest first.
+        :rtype: bool
+        """
+        return not self.complete and guesses[0] not in self.zones
+
+    def add(self, zone_item: dict) -> None:
+        """Index a zone, as returned by the API."""
+        properties = zone_item.get("properties")
+        if properties and properties.get("zoneName"):
+            self.zones[properties["zoneName"]] = zone_item["id"]
+            self.remember_nameservers(zone_item)
+
+    def finish(self) -> None:
+        """Mark the listing as complete."""
+        self.complete = True
+        self._listed_at = time.monotonic()
+
+    def remember_nameservers(self, zone_item: dict) -> None:
+        nameservers = (zone_item.get("metadata") or {}).get("nameservers")
+        if nameservers:
+            self.nameservers[zone_item["id"]] = list(nameservers)
+
+    def find(self, guesses: list[str]) -> tuple[str, str] | None:
+        """
+        Find the indexed zone with the longest name matching a domain.
+
+        :param list guesses: The zone names of the domain, longest first.
+        :returns: The ID and the name of the zone, if indexed.
+        :rtype: tuple
+        """
+        for guess in guesses:
+            zone_id = self.zones.get(guess)
+            if zone_id is not None:
+                return zone_id, guess
+        return None
+
+    def is_stale(self) -> bool:
+        """Whether the listing is complete but older than the relist interval."""
+        return (
+            self.relist_interval is not None
+            and self.complete
+            and time.monotonic() - self._listed_at >= self.relist_interval
+        )
+
+    def reset(self) -> None:
+        """Forget all indexed zones, so they are listed again on next use."""
+        self.zones = {}
+        self.complete = False
+
+
+class _ProvisioningWait(object):
+    """
+    Tracks written records until the API reports them as provisioned.
+
+    The client sleeps for `next_delay`, lists the records of `polls` and
+    passes each of them to `check`, until `next_delay` returns None.
+    """
+
+    def __init__(
+        self, written: list[tuple[_Write, Any]], timeout: float, record_prefix: str
+    ):
+        self.timeout = timeout
+        self._pending: dict[str, dict[str, tuple[str, str, str]]] = {}
+        self._names: dict[str, list[str]] = {}
+        for write, record in written:
+            if isinstance(record, dict) and record.get("id"):
+                self._pending.setdefault(write.zone_id, {})[
+                    record["id"]
+                ] = write.challenge
+                self._names.setdefault(write.zone_id, []).append(
+                    (record.get("properties") or {}).get("name", record_prefix)
+                )
+                self.check(write.zone_id, record)
+        self._deadline = time.monotonic() + timeout
+        self._delay = PROVISIONING_INITIAL_DELAY
+
+    def pending(self) -> int:
+        """The number of records that are still provisioning."""
+        return sum(len(records) for records in self._pending.values())
+
+    def check(self, zone_id: str, record: dict) -> bool:
+        """
+        Update a pending record from the state reported by the API.
+
+        The zones are checked independently, so the polls of several zones
+        may run in parallel.
+
+        :param str zone_id: The ID of the zone of the record.
+        :param dict record: The record, as returned by the API.
+        :returns: Whether records of the zone are still pending.
+        :rtype: bool
+        :raises certbot.errors.PluginError: if the record failed to provision.
+        """
+        pending = self._pending.get(zone_id, {})
+        challenge = pending.get(record.get("id", ""))
+        if challenge is not None:
+            state = (record.get("metadata") or {}).get("state")
+            if state == STATE_AVAILABLE:
+                del pending[record["id"]]
+            elif state == STATE_FAILED:
+                raise errors.PluginError(
+                    "Provisioning of TXT record {0} failed".format(challenge[1])
+                )
+        return bool(pending)
+
+    def next_delay(self) -> float | None:
+        """
+        Get how long to wait before the next round of polls.
+
+        :returns: The seconds to wait, or None once no record is pending or
+        the timeout has passed.
+        :rtype: float
+        """
+        pending = self.pending()
+        if not pending:
+            return None
+        remaining = self._deadline - time.monotonic()
+        if remaining <= 0:
+            logger.warning(
+                "%d TXT records are still provisioning after %d seconds",
+                pending,
+                self.timeout,
+            )
+            return None
+        logger.debug("waiting for %d TXT records to be provisioned", pending)
+        delay = min(self._delay, remaining)
+        self._delay = min(self._delay * 2, PROVISIONING_MAX_DELAY)
+        return delay
+
+    def polls(self) -> list[tuple[str, list[str]]]:
+        """
+        Get the listings of the next round.
+
+        :returns: The zones with pending records, and the name filters to
+        list them with.
+        :rtype: list
+        """
+        return [
+            (zone_id, plan.name_filters(self._names[zone_id]))
+            for zone_id, pending in sorted(self._pending.items())
+            if pending
+        ]
+
+
+def _group_by_zone(
+    challenges: list[tuple[str, str, str]],
+    zones: dict[str, tuple[str, str] | errors.PluginError],
+    failures: list[tuple[tuple[str, str, str], errors.PluginError]],
+) -> dict[tuple[str, str], list[tuple[str, str, str]]]:
+    """
+    Group challenges by the zone resolved for their domain.
+
+    Challenges whose zone could not be resolved are added to the failures.
+
+    :returns: The challenges, keyed by the ID and name of their zone.
+    :rtype: dict
+    """
+    groups: dict[tuple[str, str], list[tuple[str, str, str]]] = {}
+    for challenge in challenges:
+        zone = zones[challenge[0]]
+        if isinstance(zone, errors.PluginError):
+            failures.append((challenge, zone))
+        else:
+            groups.setdefault(zone, []).append(challenge)
+    return groups
+
+
+def _merge_zone_results(
+    groups: dict[tuple[str, str], list[tuple[str, str, str]]],
+    results: list[tuple[list[T] | None, errors.PluginError | None]],
+    failures: list[tuple[tuple[str, str, str], errors.PluginError]],
+) -> list[T]:
+    """
+    Join the results of a call per zone group.
+
+    A failed call fails all challenges of its group.
+    """
+    merged: list[T] = []
+    for group, (zone_result, error) in zip(groups.values(), results):
+        if error is not None:
+            failures.extend((challenge, error) for challenge in group)
+        elif zone_result:
+            merged.extend(zone_result)
+    return merged
+
+
+def _merge_writes(
+    writes: list[_Write],
+    results: list[tuple[Any, errors.PluginError | None]],
+    failures: list[tuple[tuple[str, str, str], errors.PluginError]],
+) -> list[tuple[_Write, Any]]:
+    written = []
+    for write, (result, error) in zip(writes, results):
+        if error is not None:
+            failures.append((write.challenge, error))
+        else:
+            written.append((write, result))
+    return written
+
+
+def _split_stale(
+    failures: list[tuple[tuple[str, str, str], errors.PluginError]],
+) -> tuple[
+    list[tuple[str, str, str]], list[tuple[tuple[str, str, str], errors.PluginError]]
+]:
+    """
+    Split off the challenges that failed because their zone is gone.
+
+    :returns: The challenges to resolve again, and the other failures.
+    :rtype: tuple
+    """
+    stale = [c for c, error in failures if isinstance(error, _NotFoundError)]
+    return stale, [f for f in failures if not isinstance(f[1], _NotFoundError)]
+
+
+def _known_deletes(
+    challenges: list[tuple[str, str, str]],
+    created: dict[tuple[str, str, str], tuple[str, str]] | None,
+    delete: Callable[[str, str], Any],
+) -> tuple[list[_Write], list[tuple[str, str, str]]]:
+    """
+    Split challenges into deletions of created records and ones to look up.
+
+    :returns: The deletions by record ID, and the remaining challenges.
+    :rtype: tuple
+    """
+    created = created or {}
+    known = [
+        _Write(c, created[c][0], partial(delete, *created[c]))
+        for c in challenges
+        if c in created
+    ]
+    return known, [c for c in challenges if c not in created]
+
+
+def _created_records(
+    written: list[tuple[_Write, Any]],
+) -> dict[tuple[str, str, str], tuple[str, str]]:
+    return {
+        write.challenge: (write.zone_id, record["id"])
+        for write, record in written
+        if isinstance(record, dict) and record.get("id")
+    }
+
+
+def _resolved_zones(
+    domains: list[str],
+    results: list[tuple[tuple[str, str] | None, errors.PluginError | None]],
+) -> dict[str, tuple[str, str] | errors.PluginError]:
+    resolved: dict[str, tuple[str, str] | errors.PluginError] = {}
+    for domain, (zone, error) in zip(domains, results):
+        if error is not None:
+            resolved[domain] = error
+        elif zone is not None:
+            resolved[domain] = zone
+    return resolved
+
+
+def _records_filter(zone_id: str | None, name: str | None) -> dict:
+    params = {}
+    if zone_id:
+        params["filter.zoneId"] = zone_id
+    if name:
+        params["filter.name"] = name
+    return params
+
+
+def _new_txt_record(record_name: str, record_content: str) -> dict:
+    return {
+        "properties": {
+            "name": record_name,
+            "type": "TXT",
+            "content": record_content,
+        }
+    }
+
+
+def _is_txt_record(record: dict, record_name: str, record_content: str) -> bool:
+    properties = record.get("properties") or {}
+    return (
+        properties.get("name") == record_name
+        and properties.get("content") == record_content
+    )
+
+
+def _split_by_token(
+    routes: list[tokens.TokenRoute], items: list[T], domain_of: Callable[[T], str]
+) -> dict[str, list[T]]:
+    groups: dict[str, list[T]] = {}
+    for item in items:
+        groups.setdefault(tokens.route_domain(routes, domain_of(item)), []).append(item)
+    return groups
+
+
+def _raise_token_failures(failures: list[tuple[str, errors.PluginError]]) -> None:
+    if len(failures) == 1:
+        raise failures[0][1]
+    if failures:
+        raise errors.PluginError(
+            "Operations of {0} tokens failed:\n{1}".format(
+                len(failures),
+                "\n".join(f"{label}: {error}" for label, error in failures),
+            )
         )
 
 
@@ -61,19 +1089,111 @@ class _IONOSClient(object):
     Encapsulates all communication with the IONOS Cloud DNS API.
     """
 
-    def __init__(self, token: str):
+    def __init__(
+        self,
+        token: str,
+        base_url: str = dns_api_base_url,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: tuple[float, float] = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+        zone_cache: ZoneCache | None = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        provisioning_timeout: float = DEFAULT_PROVISIONING_TIMEOUT,
+        max_retries: int = throttle.DEFAULT_MAX_RETRIES,
+        rate_limit: float = 0,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        metrics: Metrics | None = None,
+        record_prefix: str = CHALLENGE_PREFIX,
+        zone_relist_interval: float | None = None,
+    ):
         logger.debug("creating IONOS Client")
         self.headers = {"Authorization": f"Bearer {token}"}
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.provisioning_timeout = provisioning_timeout
+        self.max_retries = max_retries
+        self._rate_limiter = throttle.TokenBucket(rate_limit) if rate_limit > 0 else None
+        self.retry_count = 0
+        self.throttle_seconds = 0.0
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.zone_cache = zone_cache if zone_cache is not None else ZoneCache()
+        self.page_size = page_size
+        self.record_prefix = record_prefix
+        self._zone_index = _ZoneIndex(zone_relist_interval)
+        self._zone_items: Iterator[dict] | None = None
+        self._zone_lock = threading.Lock()
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=max(pool_size, max_concurrency)
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
-    def _handle_response(self, resp: requests.Response) -> Any:
-        if resp.status_code != 200 and resp.status_code != 202:
-            raise errors.PluginError(
-                "Received non OK status from IONOS API {0}".format(resp.status_code)
-            )
+    @property
+    def zone_relist_interval(self) -> float | None:
+        return self._zone_index.relist_interval
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        retry_check: Callable[[], Any] | None = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Send a request to the IONOS API, retrying transient failures.
+
+        See `_Retries` for which failures are retried. ``retry_check`` is
+        called before each retry of a POST, and a non-None result is returned
+        instead of sending the request again.
+        """
+        started = time.perf_counter()
+        retries = _Retries(method, path, self.max_retries, retry_check is not None)
+        resp = None
         try:
-            return resp.json()
-        except json.decoder.JSONDecodeError:
-            raise errors.PluginError("API response with non JSON: {0}".format(resp.text))
+            while True:
+                if self._rate_limiter is not None:
+                    waited = self._rate_limiter.acquire()
+                    if waited:
+                        self.throttle_seconds += waited
+                        logger.debug("throttled %s %s for %.2fs", method, path, waited)
+
+                resp = None
+                error = None
+                try:
+                    resp = self.session.request(
+                        method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs
+                    )
+                except requests.exceptions.RequestException as e:
+                    error = errors.PluginError(
+                        "Error communicating with IONOS API: {0}".format(e)
+                    )
+                else:
+                    if resp.status_code not in throttle.RETRYABLE_STATUS_CODES:
+                        return _handle_response(resp)
+
+                delay = retries.next_delay(resp, error)
+                if delay is None:
+                    if error is not None:
+                        raise error
+                    return _handle_response(resp)
+                self.retry_count += 1
+                time.sleep(delay)
+
+                if retry_check is not None:
+                    applied = retry_check()
+                    if applied is not None:
+                        logger.debug(
+                            "%s %s was already applied, not retrying", method, path
+                        )
+                        return applied
+        finally:
+            _record_call(self.metrics, retries, resp, started, kwargs.get("json"))
 
     def add_txt_record(self, domain: str, record_name: str, record_content: str):
         """
@@ -87,26 +1207,31 @@ class _IONOSClient(object):
         :raises certbot.errors.PluginError: if an error occurs communicating
         with the IONOS API
         """
-        # because the domain is appended by the API,
-        # we remove it from it from the record name
-        record_name_without_domain = record_name.replace("." + domain, "")
-        zone_id = self._find_zone_id(domain)
-        if zone_id is None:
-            raise errors.PluginError("Domain not known")
-        logger.debug("domain found: %s with id: %s", domain, zone_id)
-        record = self.get_existing_txt_acme_record(zone_id, record_name_without_domain)
-        if record is not None:
-            record_properties = record.get("properties")
-            if record_properties.get("content") == record_content:
-                logger.info("already there, id {0}".format(record.get("id")))
-                return
-            else:
-                logger.info("update {0}".format(record.get("id")))
-                record_properties.update({"content": record_content})
-                self._update_txt_record(zone_id, record)
-        else:
-            logger.info("insert new txt record")
-            self._insert_txt_record(zone_id, record_name_without_domain, record_content)
+        self.add_txt_records([(domain, record_name, record_content)])
+
+    def add_txt_records(
+        self, challenges: list[tuple[str, str, str]]
+    ) -> dict[tuple[str, str, str], tuple[str, str]]:
+        """
+        Add the TXT records of many challenges at once.
+
+        The challenges are grouped by zone. For each zone, the existing
+        challenge records are fetched with a single listing, and only the
+        records that are missing are written.
+
+        :param list challenges: (domain, record name, record content) tuples,
+        as passed to `add_txt_record`.
+        :returns: The zone and record IDs of the created records, keyed by
+        challenge, so that they can be deleted without a lookup.
+        :rtype: dict
+        :raises certbot.errors.PluginError: if an error occurs communicating
+        with the IONOS API
+        """
+        written = self._apply(challenges, self._plan_add)
+        if self.provisioning_timeout > 0:
+            with self.metrics.phase("provisioning_wait"):
+                self._wait_for_provisioning(written)
+        return _created_records(written)
 
     def del_txt_record(self, domain: str, record_name: str, record_content: str):
         """
@@ -119,76 +1244,409 @@ class _IONOSClient(object):
         :raises certbot.errors.PluginError: if an error occurs communicating
         with the IONOS API
         """
-        zone_id = self._find_zone_id(domain)
-        if zone_id is None:
-            raise errors.PluginError("Domain not known")
-        logger.debug("domain found: %s with id: %s", domain, zone_id)
-        record = self.get_existing_txt_acme_record(
-            zone_id, record_name.replace("." + domain, "")
-        )
-        if record is not None:
-            record_properties = record.get("properties")
-            if record_properties.get("content") == record_content:
-                logger.debug("delete TXT record: %s", record.get("id"))
-                self._handle_response(
-                    requests.delete(
-                        f"{dns_api_base_url}/zones/{zone_id}/records/{record.get('id')}",
-                        headers=self.headers,
-                    )
-                )
+        self.del_txt_records([(domain, record_name, record_content)])
 
-    def _insert_txt_record(self, zone_id: str, record_name: str, record_content: str):
-        new_record = {
-            "properties": {
-                "name": record_name,
-                "type": "TXT",
-                "content": record_content,
-            }
-        }
+    def del_txt_records(
+        self,
+        challenges: list[tuple[str, str, str]],
+        created: dict[tuple[str, str, str], tuple[str, str]] | None = None,
+    ) -> None:
+        """
+        Delete the TXT records of many challenges at once.
+
+        Records created by `add_txt_records` are deleted by their ID right
+        away. For the other challenges, as in `add_txt_records`, the existing
+        challenge records are fetched with a single listing per zone, and only
+        records with matching content are deleted.
+
+        :param list challenges: (domain, record name, record content) tuples,
+        as passed to `del_txt_record`.
+        :param dict created: The records returned by `add_txt_records`.
+        :raises certbot.errors.PluginError: if an error occurs communicating
+        with the IONOS API
+        """
+        known, remaining = _known_deletes(challenges, created, self._delete_record)
+        self._apply(remaining, self._plan_delete, known)
+
+    def plan_txt_records(
+        self, challenges: list[tuple[str, str, str]], action: str = plan.CREATE
+    ) -> list[plan.Change]:
+        """
+        Compute the writes of a batch without making them, e.g. for a dry run.
+
+        Only the zones and the challenge records are listed.
+
+        :param list challenges: (domain, record name, record content) tuples.
+        :param str action: `plan.CREATE` or `plan.DELETE`.
+        :returns: The records that would be created or deleted.
+        :rtype: list
+        :raises certbot.errors.PluginError: if zones cannot be resolved or listed.
+        """
+        zones = self.resolve_zones([challenge[0] for challenge in challenges])
+        failures: list[tuple[tuple[str, str, str], errors.PluginError]] = []
+        groups = _group_by_zone(challenges, zones, failures)
+        results = self._run_concurrently(
+            [
+                partial(self._plan_zone, *zone, group, action)
+                for zone, group in groups.items()
+            ]
+        )
+        changes = _merge_zone_results(groups, results, failures)
+        _raise_failures(failures)
+        return changes
 
-        self._handle_response(
-            requests.post(
-                f"{dns_api_base_url}/zones/{zone_id}/records",
-                json=new_record,
-                headers=self.headers,
+    def _plan_add(
+        self, zone_id: str, zone_name: str, challenges: list[tuple[str, str, str]]
+    ) -> list["_Write"]:
+        return [
+            self._write_for(change)
+            for change in self._plan_zone(zone_id, zone_name, challenges, plan.CREATE)
+        ]
+
+    def _plan_delete(
+        self, zone_id: str, zone_name: str, challenges: list[tuple[str, str, str]]
+    ) -> list["_Write"]:
+        return [
+            self._write_for(change)
+            for change in self._plan_zone(zone_id, zone_name, challenges, plan.DELETE)
+        ]
+
+    def _plan_zone(
+        self,
+        zone_id: str,
+        zone_name: str,
+        challenges: list[tuple[str, str, str]],
+        action: str,
+    ) -> list[plan.Change]:
+        index = plan.RecordIndex(self.record_prefix)
+        names = [plan.relative_record_name(c[1], zone_name) for c in challenges]
+        for name_filter in plan.name_filters(names):
+            for record_item in self.iter_records(zone_id, name_filter):
+                index.add(zone_id, record_item)
+        return plan.plan_changes(index, zone_id, zone_name, challenges, action)
+
+    def _write_for(self, change: plan.Change) -> "_Write":
+        if change.action == plan.CREATE:
+            call = partial(
+                self._insert_txt_record, change.zone_id, change.name, change.content
+            )
+        else:
+            call = partial(self._delete_record, change.zone_id, change.record_id)
+        return _Write(change.challenge, change.zone_id, call)
+
+    def _wait_for_provisioning(self, written: list[tuple["_Write", Any]]) -> None:
+        """
+        Wait until the API reports all written records as provisioned.
+
+        The states of all pending records are read with one listing per zone
+        and round. A record that failed to provision raises right away; if
+        the timeout passes first, a warning is logged.
+
+        :param list written: The writes and the records the API returned.
+        :raises certbot.errors.PluginError: if a record failed to provision.
+        """
+        wait = _ProvisioningWait(written, self.provisioning_timeout, self.record_prefix)
+        delay = wait.next_delay()
+        while delay is not None:
+            time.sleep(delay)
+            results = self._run_concurrently(
+                [
+                    partial(self._poll_provisioning_states, wait, zone_id, name_filters)
+                    for zone_id, name_filters in wait.polls()
+                ]
             )
+            for _, error in results:
+                if error is not None:
+                    raise error
+            delay = wait.next_delay()
+
+    def _poll_provisioning_states(
+        self, wait: _ProvisioningWait, zone_id: str, name_filters: list[str]
+    ) -> None:
+        """
+        Update the pending records of a zone from listings of the written names.
+
+        The listings stop as soon as no record of the zone is pending anymore.
+        """
+        for name_filter in name_filters:
+            for record in self.iter_records(zone_id, name_filter):
+                if not wait.check(zone_id, record):
+                    return
+
+    def _apply(
+        self,
+        challenges: list[tuple[str, str, str]],
+        planner: Callable[[str, str, list[tuple[str, str, str]]], list["_Write"]],
+        writes: list["_Write"] | None = None,
+    ) -> list[tuple["_Write", Any]]:
+        """
+        Plan the writes for every zone of the challenges, then run them.
+
+        Writes that need no planning can be passed in, to be run together
+        with the planned ones. Cached zones are tried first. If the API
+        reports one as not found, it is dropped from the cache and its
+        challenges are resolved again.
+        Failures are collected per challenge and reported together.
+
+        :returns: The successful writes with the API responses.
+        :rtype: list
+        :raises certbot.errors.PluginError: if any challenge failed.
+        """
+        written, failures = self._apply_once(
+            challenges, planner, use_cache=True, writes=writes or []
         )
-        logger.debug("create with payload: %s", new_record)
+        stale, failures = _split_stale(failures)
+        if stale:
+            logger.debug("retrying %d challenges with stale zones", len(stale))
+            for domain, _, _ in stale:
+                self.zone_cache.invalidate(domain)
+            self._reset_zone_index()
+            retried, failures_after_retry = self._apply_once(
+                stale, planner, use_cache=False, writes=[]
+            )
+            written += retried
+            failures += failures_after_retry
+        self.zone_cache.save()
+        _raise_failures(failures)
+        return written
 
-    def _update_txt_record(self, zone_id: str, record: dict):
-        self._handle_response(
-            requests.put(
-                f"{dns_api_base_url}/zones/{zone_id}/records/{record.get('id')}",
-                json=record,
-                headers=self.headers,
+    def _apply_once(
+        self,
+        challenges: list[tuple[str, str, str]],
+        planner: Callable[[str, str, list[tuple[str, str, str]]], list["_Write"]],
+        use_cache: bool,
+        writes: list["_Write"],
+    ) -> tuple[
+        list[tuple["_Write", Any]], list[tuple[tuple[str, str, str], errors.PluginError]]
+    ]:
+        failures: list[tuple[tuple[str, str, str], errors.PluginError]] = []
+        with self.metrics.phase("zone_resolution"):
+            zones = self.resolve_zones(
+                [challenge[0] for challenge in challenges], use_cache
             )
+        groups = _group_by_zone(challenges, zones, failures)
+
+        with self.metrics.phase("record_lookup"):
+            plans = self._run_concurrently(
+                [partial(planner, *zone, group) for zone, group in groups.items()]
+            )
+        writes = writes + _merge_zone_results(groups, plans, failures)
+
+        with self.metrics.phase("write"):
+            results = self._run_concurrently([write.call for write in writes])
+        return _merge_writes(writes, results, failures), failures
+
+    def _run_concurrently(
+        self, calls: list[Callable[[], T]]
+    ) -> list[tuple[T | None, errors.PluginError | None]]:
+        """
+        Run calls on the worker pool and collect their results in order.
+
+        :returns: A (result, error) pair per call.
+        :rtype: list
+        """
+
+        def run(call: Callable[[], T]) -> tuple[T | None, errors.PluginError | None]:
+            try:
+                return call(), None
+            except errors.PluginError as e:
+                return None, e
+
+        if self.max_concurrency <= 1 or len(calls) <= 1:
+            return [run(call) for call in calls]
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            return list(executor.map(run, calls))
+
+    def delete_records(
+        self, records: list[tuple[str, str]]
+    ) -> list[errors.PluginError | None]:
+        """
+        Delete records by ID, concurrently on the worker pool.
+
+        Records that are already gone count as deleted.
+
+        :param list records: (zone ID, record ID) pairs.
+        :returns: The error of each deletion, or None if it succeeded, in order.
+        :rtype: list
+        """
+        return [
+            error
+            for _, error in self._run_concurrently(
+                [partial(self._delete_record, *record) for record in records]
+            )
+        ]
+
+    def check_token(self) -> None:
+        """
+        Check with a single call that the API accepts the token.
+
+        :raises certbot.errors.PluginError: if the call fails.
+        """
+        try:
+            self._request("GET", "/zones", params=_page_params({}, 0, 1))
+        except errors.PluginError as e:
+            raise errors.PluginError(
+                "Could not access the IONOS API with the token: {0}".format(e)
+            )
+
+    def resolve_zones(
+        self, domains: list[str], use_cache: bool = True
+    ) -> dict[str, tuple[str, str] | errors.PluginError]:
+        """
+        Resolve the zones of many domains concurrently.
+
+        Zones found are cached, so later batches skip the lookup.
+
+        :param list domains: The domains.
+        :param bool use_cache: Whether cached zones may be used.
+        :returns: The ID and name of its zone, or the error, for each domain.
+        :rtype: dict
+        """
+        domains = sorted(set(domains))
+        results = self._run_concurrently(
+            [partial(self._resolve_zone, domain, use_cache) for domain in domains]
         )
-        logger.debug("update with payload: %s", record)
+        return _resolved_zones(domains, results)
 
-    def _find_zone_id(self, domain: str) -> str | None:
+    def _resolve_zone(self, domain: str, use_cache: bool = True) -> tuple[str, str]:
+        if use_cache:
+            cached = self.zone_cache.get(domain)
+            if cached is not None:
+                return cached
+
+        zone = self._find_zone(domain)
+        if zone is None:
+            raise errors.PluginError("Domain not known")
+        logger.debug("domain found: %s in zone %s with id: %s", domain, zone[1], zone[0])
+        self.zone_cache.set(domain, *zone)
+        return zone
+
+    def _delete_record(self, zone_id: str, record_id: str) -> None:
+        logger.debug("delete TXT record: %s", record_id)
+        try:
+            self._request("DELETE", f"/zones/{zone_id}/records/{record_id}")
+        except _NotFoundError:
+            logger.debug("TXT record %s is already gone", record_id)
+
+    def _insert_txt_record(self, zone_id: str, record_name: str, record_content: str):
+        new_record = _new_txt_record(record_name, record_content)
+
+        def find_created() -> dict | None:
+            for record in self.iter_records(zone_id, record_name):
+                if _is_txt_record(record, record_name, record_content):
+                    return record
+            return None
+
+        created = self._request(
+            "POST",
+            f"/zones/{zone_id}/records",
+            retry_check=find_created,
+            json=new_record,
+        )
+        logger.debug("create with payload: %s", new_record)
+        return created
+
+    def _find_zone(self, domain: str) -> tuple[str, str] | None:
         """
         Find the zone for a given domain.
 
+        The zone is the one with the longest name that is a suffix of the
+        domain, so subdomains are resolved to the zone of their parent.
+        Zones are indexed as they are streamed from the API, and the listing
+        stops as soon as a zone named exactly like the domain is found, as no
+        other zone could be a better match. Concurrent lookups share the
+        listing. If ``zone_relist_interval`` is set, a domain missing from a
+        complete listing that is older than that lists the zones again, so
+        that a long-lived client finds zones created after it listed them.
+
         :param str domain: The domain for which to find the zone.
-        :returns: The ID of the zone, if found.
-        :rtype: str
-        :raises certbot.errors.PluginError: if the zone cannot be found.
+        :returns: The ID and the name of the zone, if found.
+        :rtype: tuple
         """
+        zone = self._find_indexed_zone(domain)
+        if zone is None and self._zone_index.is_stale():
+            logger.debug("%s is not in the listed zones, listing them again", domain)
+            with self._zone_lock:
+                self._reset_zone_index()
+            zone = self._find_indexed_zone(domain)
+        return zone
 
-        zones_response = self._handle_response(
-            requests.get(
-                f"{dns_api_base_url}/zones",
-                params={"filter.zoneName": domain},
-                headers=self.headers,
-            )
-        )
+    def _find_indexed_zone(self, domain: str) -> tuple[str, str] | None:
+        guesses = dns_common.base_domain_name_guesses(domain)
+        with self._zone_lock:
+            try:
+                while self._zone_index.needs_listing(guesses):
+                    if self._zone_items is None:
+                        self._zone_items = self.iter_zones()
+                    zone_item = next(self._zone_items, None)
+                    if zone_item is None:
+                        self._zone_items = None
+                        self._zone_index.finish()
+                    else:
+                        self._zone_index.add(zone_item)
+            except Exception:
+                # a failed page closes the listing, start over on the next lookup
+                # instead of taking the zones seen so far for all zones
+                self._reset_zone_index()
+                raise
+        return self._zone_index.find(guesses)
 
-        for zone_item in zones_response.get("items"):
-            zone_item_properties = zone_item.get("properties")
-            if zone_item_properties and zone_item_properties.get("zoneName") == domain:
-                return zone_item.get("id")
+    def _reset_zone_index(self) -> None:
+        """Forget all indexed zones, so they are listed again on next use."""
+        self._zone_index.reset()
+        self._zone_items = None
 
-        return None
+    def iter_zones(self, zone_name: str | None = None) -> Iterator[dict]:
+        """
+        Iterate over the zones of the account.
+
+        Pages are fetched lazily, so stopping the iteration early saves the
+        remaining requests.
+
+        :param str zone_name: Only list zones whose name contains this value.
+        :returns: The zones, as returned by the API.
+        :rtype: iterator
+        """
+        params = {"filter.zoneName": zone_name} if zone_name else {}
+        return self._paginate("/zones", params)
+
+    def iter_records(
+        self, zone_id: str | None = None, name: str | None = None
+    ) -> Iterator[dict]:
+        """
+        Iterate over DNS records, fetching pages lazily.
+
+        :param str zone_id: Only list records of this zone.
+        :param str name: Only list records whose name contains this value.
+        :returns: The records, as returned by the API.
+        :rtype: iterator
+        """
+        return self._paginate("/records", _records_filter(zone_id, name))
+
+    def get_nameservers(self, domain: str) -> list[str]:
+        """
+        Get the authoritative nameservers of the zone managing a domain.
+
+        :param str domain: The domain.
+        :returns: The host names of the nameservers, as reported by the API.
+        :rtype: list
+        :raises certbot.errors.PluginError: if the zone cannot be found.
+        """
+        zone_id, _ = self._resolve_zone(domain)
+        if zone_id not in self._zone_index.nameservers:
+            self._zone_index.remember_nameservers(
+                self._request("GET", f"/zones/{zone_id}")
+            )
+        return self._zone_index.nameservers.get(zone_id, [])
+
+    def _paginate(self, path: str, params: dict) -> Iterator[dict]:
+        offset: int | None = 0
+        while offset is not None:
+            response = self._request(
+                "GET", path, params=_page_params(params, offset, self.page_size)
+            )
+            items, offset = _read_page(response, offset, self.page_size)
+            yield from items
 
     def get_existing_txt_acme_record(self, zone_id: str, record_name: str) -> Any | None:
         """
@@ -202,15 +1660,7 @@ class _IONOSClient(object):
         :rtype: `object` or `None`
 
         """
-        records_response = self._handle_response(
-            requests.get(
-                f"{dns_api_base_url}/records",
-                params={"filter.zoneId": zone_id, "filter.name": record_name},
-                headers=self.headers,
-            )
-        )
-
-        for record_item in records_response.get("items"):
+        for record_item in self.iter_records(zone_id, record_name):
             record_item_properties = record_item.get("properties")
             if (
                 record_item_properties
@@ -219,3 +1669,141 @@ class _IONOSClient(object):
                 return record_item
 
         return None
+
+
+class _TokenRoutedClient(object):
+    """
+    Spreads the operations of a batch over one client per API token.
+
+    Every client has its own connection pool and rate limiter, so each token
+    is only held to its own quota. The challenges of a batch are split by
+    the token managing their domain, and the clients run their share in
+    parallel.
+    """
+
+    def __init__(self, clients: dict[str, _IONOSClient], routes: list[tokens.TokenRoute]):
+        self.clients = clients
+        self.routes = routes
+        # all clients share the zone cache, so saving any of them saves all
+        self.zone_cache = clients[tokens.DEFAULT_LABEL].zone_cache
+
+    @property
+    def retry_count(self) -> int:
+        return sum(client.retry_count for client in self.clients.values())
+
+    @property
+    def throttle_seconds(self) -> float:
+        return sum(client.throttle_seconds for client in self.clients.values())
+
+    def close(self) -> None:
+        for client in self.clients.values():
+            client.close()
+
+    def client_for(self, domain: str) -> _IONOSClient:
+        """
+        Get the client of the token managing a domain.
+
+        :param str domain: The domain.
+        :rtype: _IONOSClient
+        """
+        return self.clients[tokens.route_domain(self.routes, domain)]
+
+    def check_token(self) -> None:
+        """
+        Check that the API accepts every token.
+
+        :raises certbot.errors.PluginError: if a token is rejected.
+        """
+        self._each({label: client.check_token for label, client in self.clients.items()})
+
+    def resolve_zones(
+        self, domains: list[str], use_cache: bool = True
+    ) -> dict[str, tuple[str, str] | errors.PluginError]:
+        """See `_IONOSClient.resolve_zones`."""
+        resolved: dict[str, tuple[str, str] | errors.PluginError] = {}
+        for zones in self._each(
+            {
+                label: partial(self.clients[label].resolve_zones, group, use_cache)
+                for label, group in self._split(domains, lambda domain: domain).items()
+            }
+        ).values():
+            resolved.update(zones)
+        return resolved
+
+    def get_nameservers(self, domain: str) -> list[str]:
+        """See `_IONOSClient.get_nameservers`."""
+        return self.client_for(domain).get_nameservers(domain)
+
+    def add_txt_record(self, domain: str, record_name: str, record_content: str):
+        """See `_IONOSClient.add_txt_record`."""
+        self.client_for(domain).add_txt_record(domain, record_name, record_content)
+
+    def del_txt_record(self, domain: str, record_name: str, record_content: str):
+        """See `_IONOSClient.del_txt_record`."""
+        self.client_for(domain).del_txt_record(domain, record_name, record_content)
+
+    def add_txt_records(
+        self, challenges: list[tuple[str, str, str]]
+    ) -> dict[tuple[str, str, str], tuple[str, str]]:
+        """See `_IONOSClient.add_txt_records`."""
+        created: dict[tuple[str, str, str], tuple[str, str]] = {}
+        for records in self._each(
+            {
+                label: partial(self.clients[label].add_txt_records, group)
+                for label, group in self._split(challenges, lambda c: c[0]).items()
+            }
+        ).values():
+            created.update(records)
+        return created
+
+    def del_txt_records(
+        self,
+        challenges: list[tuple[str, str, str]],
+        created: dict[tuple[str, str, str], tuple[str, str]] | None = None,
+    ) -> None:
+        """See `_IONOSClient.del_txt_records`."""
+        self._each(
+            {
+                label: partial(self.clients[label].del_txt_records, group, created)
+                for label, group in self._split(challenges, lambda c: c[0]).items()
+            }
+        )
+
+    def plan_txt_records(
+        self, challenges: list[tuple[str, str, str]], action: str = plan.CREATE
+    ) -> list[plan.Change]:
+        """See `_IONOSClient.plan_txt_records`."""
+        changes: list[plan.Change] = []
+        for group_changes in self._each(
+            {
+                label: partial(self.clients[label].plan_txt_records, group, action)
+                for label, group in self._split(challenges, lambda c: c[0]).items()
+            }
+        ).values():
+            changes.extend(group_changes)
+        return changes
+
+    def _split(self, items: list[T], domain_of: Callable[[T], str]) -> dict[str, list[T]]:
+        return _split_by_token(self.routes, items, domain_of)
+
+    def _each(self, calls: dict[str, Callable[[], T]]) -> dict[str, T]:
+        """
+        Run a call per token in parallel and wait for all of them.
+
+        :returns: The results, keyed by the label of the token.
+        :rtype: dict
+        :raises certbot.errors.PluginError: if any call failed, once all finished.
+        """
+        if not calls:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+            futures = {label: executor.submit(call) for label, call in calls.items()}
+        results = {}
+        failures = []
+        for label, future in futures.items():
+            try:
+                results[label] = future.result()
+            except errors.PluginError as e:
+                failures.append((label, e))
+        _raise_token_failures(failures)
+        return results
@@ -0,0 +1,257 @@
+"""Records IONOS API calls and phase timings, and writes them as a run report."""
+
+import contextlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Iterator, NamedTuple
+
+PROMETHEUS_PREFIX = "certbot_dns_ionos_cloud"
+
+_ID_SEGMENTS = [
+    (re.compile(r"^/zones/[^/]+"), "/zones/{zoneId}"),
+    (re.compile(r"/records/[^/]+$"), "/records/{recordId}"),
+]
+
+
+class Call(NamedTuple):
+    """A call to the IONOS API, including its retries."""
+
+    method: str
+    endpoint: str
+    status: int | None
+    latency: float
+    retries: int
+    request_bytes: int
+    response_bytes: int
+
+
+def endpoint_of(path: str) -> str:
+    """
+    Replace the IDs in an API path, so that calls can be grouped by endpoint.
+
+    :param str path: The path of the call, e.g. ``/zones/1234/records``.
+    :returns: The endpoint, e.g. ``/zones/{zoneId}/records``.
+    :rtype: str
+    """
+    for pattern, replacement in _ID_SEGMENTS:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+class Metrics(object):
+    """
+    Collects the API calls and the time spent in each phase of a run.
+
+    Calls and phases may be recorded from several threads at once. Phases
+    with the same name add up, but while they overlap, e.g. in the clients
+    of several tokens working in parallel, the time only counts once, so
+    that no phase takes longer than the run.
+    """
+
+    def __init__(self) -> None:
+        self.calls: list[Call] = []
+        self.phases: dict[str, float] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+        # the number of blocks in each phase, and since when one was running
+        self._running: dict[str, tuple[int, float]] = {}
+
+    def record_call(
+        self,
+        method: str,
+        path: str,
+        status: int | None,
+        latency: float,
+        retries: int,
+        request_bytes: int = 0,
+        response_bytes: int = 0,
+    ) -> None:
+        """
+        Record a call to the API.
+
+        :param str method: The HTTP method.
+        :param str path: The path of the call; IDs are replaced by placeholders.
+        :param int status: The final status code, or None if no response came.
+        :param float latency: Seconds spent on the call, retries included.
+        :param int retries: The number of retries.
+        """
+        call = Call(
+            method,
+            endpoint_of(path),
+            status,
+            latency,
+            retries,
+            request_bytes,
+            response_bytes,
+        )
+        with self._lock:
+            self.calls.append(call)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time the enclosed block as part of a phase.
+
+        :param str name: The name of the phase.
+        """
+        with self._lock:
+            count, since = self._running.get(name, (0, time.perf_counter()))
+            self._running[name] = (count + 1, since)
+        try:
+            yield
+        finally:
+            with self._lock:
+                count, since = self._running.pop(name)
+                if count > 1:
+                    self._running[name] = (count - 1, since)
+                else:
+                    elapsed = time.perf_counter() - since
+                    self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Summarize the run.
+
+        :returns: The totals, the phase timings and per endpoint statistics.
+        :rtype: dict
+        """
+        with self._lock:
+            calls = list(self.calls)
+            phases = dict(self.phases)
+
+        endpoints: dict[tuple[str, str], list[Call]] = {}
+        for call in calls:
+            endpoints.setdefault((call.method, call.endpoint), []).append(call)
+
+        return {
+            "started": self.started,
+            "duration": round(time.time() - self.started, 6),
+            "calls": len(calls),
+            "retries": sum(call.retries for call in calls),
+            "errors": sum(1 for call in calls if not _is_success(call.status)),
+            "phases": {
+                name: round(seconds, 6) for name, seconds in sorted(phases.items())
+            },
+            "endpoints": [
+                _endpoint_summary(method, endpoint, group)
+                for (method, endpoint), group in sorted(endpoints.items())
+            ],
+        }
+
+    def write_json(self, path: str) -> None:
+        """
+        Write the summary and every single call as JSON.
+
+        :param str path: The file to write.
+        """
+        report = self.summary()
+        with self._lock:
+            report["requests"] = [call._asdict() for call in self.calls]
+        _write_atomically(path, json.dumps(report, indent=2) + "\n")
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Write the summary in the format of the node exporter textfile collector.
+
+        :param str path: The file to write, which should end with ``.prom``.
+        """
+        summary = self.summary()
+        lines: list[str] = []
+
+        def metric(name: str, help_text: str, samples: list[tuple[str, float]]) -> None:
+            full_name = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} gauge")
+            lines.extend(f"{full_name}{labels} {value}" for labels, value in samples)
+
+        def labels(**values: Any) -> str:
+            return "{" + ",".join(f'{k}="{v}"' for k, v in values.items()) + "}"
+
+        endpoints = summary["endpoints"]
+        metric(
+            "last_run_timestamp_seconds",
+            "Start of the last run.",
+            [("", summary["started"])],
+        )
+        metric(
+            "last_run_duration_seconds",
+            "Duration of the last run.",
+            [("", summary["duration"])],
+        )
+        metric(
+            "phase_seconds",
+            "Seconds spent in each phase of the last run.",
+            [(labels(phase=name), value) for name, value in summary["phases"].items()],
+        )
+        metric(
+            "api_calls",
+            "IONOS API calls of the last run.",
+            [
+                (labels(method=e["method"], endpoint=e["endpoint"], status=status), count)
+                for e in endpoints
+                for status, count in sorted(e["statuses"].items())
+            ],
+        )
+        for key, name, help_text in [
+            ("retries", "api_retries", "Retries of IONOS API calls in the last run."),
+            ("latency_sum", "api_latency_seconds_sum", "Total latency of the calls."),
+            ("latency_max", "api_latency_seconds_max", "Slowest call."),
+            ("response_bytes", "api_response_bytes", "Bytes received from the API."),
+        ]:
+            metric(
+                name,
+                help_text,
+                [
+                    (labels(method=e["method"], endpoint=e["endpoint"]), e[key])
+                    for e in endpoints
+                ],
+            )
+        _write_atomically(path, "\n".join(lines) + "\n")
+
+
+def _is_success(status: int | None) -> bool:
+    return status is not None and 200 <= status < 300
+
+
+def _endpoint_summary(method: str, endpoint: str, calls: list[Call]) -> dict[str, Any]:
+    latencies = sorted(call.latency for call in calls)
+    statuses: dict[str, int] = {}
+    for call in calls:
+        status = str(call.status) if call.status is not None else "error"
+        statuses[status] = statuses.get(status, 0) + 1
+    return {
+        "method": method,
+        "endpoint": endpoint,
+        "count": len(calls),
+        "statuses": statuses,
+        "retries": sum(call.retries for call in calls),
+        "latency_sum": round(sum(latencies), 6),
+        "latency_p50": round(_percentile(latencies, 0.5), 6),
+        "latency_p95": round(_percentile(latencies, 0.95), 6),
+        "latency_max": round(latencies[-1], 6),
+        "request_bytes": sum(call.request_bytes for call in calls),
+        "response_bytes": sum(call.response_bytes for call in calls),
+    }
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _write_atomically(path: str, content: str) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,194 @@
+"""Plans the TXT record writes that bring zones to the wanted challenge records."""
+
+import logging
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+CREATE = "create"
+DELETE = "delete"
+
+
+class Record(object):
+    """A challenge record of a zone, as listed by the API."""
+
+    __slots__ = ("zone_id", "record_id", "name", "content")
+
+    def __init__(self, zone_id: str, record_id: str, name: str, content: str):
+        self.zone_id = zone_id
+        self.record_id = record_id
+        self.name = name
+        self.content = content
+
+
+class Change(NamedTuple):
+    """A write to the API and the challenge it serves."""
+
+    action: str
+    challenge: tuple[str, str, str]
+    zone_id: str
+    zone_name: str
+    name: str
+    content: str
+    record_id: str = ""
+
+    def describe(self) -> str:
+        """
+        Describe the change in one line, e.g. for a dry run.
+
+        :rtype: str
+        """
+        target = f"{self.name}.{self.zone_name}" if self.name else self.zone_name
+        if self.record_id:
+            return f"{self.action} TXT {target} {self.content!r} (id {self.record_id})"
+        return f"{self.action} TXT {target} {self.content!r}"
+
+
+class RecordIndex(object):
+    """
+    The challenge records of zones, indexed by (zone ID, name, content).
+
+    Only the fields needed for planning are kept from the listings, so that
+    the full responses can be dropped while the listings are streamed.
+
+    :param str prefix: Only records whose name starts with it are kept.
+    """
+
+    __slots__ = ("prefix", "_records", "_ids")
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._records: dict[tuple[str, str, str], list[Record]] = {}
+        self._ids: set[tuple[str, str]] = set()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, zone_id: str, record_item: dict) -> None:
+        """
+        Index a record of a listing, if it is a challenge record.
+
+        A record listed more than once, e.g. by overlapping name filters, is
+        only indexed once.
+
+        :param str zone_id: The ID of the zone the record belongs to.
+        :param dict record_item: The record, as returned by the API.
+        """
+        properties = record_item.get("properties")
+        if (
+            not properties
+            or properties.get("type", "TXT") != "TXT"
+            or not properties.get("name", "").startswith(self.prefix)
+            or not record_item.get("id")
+            or (zone_id, record_item["id"]) in self._ids
+        ):
+            return
+        record = Record(
+            zone_id, record_item["id"], properties["name"], properties.get("content", "")
+        )
+        self._records.setdefault((zone_id, record.name, record.content), []).append(
+            record
+        )
+        self._ids.add((zone_id, record.record_id))
+
+    def get(self, zone_id: str, name: str, content: str) -> list[Record]:
+        """
+        Get the records with a name and content in a zone.
+
+        :rtype: list
+        """
+        return self._records.get((zone_id, name, content), [])
+
+
+def relative_record_name(record_name: str, zone_name: str) -> str:
+    """
+    Strip the zone name from a record name, as the API appends it.
+
+    :param str record_name: The fully qualified record name.
+    :param str zone_name: The name of the zone of the record.
+    :rtype: str
+    """
+    if record_name == zone_name:
+        return ""
+    return record_name.removesuffix("." + zone_name)
+
+
+def name_filters(names: list[str]) -> list[str]:
+    """
+    Pick the name filters of the listings that find records with any of the names.
+
+    The API lists the records whose name contains the filter. A single name
+    is its own filter, and names sharing a label, e.g. ``_acme-challenge``,
+    are listed together with the longest such label. Other names are listed
+    one by one, so that a zone is never listed in full unless a name is its
+    apex.
+
+    :param list names: The record names, relative to their zone.
+    :returns: The filters; an empty one lists all records.
+    :rtype: list
+    """
+    distinct = sorted(set(names))
+    if "" in distinct:
+        return [""]
+    if len(distinct) <= 1:
+        return distinct
+    common = set.intersection(*(set(name.split(".")) for name in distinct))
+    if common:
+        return [max(sorted(common), key=len)]
+    return distinct
+
+
+def plan_changes(
+    index: RecordIndex,
+    zone_id: str,
+    zone_name: str,
+    challenges: list[tuple[str, str, str]],
+    action: str,
+) -> list[Change]:
+    """
+    Compute the writes that create or delete the records of challenges.
+
+    A name can hold several TXT values, e.g. for the apex and the wildcard
+    of a domain, so existing records are never overwritten: each value gets
+    its own record, which is only created if missing, and only records with
+    a matching value are deleted.
+
+    :param index: The existing records of the zone.
+    :param str zone_id: The ID of the zone.
+    :param str zone_name: The name of the zone.
+    :param list challenges: (domain, record name, record content) tuples.
+    :param str action: `CREATE` or `DELETE`.
+    :returns: The changes, at most one per record.
+    :rtype: list
+    """
+    changes = []
+    seen = set()
+    for challenge in challenges:
+        name = relative_record_name(challenge[1], zone_name)
+        key = (name, challenge[2])
+        if key in seen:
+            continue
+        seen.add(key)
+        existing = index.get(zone_id, name, challenge[2])
+        if action == CREATE:
+            if existing:
+                logger.info("already there, id {0}".format(existing[0].record_id))
+            else:
+                logger.info("insert new txt record")
+                changes.append(
+                    Change(CREATE, challenge, zone_id, zone_name, name, challenge[2])
+                )
+        else:
+            changes.extend(
+                Change(
+                    DELETE,
+                    challenge,
+                    zone_id,
+                    zone_name,
+                    name,
+                    challenge[2],
+                    record.record_id,
+                )
+                for record in existing
+            )
+    return changes
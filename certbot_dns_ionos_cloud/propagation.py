@@ -0,0 +1,284 @@
+"""Polls authoritative nameservers until challenge TXT records are visible."""
+
+import logging
+import random
+import socket
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DNS_PORT = 53
+RESOLV_CONF = "/etc/resolv.conf"
+DEFAULT_QUERY_TIMEOUT = 2.0
+DEFAULT_INITIAL_DELAY = 1.0
+DEFAULT_MAX_DELAY = 8.0
+
+_TYPE_CNAME = 5
+_TYPE_TXT = 16
+_TYPE_OPT = 41
+_CLASS_IN = 1
+_EDNS_PAYLOAD_SIZE = 4096
+_FLAG_TC = 0x0200
+_FLAG_RD = 0x0100
+
+
+class DNSQueryError(Exception):
+    """A nameserver could not be queried or sent a malformed answer."""
+
+
+def parse_nameserver(value: str) -> tuple[str, int]:
+    """
+    Parse a nameserver given as ``host``, ``host:port`` or ``[ipv6]:port``.
+
+    :param str value: The nameserver.
+    :returns: The host and the port.
+    :rtype: tuple
+    """
+    value = value.strip()
+    if value.startswith("["):
+        host, _, port = value[1:].partition("]")
+        port = port.lstrip(":")
+        return host, int(port) if port else DNS_PORT
+    host, sep, port = value.rpartition(":")
+    if sep and ":" not in host and port.isdigit():
+        return host, int(port)
+    return value, DNS_PORT
+
+
+def query_txt(
+    server: tuple[str, int], name: str, timeout: float = DEFAULT_QUERY_TIMEOUT
+) -> set[str]:
+    """
+    Ask a nameserver for the TXT records of a name, without recursion.
+
+    :param tuple server: The host and port of the nameserver.
+    :param str name: The name to query.
+    :param float timeout: Seconds to wait for the answer.
+    :returns: The TXT values of the name.
+    :rtype: set
+    :raises DNSQueryError: if the nameserver cannot be queried.
+    """
+    query_id = random.randint(0, 0xFFFF)
+    answer = _exchange(server, _build_query(query_id, name, _TYPE_TXT), timeout)
+    return _parse_txt_answer(answer, query_id)
+
+
+def query_cname(
+    server: tuple[str, int], name: str, timeout: float = DEFAULT_QUERY_TIMEOUT
+) -> str | None:
+    """
+    Ask a recursive resolver for the CNAME target of a name.
+
+    :param tuple server: The host and port of the resolver.
+    :param str name: The name to query.
+    :param float timeout: Seconds to wait for the answer.
+    :returns: The target of the CNAME, without trailing dot, if there is one.
+    :rtype: str
+    :raises DNSQueryError: if the resolver cannot be queried.
+    """
+    query_id = random.randint(0, 0xFFFF)
+    query = _build_query(query_id, name, _TYPE_CNAME, recursive=True)
+    answer = _exchange(server, query, timeout)
+    for rtype, start, _ in _answer_records(answer, query_id):
+        if rtype == _TYPE_CNAME:
+            return _read_name(answer, start)
+    return None
+
+
+def system_resolvers(path: str = RESOLV_CONF) -> list[tuple[str, int]]:
+    """
+    Read the recursive resolvers configured for this host.
+
+    :param str path: The resolver configuration file.
+    :returns: The host and port of each resolver.
+    :rtype: list
+    """
+    resolvers = []
+    try:
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == "nameserver":
+                    resolvers.append((fields[1].split("%")[0], DNS_PORT))
+    except OSError as e:
+        logger.debug("could not read %s: %s", path, e)
+    return resolvers
+
+
+def _exchange(server: tuple[str, int], query: bytes, timeout: float) -> bytes:
+    try:
+        family, socktype, proto, _, address = socket.getaddrinfo(
+            server[0], server[1], type=socket.SOCK_DGRAM
+        )[0]
+        with socket.socket(family, socktype, proto) as sock:
+            sock.settimeout(timeout)
+            sock.sendto(query, address)
+            while True:
+                answer, _ = sock.recvfrom(_EDNS_PAYLOAD_SIZE)
+                if answer[:2] == query[:2]:
+                    break
+        if struct.unpack("!H", answer[2:4])[0] & _FLAG_TC:
+            answer = _query_tcp(address, family, query, timeout)
+    except OSError as e:
+        raise DNSQueryError(f"{server[0]}:{server[1]}: {e}") from e
+    return answer
+
+
+def wait_for_txt_records(
+    records: dict[str, set[str]],
+    nameservers: dict[str, list[tuple[str, int]]],
+    timeout: float,
+    initial_delay: float = DEFAULT_INITIAL_DELAY,
+    max_delay: float = DEFAULT_MAX_DELAY,
+    query_timeout: float = DEFAULT_QUERY_TIMEOUT,
+) -> bool:
+    """
+    Wait until every nameserver of every name answers with its TXT values.
+
+    All pending (name, nameserver) pairs are queried in parallel. Between
+    rounds, the delay doubles up to ``max_delay``.
+
+    :param dict records: The expected TXT values, keyed by name.
+    :param dict nameservers: The authoritative nameservers, keyed by name.
+    :param float timeout: Maximum number of seconds to wait.
+    :returns: True if all records became visible before the timeout.
+    :rtype: bool
+    """
+    deadline = time.monotonic() + timeout
+    pending = [(name, server) for name in records for server in nameservers.get(name, [])]
+    delay = initial_delay
+
+    with ThreadPoolExecutor(max_workers=min(32, max(1, len(pending)))) as executor:
+        while pending:
+            answers = executor.map(
+                lambda check: _is_visible(check, records, query_timeout), pending
+            )
+            pending = [check for check, visible in zip(pending, answers) if not visible]
+            if not pending:
+                break
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.debug("still not visible: %s", pending)
+                return False
+            logger.debug(
+                "%d TXT record checks pending, next check in %.1fs", len(pending), delay
+            )
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+
+    return True
+
+
+def _is_visible(
+    check: tuple[str, tuple[str, int]], records: dict[str, set[str]], timeout: float
+) -> bool:
+    name, server = check
+    try:
+        return records[name] <= query_txt(server, name, timeout)
+    except DNSQueryError as e:
+        logger.debug("querying %s for %s failed: %s", server[0], name, e)
+        return False
+
+
+def _build_query(query_id: int, name: str, rtype: int, recursive: bool = False) -> bytes:
+    flags = _FLAG_RD if recursive else 0
+    header = struct.pack("!HHHHHH", query_id, flags, 1, 0, 0, 1)
+    question = b"".join(
+        bytes([len(label)]) + label
+        for label in name.rstrip(".").encode("idna").split(b".")
+    )
+    question += b"\x00" + struct.pack("!HH", rtype, _CLASS_IN)
+    opt = b"\x00" + struct.pack("!HHIH", _TYPE_OPT, _EDNS_PAYLOAD_SIZE, 0, 0)
+    return header + question + opt
+
+
+def _query_tcp(address: tuple, family: int, query: bytes, timeout: float) -> bytes:
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.sendall(struct.pack("!H", len(query)) + query)
+        length = struct.unpack("!H", _recv_exactly(sock, 2))[0]
+        return _recv_exactly(sock, length)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise OSError("connection closed by nameserver")
+        data += chunk
+    return data
+
+
+def _skip_name(data: bytes, offset: int) -> int:
+    while True:
+        if offset >= len(data):
+            raise DNSQueryError("truncated name in DNS answer")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += length + 1
+
+
+def _read_name(data: bytes, offset: int) -> str:
+    labels: list[str] = []
+    for _ in range(128):  # bounds the number of compression pointers followed
+        if offset >= len(data):
+            raise DNSQueryError("truncated name in DNS answer")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            offset = struct.unpack_from("!H", data, offset)[0] & 0x3FFF
+        elif length == 0:
+            return ".".join(labels)
+        else:
+            start = offset + 1
+            labels.append(data[start:][:length].decode("ascii", "replace"))
+            offset = start + length
+    raise DNSQueryError("too many compression pointers in DNS answer")
+
+
+def _answer_records(data: bytes, query_id: int) -> list[tuple[int, int, int]]:
+    try:
+        answer_id, flags, qdcount, ancount = struct.unpack("!HHHH", data[:8])
+        if answer_id != query_id:
+            raise DNSQueryError("DNS answer does not match the query")
+        rcode = flags & 0x000F
+        if rcode not in (0, 3):
+            raise DNSQueryError(f"nameserver answered with rcode {rcode}")
+
+        offset = 12
+        for _ in range(qdcount):
+            offset = _skip_name(data, offset) + 4
+
+        records = []
+        for _ in range(ancount):
+            offset = _skip_name(data, offset)
+            rtype, _, _, rdlength = struct.unpack_from("!HHIH", data, offset)
+            records.append((rtype, offset + 10, rdlength))
+            offset += 10 + rdlength
+        return records
+    except struct.error as e:
+        raise DNSQueryError(f"malformed DNS answer: {e}") from e
+
+
+def _parse_txt_answer(data: bytes, query_id: int) -> set[str]:
+    values = set()
+    for rtype, start, rdlength in _answer_records(data, query_id):
+        if rtype != _TYPE_TXT:
+            continue
+        # TXT data is a sequence of length-prefixed character strings
+        end = start + rdlength
+        chunks = []
+        while start < end:
+            length = data[start]
+            start += 1
+            chunks.append(data[start:][:length])
+            start += length
+        values.add(b"".join(chunks).decode("utf-8", "replace"))
+    return values
@@ -0,0 +1,309 @@
+"""
+Deletes stale ``_acme-challenge`` TXT records left behind by aborted runs.
+
+Certbot runs that fail or are killed before cleanup leave their challenge
+records in the zones. This command streams all zones and their challenge
+records, and deletes the ones older than a threshold::
+
+    certbot-dns-ionos-cloud-sweep --credentials credentials.ini --older-than 86400
+"""
+
+import argparse
+import datetime
+import logging
+import sys
+from functools import partial
+from typing import Callable, NamedTuple
+
+from certbot import errors
+
+from certbot_dns_ionos_cloud import throttle, tokens
+from certbot_dns_ionos_cloud.credentials import client_from_credentials
+from certbot_dns_ionos_cloud.ionos import (
+    CHALLENGE_PREFIX,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_PAGE_SIZE,
+    _IONOSClient,
+    _TokenRoutedClient,
+    dns_api_base_url,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OLDER_THAN = 24 * 60 * 60
+DEFAULT_RATE_LIMIT = 10.0
+
+
+class StaleRecord(NamedTuple):
+    """A challenge record that is older than the threshold."""
+
+    zone_id: str
+    zone_name: str
+    record_id: str
+    name: str
+    created: datetime.datetime
+
+
+class SweepResult(NamedTuple):
+    """The outcome of a sweep."""
+
+    zones: int
+    stale: list[StaleRecord]
+    deleted: list[StaleRecord]
+    failed: list[tuple[StaleRecord, errors.PluginError]]
+
+
+def find_stale_records(
+    client: _IONOSClient,
+    older_than: float,
+    zone_names: list[str] | None = None,
+    now: datetime.datetime | None = None,
+    zone_filter: Callable[[str], bool] | None = None,
+) -> tuple[int, list[StaleRecord]]:
+    """
+    Stream the zones and their challenge records, keeping the stale ones.
+
+    Records without a parsable creation date are never considered stale.
+
+    :param client: The client to list zones and records with.
+    :param float older_than: Minimum age in seconds of a stale record.
+    :param list zone_names: Only look at these zones, if given.
+    :param datetime now: The current time, for tests.
+    :param zone_filter: Only look at the zones whose name it accepts, if given.
+    :returns: The number of zones looked at and the stale records.
+    :rtype: tuple
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    threshold = now - datetime.timedelta(seconds=older_than)
+    wanted = list(dict.fromkeys(name.strip(".").lower() for name in zone_names or []))
+    zone_items = (
+        (zone for name in wanted for zone in client.iter_zones(name))
+        if wanted
+        else client.iter_zones()
+    )
+
+    zones = 0
+    stale = []
+    seen = set()
+    for zone_item in zone_items:
+        zone_name = (zone_item.get("properties") or {}).get("zoneName", "")
+        # the API filters zone names by substring, e.g. example.com also
+        # lists myexample.com, so only the named zones are swept, once each
+        if (wanted and zone_name not in wanted) or zone_item["id"] in seen:
+            continue
+        seen.add(zone_item["id"])
+        if zone_filter is not None and not zone_filter(zone_name):
+            continue
+        zones += 1
+        for record in client.iter_records(zone_item["id"], CHALLENGE_PREFIX):
+            properties = record.get("properties") or {}
+            if properties.get("type", "TXT") != "TXT" or not properties.get(
+                "name", ""
+            ).startswith(CHALLENGE_PREFIX):
+                continue
+            created = _parse_date((record.get("metadata") or {}).get("createdDate"))
+            if created is None:
+                logger.debug("record %s has no creation date, skipping", record.get("id"))
+            elif created <= threshold:
+                stale.append(
+                    StaleRecord(
+                        zone_item["id"],
+                        zone_name,
+                        record["id"],
+                        properties["name"],
+                        created,
+                    )
+                )
+    return zones, stale
+
+
+def sweep(
+    client: _IONOSClient,
+    older_than: float,
+    zone_names: list[str] | None = None,
+    dry_run: bool = False,
+    now: datetime.datetime | None = None,
+    zone_filter: Callable[[str], bool] | None = None,
+) -> SweepResult:
+    """
+    Delete the stale challenge records of all zones.
+
+    All stale records are collected before any is deleted, so that the
+    deletions do not shift the pages of the listings still in progress.
+    Deletions run concurrently on the worker pool of the client.
+
+    :param client: The client to use.
+    :param float older_than: Minimum age in seconds of a stale record.
+    :param list zone_names: Only sweep these zones, if given.
+    :param bool dry_run: Only report the stale records.
+    :param datetime now: The current time, for tests.
+    :param zone_filter: Only sweep the zones whose name it accepts, if given.
+    :returns: What was found and deleted.
+    :rtype: SweepResult
+    """
+    zones, stale = find_stale_records(client, older_than, zone_names, now, zone_filter)
+    if dry_run or not stale:
+        return SweepResult(zones, stale, [], [])
+
+    errors_by_record = client.delete_records([(r.zone_id, r.record_id) for r in stale])
+    deleted = []
+    failed = []
+    for record, error in zip(stale, errors_by_record):
+        if error is None:
+            deleted.append(record)
+        else:
+            failed.append((record, error))
+    return SweepResult(zones, stale, deleted, failed)
+
+
+def sweep_routed(
+    client: _IONOSClient | _TokenRoutedClient,
+    older_than: float,
+    zone_names: list[str] | None = None,
+    dry_run: bool = False,
+) -> SweepResult:
+    """
+    Sweep the zones of every token of a client.
+
+    Each token only sweeps the zones routed to it, so that a zone visible
+    to several tokens is swept once, with the token the plugin writes it with.
+
+    See `sweep` for the parameters.
+    """
+    if isinstance(client, _IONOSClient):
+        return sweep(client, older_than, zone_names, dry_run)
+
+    results = []
+    for label, token_client in client.clients.items():
+        results.append(
+            sweep(
+                token_client,
+                older_than,
+                zone_names,
+                dry_run,
+                zone_filter=partial(_routed_to, client.routes, label),
+            )
+        )
+    return SweepResult(
+        sum(result.zones for result in results),
+        [record for result in results for record in result.stale],
+        [record for result in results for record in result.deleted],
+        [failure for result in results for failure in result.failed],
+    )
+
+
+def _routed_to(routes: list[tokens.TokenRoute], label: str, zone_name: str) -> bool:
+    return tokens.route_domain(routes, zone_name) == label
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Delete stale _acme-challenge TXT records from IONOS Cloud DNS."
+    )
+    parser.add_argument(
+        "--credentials",
+        required=True,
+        help="Credentials INI file of the dns-ionos-cloud plugin.",
+    )
+    parser.add_argument(
+        "--older-than",
+        type=float,
+        default=DEFAULT_OLDER_THAN,
+        help="Minimum age in seconds of the records to delete. (Default: %(default)s)",
+    )
+    parser.add_argument(
+        "--zone",
+        action="append",
+        dest="zones",
+        help="Only sweep this zone. Can be given several times.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only list the records that would be deleted.",
+    )
+    parser.add_argument(
+        "--endpoint",
+        help="Base URL of the IONOS Cloud DNS API, if not set in the credentials"
+        + " file. (Default: {0})".format(dns_api_base_url),
+    )
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=DEFAULT_RATE_LIMIT,
+        help="Maximum number of API calls per second. (Default: %(default)s)",
+    )
+    parser.add_argument("--max-retries", type=int, default=throttle.DEFAULT_MAX_RETRIES)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.WARNING,
+        format="%(levelname)s %(name)s: %(message)s",
+    )
+
+    try:
+        client = client_from_credentials(
+            args.credentials,
+            args.endpoint,
+            max_concurrency=args.max_concurrency,
+            max_retries=args.max_retries,
+            rate_limit=args.rate_limit,
+            page_size=args.page_size,
+        )
+        try:
+            result = sweep_routed(client, args.older_than, args.zones, args.dry_run)
+        finally:
+            client.close()
+    except errors.Error as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    _print_summary(result, args.dry_run)
+    return 1 if result.failed else 0
+
+
+def _print_summary(result: SweepResult, dry_run: bool) -> None:
+    listed = result.stale if dry_run else result.deleted
+    for record in listed:
+        print(
+            "{0} {1}.{2} (created {3})".format(
+                "would delete" if dry_run else "deleted",
+                record.name,
+                record.zone_name,
+                record.created.isoformat(),
+            )
+        )
+    for record, error in result.failed:
+        print(f"failed {record.name}.{record.zone_name}: {error}", file=sys.stderr)
+
+    by_zone: dict[str, int] = {}
+    for record in listed:
+        by_zone[record.zone_name] = by_zone.get(record.zone_name, 0) + 1
+    print(
+        "{0} {1} stale records in {2} of {3} zones{4}".format(
+            "Found" if dry_run else "Deleted",
+            len(listed),
+            len(by_zone),
+            result.zones,
+            f", {len(result.failed)} failed" if result.failed else "",
+        )
+    )
+
+
+def _parse_date(value: object) -> datetime.datetime | None:
+    if not isinstance(value, str):
+        return None
+    try:
+        date = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return date
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+
+from certbot import errors
+from certbot.plugins import dns_test_common
+from certbot.tests import util as test_util
+
+from certbot_dns_ionos_cloud import benchmark
+from certbot_dns_ionos_cloud.async_client import _AsyncIONOSClient
+from certbot_dns_ionos_cloud.fake_api import FakeIONOSServer
+from certbot_dns_ionos_cloud.ionos import Authenticator
+
+test_domain = "test_domain.de"
+
+
+class TestAsyncIONOSClient(unittest.TestCase):
+    def _run(self, server, scenario, **kwargs):
+        async def run():
+            # HTTP/2 is only negotiated over TLS, the fake server speaks HTTP/1.1
+            client = _AsyncIONOSClient("test_token", base_url=server.url, **kwargs)
+            try:
+                return await scenario(client)
+            finally:
+                await client.aclose()
+
+        return asyncio.run(run())
+
+    def test_records_are_created_and_deleted(self):
+        challenges = [
+            (test_domain, "_acme-challenge." + test_domain, "apex"),
+            (test_domain, "_acme-challenge." + test_domain, "wildcard"),
+            ("other.de", "_acme-challenge.www.other.de", "www"),
+        ]
+
+        async def scenario(client):
+            created = await client.add_txt_records(challenges)
+            contents = sorted(
+                r["properties"]["content"]
+                for records in server.records.values()
+                for r in records.values()
+            )
+            await client.del_txt_records(challenges, created)
+            return created, contents
+
+        with FakeIONOSServer([test_domain, "other.de"]) as server:
+            created, contents = self._run(server, scenario)
+            self.assertEqual(contents, ["apex", "wildcard", "www"])
+            self.assertEqual(len(created), 3)
+            self.assertEqual(sum(len(r) for r in server.records.values()), 0)
+            self.assertEqual(server.calls["DELETE /zones/{zoneId}/records/{recordId}"], 3)
+            self.assertEqual(server.calls["GET /zones"], 1)
+
+    def test_existing_records_are_not_created_twice(self):
+        challenge = (test_domain, "_acme-challenge." + test_domain, "apex")
+
+        async def scenario(client):
+            await client.add_txt_records([challenge])
+            await client.add_txt_records([challenge])
+
+        with FakeIONOSServer([test_domain]) as server:
+            self._run(server, scenario)
+            self.assertEqual(server.calls["POST /zones/{zoneId}/records"], 1)
+
+    def test_failed_zone_listing_is_retried_by_next_lookup(self):
+        async def scenario(client):
+            server.error_rate = 1.0
+            with self.assertRaisesRegex(errors.PluginError, "503"):
+                await client._find_zone("www." + test_domain)
+            server.error_rate = 0.0
+            return await client._find_zone("www." + test_domain)
+
+        with FakeIONOSServer([test_domain]) as server:
+            zone = self._run(server, scenario, max_retries=0)
+            self.assertEqual(zone[1], test_domain)
+            self.assertEqual(server.calls["GET /zones"], 2)
+
+    def test_listings_are_paginated(self):
+        zones = [f"zone{i}.de" for i in range(5)]
+
+        async def scenario(client):
+            return await client.get_nameservers("www.zone4.de")
+
+        with FakeIONOSServer(zones, max_page_size=2) as server:
+            nameservers = self._run(server, scenario, page_size=2)
+            self.assertEqual(server.calls["GET /zones"], 3)
+            self.assertTrue(nameservers)
+
+    def test_unknown_domain_fails_per_challenge(self):
+        challenges = [
+            (test_domain, "_acme-challenge." + test_domain, "known"),
+            ("unknown.de", "_acme-challenge.unknown.de", "unknown"),
+        ]
+
+        async def scenario(client):
+            await client.add_txt_records(challenges)
+
+        with FakeIONOSServer([test_domain]) as server:
+            with self.assertRaises(errors.PluginError):
+                self._run(server, scenario)
+            self.assertEqual(server.calls["POST /zones/{zoneId}/records"], 1)
+
+    @patch("asyncio.sleep")
+    def test_provisioning_is_awaited(self, mock_sleep):
+        mock_sleep.return_value = None
+        challenge = (test_domain, "_acme-challenge." + test_domain, "apex")
+
+        async def scenario(client):
+            await client.add_txt_records([challenge])
+
+        with FakeIONOSServer([test_domain], provisioning_polls=2) as server:
+            self._run(server, scenario)
+            states = [
+                r["metadata"]["state"]
+                for records in server.records.values()
+                for r in records.values()
+            ]
+            self.assertEqual(states, ["AVAILABLE"])
+
+    @patch("certbot_dns_ionos_cloud.throttle.backoff_delay", return_value=0)
+    def test_rate_limited_calls_are_retried(self, unused_mock_backoff):
+        challenges = [
+            (f"zone{i}.de", f"_acme-challenge.zone{i}.de", "value") for i in range(5)
+        ]
+
+        async def scenario(client):
+            created = await client.add_txt_records(challenges)
+            await client.del_txt_records(challenges, created)
+            return client.retry_count
+
+        zones = [f"zone{i}.de" for i in range(5)]
+        with FakeIONOSServer(zones, rate_limit_rate=0.3, seed=1) as server:
+            retries = self._run(server, scenario, max_retries=10)
+            self.assertGreater(retries, 0)
+            self.assertEqual(sum(len(r) for r in server.records.values()), 0)
+
+    def test_plan_txt_records_makes_no_writes(self):
+        challenges = [
+            (test_domain, "_acme-challenge." + test_domain, "apex"),
+            ("other.de", "_acme-challenge.other.de", "other"),
+        ]
+
+        async def scenario(client):
+            return await client.plan_txt_records(challenges)
+
+        with FakeIONOSServer([test_domain, "other.de"]) as server:
+            changes = self._run(server, scenario)
+            self.assertEqual(sorted(c.content for c in changes), ["apex", "other"])
+            self.assertEqual(server.calls["POST /zones/{zoneId}/records"], 0)
+
+    def test_delete_records_reports_each_record(self):
+        challenge = (test_domain, "_acme-challenge." + test_domain, "apex")
+
+        async def scenario(client):
+            created = await client.add_txt_records([challenge])
+            return await client.delete_records([created[challenge], ("zone", "gone")])
+
+        with FakeIONOSServer([test_domain]) as server:
+            self.assertEqual(self._run(server, scenario), [None, None])
+            self.assertEqual(sum(len(r) for r in server.records.values()), 0)
+
+    def test_zones_are_listed_again_once_stale(self):
+        async def scenario(client):
+            await client.resolve_zones([test_domain])
+            server.add_zone("new.de")
+            return await client.resolve_zones(["new.de"])
+
+        with FakeIONOSServer([test_domain]) as server:
+            resolved = self._run(server, scenario, zone_relist_interval=0)
+            self.assertEqual(resolved["new.de"][1], "new.de")
+            self.assertEqual(server.calls["GET /zones"], 2)
+
+
+class AsyncAuthenticatorTest(test_util.TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = FakeIONOSServer([dns_test_common.DOMAIN]).start()
+        self.addCleanup(self.server.stop)
+
+        path = os.path.join(self.tempdir, "file.ini")
+        dns_test_common.write({"dns_ionos_cloud_token": "test_token"}, path)
+        self.config = argparse.Namespace(**benchmark.plugin_defaults())
+        self.config.dns_ionos_cloud_credentials = path
+        self.config.dns_ionos_cloud_endpoint = self.server.url
+        self.config.dns_ionos_cloud_propagation_seconds = 0
+        self.config.dns_ionos_cloud_async = True
+        self.config.work_dir = self.tempdir
+        self.auth = Authenticator(self.config, benchmark.PLUGIN_NAME)
+
+    @test_util.patch_display_util()
+    def test_perform_and_cleanup_share_one_event_loop(self, unused_mock_get_utility):
+        achall = dns_test_common.BaseAuthenticatorTest.achall
+
+        self.auth.perform([achall])
+        loop = self.auth._loop
+        client = self.auth._async_client
+        self.assertEqual(sum(len(r) for r in self.server.records.values()), 1)
+        self.auth.cleanup([achall])
+
+        self.assertTrue(loop.is_closed())
+        self.assertIsNone(self.auth._loop)
+        self.assertTrue(client.session.is_closed)
+        self.assertEqual(sum(len(r) for r in self.server.records.values()), 0)
+        self.assertEqual(self.server.calls["GET /zones"], 1)
+
+    def test_missing_httpx_raises_plugin_error(self):
+        self.auth._setup_credentials()
+        with patch.dict("sys.modules", {"certbot_dns_ionos_cloud.async_client": None}):
+            with self.assertRaises(errors.PluginError):
+                self.auth._get_async_client()
+
+    def test_missing_h2_raises_plugin_error(self):
+        self.auth._setup_credentials()
+        with patch("httpx.AsyncClient", side_effect=ImportError("h2 is not installed")):
+            with self.assertRaisesRegex(errors.PluginError, "h2 is not installed"):
+                self.auth._get_async_client()
+
+
+if __name__ == "__main__":
+    unittest.main()
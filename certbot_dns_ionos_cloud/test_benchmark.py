@@ -0,0 +1,53 @@
+import io
+import json
+import unittest
+from contextlib import redirect_stdout
+
+import josepy as jose
+from certbot.tests import util as test_util
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from certbot_dns_ionos_cloud import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    @test_util.patch_display_util()
+    def test_scenario_reports_calls_and_cleans_up(self, unused_mock_get_utility):
+        account_key = jose.JWKRSA(
+            key=rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        )
+        result = benchmark.run_scenario(
+            4,
+            2,
+            account_key,
+            options={benchmark._config_key("provisioning-timeout"): 0},
+        )
+
+        self.assertEqual(result["leftover_records"], 0)
+        self.assertEqual(result["cleanup_calls"], 4)
+        self.assertEqual(result["calls"]["POST /zones/{zoneId}/records"], 4)
+        self.assertGreater(result["peak_memory_bytes"], 0)
+
+    def test_main_prints_json_results(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            code = benchmark.main(
+                ["--sans", "2", "--zones", "1", "--json", "-o", "provisioning-timeout=0"]
+            )
+
+        self.assertEqual(code, 0)
+        self.assertEqual(json.loads(output.getvalue())[0]["leftover_records"], 0)
+
+    def test_options_are_parsed_with_the_type_of_their_default(self):
+        self.assertEqual(
+            benchmark._parse_option("max-concurrency=8"),
+            ("dns_ionos_cloud_max_concurrency", 8),
+        )
+        self.assertEqual(
+            benchmark._parse_option("wait-until-visible=true"),
+            ("dns_ionos_cloud_wait_until_visible", True),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
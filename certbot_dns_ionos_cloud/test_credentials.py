@@ -0,0 +1,59 @@
+import os
+import unittest
+
+from certbot import errors
+from certbot.plugins import dns_test_common
+from certbot.tests import util as test_util
+from certbot_dns_ionos_cloud.credentials import client_from_credentials
+from certbot_dns_ionos_cloud.fake_api import FakeIONOSServer
+from certbot_dns_ionos_cloud.ionos import _IONOSClient, _TokenRoutedClient
+
+
+class ClientFromCredentialsTest(test_util.TempDirTestCase):
+    def _client(self, credentials, endpoint=None):
+        path = os.path.join(self.tempdir, "credentials.ini")
+        dns_test_common.write(credentials, path)
+        client = client_from_credentials(path, endpoint)
+        self.addCleanup(client.close)
+        return client
+
+    def test_single_token_builds_one_client(self):
+        client = self._client({"dns_ionos_cloud_token": "token"}, "http://api.test")
+        self.assertIsInstance(client, _IONOSClient)
+        self.assertEqual(client.base_url, "http://api.test")
+
+    def test_zones_are_routed_to_their_token(self):
+        client = self._client(
+            {
+                "dns_ionos_cloud_token": "token",
+                "dns_ionos_cloud_token_b": "b_token",
+                "dns_ionos_cloud_zones_b": "b.de",
+            }
+        )
+        self.assertIsInstance(client, _TokenRoutedClient)
+        self.assertEqual(
+            client.client_for("www.b.de").headers["Authorization"], "Bearer b_token"
+        )
+        self.assertEqual(
+            client.client_for("a.de").headers["Authorization"], "Bearer token"
+        )
+
+    def test_fastest_candidate_endpoint_is_used(self):
+        with FakeIONOSServer([]) as server:
+            client = self._client(
+                {
+                    "dns_ionos_cloud_token": "token",
+                    "dns_ionos_cloud_endpoints": f"http://127.0.0.1:1, {server.url}",
+                }
+            )
+            self.assertEqual(client.base_url, server.url)
+
+    def test_invalid_routes_raise_error(self):
+        with self.assertRaises(errors.PluginError):
+            self._client(
+                {"dns_ionos_cloud_token": "token", "dns_ionos_cloud_token_b": "b_token"}
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import socket
+import unittest
+
+from certbot import errors
+from certbot.tests import util as test_util
+
+from certbot_dns_ionos_cloud import endpoints
+from certbot_dns_ionos_cloud.fake_api import FakeIONOSServer
+
+
+def _closed_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        host, port = sock.getsockname()
+    return f"http://{host}:{port}"
+
+
+class SelectEndpointTest(test_util.TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_path = os.path.join(self.tempdir, "endpoint.json")
+
+    def test_fastest_healthy_endpoint_is_picked(self):
+        with FakeIONOSServer([], latency=0.2) as slow, FakeIONOSServer([]) as fast:
+            candidates = [_closed_url(), slow.url, fast.url]
+            endpoint = endpoints.select_endpoint(candidates, "token", timeout=2)
+            self.assertEqual(endpoint, fast.url)
+            self.assertEqual(slow.calls["GET /zones"], 1)
+
+    def test_unhealthy_endpoints_are_skipped(self):
+        with FakeIONOSServer([], error_rate=1.0) as failing, FakeIONOSServer([]) as ok:
+            endpoint = endpoints.select_endpoint([failing.url, ok.url], "token")
+            self.assertEqual(endpoint, ok.url)
+
+    def test_choice_is_cached_for_the_same_candidates(self):
+        with FakeIONOSServer([]) as server:
+            candidates = [server.url, _closed_url()]
+            endpoints.select_endpoint(candidates, "token", self.cache_path, ttl=60)
+            cached = endpoints.select_endpoint(
+                candidates, "token", self.cache_path, ttl=60
+            )
+            self.assertEqual(cached, server.url)
+            self.assertEqual(server.calls["GET /zones"], 1)
+
+            endpoints.select_endpoint([server.url], "token", self.cache_path, ttl=60)
+            self.assertEqual(server.calls["GET /zones"], 2)
+
+    def test_expired_choice_is_probed_again(self):
+        with FakeIONOSServer([]) as server:
+            endpoints.select_endpoint([server.url], "token", self.cache_path, ttl=60)
+            endpoints.select_endpoint([server.url], "token", self.cache_path, ttl=0)
+            self.assertEqual(server.calls["GET /zones"], 2)
+
+    def test_no_healthy_endpoint_raises_error(self):
+        with self.assertRaises(errors.PluginError):
+            endpoints.select_endpoint([_closed_url()], "token", timeout=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+from unittest.mock import patch
+
+from certbot import errors
+from certbot_dns_ionos_cloud.fake_api import FakeIONOSServer
+from certbot_dns_ionos_cloud.ionos import _IONOSClient
+
+test_domain = "test_domain.de"
+
+
+class TestFakeIONOSServer(unittest.TestCase):
+    def _client(self, server, **kwargs):
+        client = _IONOSClient("test_token", base_url=server.url, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_records_are_created_and_deleted(self):
+        challenges = [
+            (test_domain, "_acme-challenge." + test_domain, "apex"),
+            (test_domain, "_acme-challenge." + test_domain, "wildcard"),
+        ]
+        with FakeIONOSServer([test_domain, "other.de"]) as server:
+            client = self._client(server)
+            created = client.add_txt_records(challenges)
+            self.assertEqual(
+                sorted(
+                    r["properties"]["content"]
+                    for records in server.records.values()
+                    for r in records.values()
+                ),
+                ["apex", "wildcard"],
+            )
+
+            client.del_txt_records(challenges, created)
+            self.assertEqual(sum(len(r) for r in server.records.values()), 0)
+            self.assertEqual(server.calls["DELETE /zones/{zoneId}/records/{recordId}"], 2)
+
+    def test_failed_zone_listing_is_retried_by_next_lookup(self):
+        with FakeIONOSServer([test_domain]) as server:
+            client = self._client(server, max_retries=0)
+            server.error_rate = 1.0
+            with self.assertRaisesRegex(errors.PluginError, "503"):
+                client._find_zone("www." + test_domain)
+
+            server.error_rate = 0.0
+            self.assertEqual(client._find_zone("www." + test_domain)[1], test_domain)
+            self.assertEqual(server.calls["GET /zones"], 2)
+
+    @patch("time.sleep")
+    def test_unprefixed_targets_are_listed_by_name(self, unused_mock_sleep):
+        challenges = [
+            ("token-a.acme.example.net", "token-a.acme.example.net", "a"),
+            ("token-b.acme.example.net", "token-b.acme.example.net", "b"),
+        ]
+        with FakeIONOSServer(["acme.example.net"], provisioning_polls=1) as server:
+            client = self._client(server, record_prefix="")
+            with patch.object(client, "iter_records", wraps=client.iter_records) as spy:
+                created = client.add_txt_records(challenges)
+                client.del_txt_records(challenges)
+
+            self.assertEqual(len(created), 2)
+            self.assertEqual(sum(len(r) for r in server.records.values()), 0)
+            # the targets share no label, so each is listed by its own name
+            self.assertEqual(
+                {c.args[1] for c in spy.call_args_list}, {"token-a", "token-b"}
+            )
+
+    def test_records_are_deleted_by_id(self):
+        challenge = (test_domain, "_acme-challenge." + test_domain, "v")
+        with FakeIONOSServer([test_domain]) as server:
+            client = self._client(server)
+            zone_id, record_id = client.add_txt_records([challenge])[challenge]
+
+            self.assertEqual(
+                client.delete_records([(zone_id, record_id), (zone_id, "gone")]),
+                [None, None],
+            )
+            self.assertEqual(server.records[zone_id], {})
+
+    def test_listings_are_paginated(self):
+        zones = [f"zone{i}.de" for i in range(5)]
+        with FakeIONOSServer(zones, max_page_size=2) as server:
+            client = self._client(server)
+            self.assertEqual(len(list(client.iter_zones())), 5)
+            self.assertEqual(server.calls["GET /zones"], 3)
+
+    def test_zones_are_resolved_concurrently_from_one_listing(self):
+        zones = [f"zone{i}.de" for i in range(20)]
+        domains = [f"www.zone{i}.de" for i in range(20)] + ["unknown.de"]
+        with FakeIONOSServer(zones, max_page_size=3) as server:
+            client = self._client(server, max_concurrency=8, page_size=3)
+            client.check_token()
+            resolved = client.resolve_zones(domains)
+            self.assertEqual(resolved["www.zone7.de"][1], "zone7.de")
+            self.assertIsInstance(resolved["unknown.de"], errors.PluginError)
+            # one call for the token, then a single listing of 7 pages
+            self.assertEqual(server.calls["GET /zones"], 1 + 7)
+
+            client.add_txt_records(
+                [("www.zone7.de", "_acme-challenge.www.zone7.de", "v")]
+            )
+            self.assertEqual(server.calls["GET /zones"], 1 + 7)
+
+    def test_rejected_token_fails_check(self):
+        with FakeIONOSServer([test_domain]) as server:
+            client = self._client(server)
+            client.session.headers.pop("Authorization")
+            with self.assertRaises(errors.PluginError):
+                client.check_token()
+
+    @patch("time.sleep")
+    def test_created_records_are_provisioned_asynchronously(self, mock_sleep):
+        with FakeIONOSServer([test_domain], provisioning_polls=2) as server:
+            client = self._client(server)
+            client.add_txt_record(test_domain, "_acme-challenge." + test_domain, "v")
+            self.assertEqual(server.calls["GET /records"], 3)
+            self.assertEqual(mock_sleep.call_count, 2)
+
+    @patch("time.sleep")
+    def test_records_without_challenge_prefix_are_found_with_empty_prefix(
+        self, mock_sleep
+    ):
+        challenge = ("acme.de", "token.acme.de", "v")
+        with FakeIONOSServer(["acme.de"], provisioning_polls=1) as server:
+            client = self._client(server, record_prefix="")
+            client.add_txt_records([challenge])
+            client.add_txt_records([challenge])
+            client.del_txt_records([challenge])
+
+            self.assertEqual(server.calls["POST /zones/{zoneId}/records"], 1)
+            self.assertEqual(sum(len(r) for r in server.records.values()), 0)
+
+    def test_injected_failures_are_retried(self):
+        with FakeIONOSServer([test_domain], rate_limit_rate=0.5, seed=1) as server:
+            client = self._client(server, max_retries=10)
+            client.add_txt_record(test_domain, "_acme-challenge." + test_domain, "v")
+            self.assertGreater(client.retry_count, 0)
+            self.assertEqual(sum(len(r) for r in server.records.values()), 1)
+
+    def test_missing_token_is_rejected(self):
+        with FakeIONOSServer([test_domain]) as server:
+            client = self._client(server)
+            client.session.headers.pop("Authorization")
+            with self.assertRaises(errors.PluginError):
+                list(client.iter_zones())
+
+
+if __name__ == "__main__":
+    unittest.main()
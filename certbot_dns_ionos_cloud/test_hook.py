@@ -0,0 +1,270 @@
+import io
+import os
+import socket
+import subprocess
+import sys
+import threading
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest.mock import Mock, patch
+
+from certbot import errors
+from certbot.plugins import dns_test_common
+from certbot.tests import util as test_util
+from certbot_dns_ionos_cloud import daemon, hook
+from certbot_dns_ionos_cloud.fake_api import FakeIONOSServer
+from certbot_dns_ionos_cloud.ionos import _IONOSClient
+
+test_domain = "test_domain.de"
+
+
+class HookTest(test_util.TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = FakeIONOSServer([test_domain]).start()
+        self.addCleanup(self.server.stop)
+        self.credentials = os.path.join(self.tempdir, "credentials.ini")
+        dns_test_common.write(
+            {
+                "dns_ionos_cloud_token": "token",
+                "dns_ionos_cloud_endpoint": self.server.url,
+            },
+            self.credentials,
+        )
+
+    def _contents(self):
+        return sorted(
+            (r["properties"]["name"], r["properties"]["content"])
+            for records in self.server.records.values()
+            for r in records.values()
+        )
+
+    def _start_daemon(self, batch_window, **options):
+        client = _IONOSClient(
+            "token", base_url=self.server.url, provisioning_timeout=0, **options
+        )
+        self.addCleanup(client.close)
+        path = os.path.join(self.tempdir, "hook.sock")
+        server = daemon.make_server(path, daemon.HookDaemon(client, batch_window))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return path
+
+    def test_hook_writes_record_without_daemon(self):
+        environ = {"CERTBOT_DOMAIN": "www." + test_domain, "CERTBOT_VALIDATION": "v"}
+        with patch.dict(os.environ, environ):
+            self.assertEqual(hook.main(["auth", "--credentials", self.credentials]), 0)
+            self.assertEqual(self._contents(), [("_acme-challenge.www", "v")])
+            self.assertEqual(hook.main(["cleanup", "--credentials", self.credentials]), 0)
+        self.assertEqual(self._contents(), [])
+
+    def test_hook_writes_wildcard_record_at_covered_name(self):
+        code = hook.main(
+            [
+                "auth",
+                "--credentials",
+                self.credentials,
+                "--domain",
+                "*." + test_domain,
+                "--validation",
+                "v",
+            ]
+        )
+        self.assertEqual(code, 0)
+        self.assertEqual(self._contents(), [("_acme-challenge", "v")])
+
+    def test_hook_reports_unknown_domain(self):
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            code = hook.main(
+                [
+                    "auth",
+                    "--credentials",
+                    self.credentials,
+                    "--domain",
+                    "unknown.de",
+                    "--validation",
+                    "v",
+                ]
+            )
+        self.assertEqual(code, 1)
+        self.assertIn("Domain not known", stderr.getvalue())
+
+    def test_daemon_batches_concurrent_requests(self):
+        path = self._start_daemon(batch_window=0.5)
+        codes = []
+
+        def call(command, name):
+            codes.append(
+                hook.main(
+                    [command, "--socket", path, "--domain", name, "--validation", "v"]
+                )
+            )
+
+        names = [f"host{i}.{test_domain}" for i in range(5)]
+        for command in ("auth", "cleanup"):
+            threads = [threading.Thread(target=call, args=(command, n)) for n in names]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            if command == "auth":
+                self.assertEqual(len(self._contents()), 5)
+
+        self.assertEqual(codes, [0] * 10)
+        self.assertEqual(self._contents(), [])
+        # one zone listing and one record listing for all additions; the
+        # records are deleted by ID
+        self.assertEqual(self.server.calls["GET /zones"], 1)
+        self.assertEqual(self.server.calls["GET /records"], 1)
+        self.assertEqual(
+            self.server.calls["DELETE /zones/{zoneId}/records/{recordId}"], 5
+        )
+
+    def test_daemon_finds_zones_created_after_listing(self):
+        path = self._start_daemon(batch_window=0, zone_relist_interval=0)
+        request = {"action": "add", "domain": "www." + test_domain, "validation": "v"}
+        self.assertEqual(hook.send(path, request), {"ok": True})
+        self.server.add_zone("new.de")
+
+        request = {"action": "add", "domain": "new.de", "validation": "v"}
+        self.assertEqual(hook.send(path, request), {"ok": True})
+        self.assertEqual(self.server.calls["GET /zones"], 2)
+
+    def test_daemon_answers_every_request_of_a_crashed_batch(self):
+        client = Mock()
+        client.add_txt_records.side_effect = KeyError("id")
+        hook_daemon = daemon.HookDaemon(client, batch_window=0.5)
+        responses = []
+
+        def call(name):
+            responses.append(
+                hook_daemon.handle_request(
+                    {"action": "add", "domain": name, "validation": "v"}
+                )
+            )
+
+        threads = [
+            threading.Thread(target=call, args=(f"{i}.{test_domain}",)) for i in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(len(responses), 3)
+        self.assertTrue(all(not r["ok"] and "KeyError" in r["error"] for r in responses))
+        self.assertEqual(client.add_txt_records.call_count, 1)
+
+    def test_stale_socket_is_replaced(self):
+        path = os.path.join(self.tempdir, "stale.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(path)
+
+        server = daemon.make_server(path, daemon.HookDaemon(Mock()))
+        server.server_close()
+
+    def test_files_and_live_sockets_are_not_replaced(self):
+        path = os.path.join(self.tempdir, "important.txt")
+        with open(path, "w") as f:
+            f.write("keep")
+        with self.assertRaisesRegex(errors.PluginError, "not a socket"):
+            daemon.make_server(path, daemon.HookDaemon(Mock()))
+        with open(path) as f:
+            self.assertEqual(f.read(), "keep")
+
+        live = self._start_daemon(batch_window=0)
+        with self.assertRaisesRegex(errors.PluginError, "Another daemon"):
+            daemon.make_server(live, daemon.HookDaemon(Mock()))
+        self.assertEqual(
+            hook.send(live, {"action": "update"}),
+            {"ok": False, "error": "malformed request"},
+        )
+
+    def test_daemon_rejects_malformed_requests(self):
+        path = self._start_daemon(batch_window=0)
+
+        self.assertEqual(
+            hook.send(path, {"action": "update", "domain": test_domain}),
+            {"ok": False, "error": "malformed request"},
+        )
+
+    def test_unreachable_daemon_fails(self):
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            code = hook.main(
+                [
+                    "auth",
+                    "--socket",
+                    os.path.join(self.tempdir, "missing.sock"),
+                    "--domain",
+                    test_domain,
+                    "--validation",
+                    "v",
+                ]
+            )
+        self.assertEqual(code, 2)
+
+    def test_plan_prints_changes_without_writing(self):
+        self.assertEqual(
+            hook.main(
+                [
+                    "auth",
+                    "--credentials",
+                    self.credentials,
+                    "--domain",
+                    test_domain,
+                    "--validation",
+                    "a",
+                ]
+            ),
+            0,
+        )
+        self.server.calls.clear()
+
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            code = hook.main(
+                [
+                    "plan",
+                    "--credentials",
+                    self.credentials,
+                    "--domain",
+                    test_domain,
+                    "--domain",
+                    "www." + test_domain,
+                    "--domain",
+                    "*.www." + test_domain,
+                    "--validation",
+                    "a",
+                ]
+            )
+
+        self.assertEqual(code, 0)
+        # the wildcard shares the record of www
+        self.assertEqual(
+            stdout.getvalue(), f"create TXT _acme-challenge.www.{test_domain} 'a'\n"
+        )
+        self.assertEqual(
+            [call for call in self.server.calls if not call.startswith("GET ")], []
+        )
+        self.assertEqual(self._contents(), [("_acme-challenge", "a")])
+
+    def test_hook_imports_only_the_standard_library(self):
+        output = subprocess.check_output(
+            [
+                sys.executable,
+                "-c",
+                "import sys; import certbot_dns_ionos_cloud.hook;"
+                " print(sorted(m for m in sys.modules"
+                " if m.split('.')[0] in ('certbot', 'requests', 'acme')))",
+            ],
+            text=True,
+        )
+        self.assertEqual(output.strip(), "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
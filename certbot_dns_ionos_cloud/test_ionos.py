@@ -1,9 +1,32 @@
+import json
+import os
 import unittest
-from unittest.mock import patch, Mock
+from unittest.mock import ANY, patch, Mock
 
-from certbot import errors
-from certbot_dns_ionos_cloud.ionos import _IONOSClient
+import requests
 
+from acme import messages
+from certbot import achallenges, errors
+from certbot.plugins import dns_test_common
+from certbot.plugins.dns_test_common import DOMAIN
+from certbot.tests import acme_util
+from certbot.tests import util as test_util
+from certbot_dns_ionos_cloud import propagation
+from certbot_dns_ionos_cloud.ionos import (
+    Authenticator,
+    _IONOSClient,
+    _ProvisioningWait,
+    _read_page,
+    _Retries,
+    _Write,
+    _ZoneIndex,
+    dns_api_base_url,
+)
+
+try:
+    from certbot._internal.san import DNSName
+except ImportError:  # certbot < 5 passes domains as strings
+    DNSName = None  # type: ignore[assignment,misc]
 
 test_domain = "test_domain.de"
 test_record_name = "_acme-challenge.test_domain.de"
@@ -17,10 +40,17 @@ class TestIONOSClient(unittest.TestCase):
         self.client = _IONOSClient("test_token")
         self.mock_response = Mock()
 
+    def _patch_request(self, *responses):
+        return patch.object(self.client.session, "request", side_effect=list(responses))
+
+    @staticmethod
+    def _methods(mock_request):
+        return [c.args[0] for c in mock_request.call_args_list]
+
     def test_add_txt_record_with_non_ok_result_raises_exception(self):
         self.mock_response.status_code = 401
 
-        with patch("requests.get", return_value=self.mock_response) as mock_get:
+        with self._patch_request(self.mock_response) as mock_request:
             with self.assertRaises(errors.PluginError) as context:
                 self.client.add_txt_record(
                     test_domain, test_record_name, test_record_content
@@ -28,19 +58,19 @@ class TestIONOSClient(unittest.TestCase):
             self.assertEqual(
                 str(context.exception), "Received non OK status from IONOS API 401"
             )
-            mock_get.assert_called_once()
+            mock_request.assert_called_once()
 
     def test_add_txt_record_find_zone_id_with_no_result_raises_exception(self):
         self.mock_response.json.return_value = {"items": []}
         self.mock_response.status_code = 200
 
-        with patch("requests.get", return_value=self.mock_response) as mock_get:
+        with self._patch_request(self.mock_response) as mock_request:
             with self.assertRaises(errors.PluginError) as context:
                 self.client.add_txt_record(
                     test_domain, test_record_name, test_record_content
                 )
             self.assertEqual(str(context.exception), "Domain not known")
-            mock_get.assert_called_once()
+            mock_request.assert_called_once()
 
     def test_add_txt_record_find_zone_id_with_unkown_zone_raises_exception(self):
         self.mock_response.json.return_value = {
@@ -48,13 +78,13 @@ class TestIONOSClient(unittest.TestCase):
         }
         self.mock_response.status_code = 200
 
-        with patch("requests.get", return_value=self.mock_response) as mock_get:
+        with self._patch_request(self.mock_response) as mock_request:
             with self.assertRaises(errors.PluginError) as context:
                 self.client.add_txt_record(
                     test_domain, test_record_name, test_record_content
                 )
             self.assertEqual(str(context.exception), "Domain not known")
-            mock_get.assert_called_once()
+            mock_request.assert_called_once()
 
     def test_add_txt_record_with_not_found_record_creates_record(self):
         get_zones_response = Mock()
@@ -72,13 +102,9 @@ class TestIONOSClient(unittest.TestCase):
         insert_response = Mock()
         insert_response.status_code = 202
 
-        with patch("requests.get", side_effect=responses) as mock_get:
-            with patch("requests.post", return_value=insert_response) as mock_post:
-                self.client.add_txt_record(
-                    test_domain, test_record_name, test_record_content
-                )
-                assert len(mock_get.mock_calls) == 2
-                mock_post.assert_called()
+        with self._patch_request(*responses, insert_response) as mock_request:
+            self.client.add_txt_record(test_domain, test_record_name, test_record_content)
+            assert self._methods(mock_request) == ["GET", "GET", "POST"]
 
     def test_add_txt_record_with_exisiting_record_same_content_does_nothing(self):
         get_zones_response = Mock()
@@ -103,11 +129,11 @@ class TestIONOSClient(unittest.TestCase):
         }
         responses = [get_zones_response, get_records_response]
 
-        with patch("requests.get", side_effect=responses) as mock_get:
+        with self._patch_request(*responses) as mock_request:
             self.client.add_txt_record(test_domain, test_record_name, test_record_content)
-            assert len(mock_get.mock_calls) == 2
+            assert self._methods(mock_request) == ["GET", "GET"]
 
-    def test_add_txt_record_with_exisiting_record_different_updates_record(self):
+    def test_add_txt_record_with_exisiting_record_different_adds_record(self):
         get_zones_response = Mock()
         get_zones_response.status_code = 200
         get_zones_response.json.return_value = {
@@ -131,28 +157,24 @@ class TestIONOSClient(unittest.TestCase):
 
         responses = [get_zones_response, get_records_response]
 
-        update_response = Mock()
-        update_response.status_code = 202
+        insert_response = Mock()
+        insert_response.status_code = 202
 
-        with patch("requests.get", side_effect=responses) as mock_get:
-            with patch("requests.put", return_value=update_response) as mock_put:
-                self.client.add_txt_record(
-                    test_domain, test_record_name, test_record_content
-                )
-                assert mock_get.call_count == 2
-                mock_put.assert_called()
+        with self._patch_request(*responses, insert_response) as mock_request:
+            self.client.add_txt_record(test_domain, test_record_name, test_record_content)
+            assert self._methods(mock_request) == ["GET", "GET", "POST"]
 
     def test_delete_txt_record_find_zone_id_with_no_result_raises_exception(self):
         self.mock_response.json.return_value = {"items": []}
         self.mock_response.status_code = 200
 
-        with patch("requests.get", return_value=self.mock_response) as mock_get:
+        with self._patch_request(self.mock_response) as mock_request:
             with self.assertRaises(errors.PluginError) as context:
                 self.client.del_txt_record(
                     test_domain, test_record_name, test_record_content
                 )
             self.assertEqual(str(context.exception), "Domain not known")
-            mock_get.assert_called_once()
+            mock_request.assert_called_once()
 
     def test_delete_record_find_zone_id_with_unkown_zone_raises_exception(self):
         self.mock_response.json.return_value = {
@@ -160,13 +182,13 @@ class TestIONOSClient(unittest.TestCase):
         }
         self.mock_response.status_code = 200
 
-        with patch("requests.get", return_value=self.mock_response) as mock_get:
+        with self._patch_request(self.mock_response) as mock_request:
             with self.assertRaises(errors.PluginError) as context:
                 self.client.del_txt_record(
                     test_domain, test_record_name, test_record_content
                 )
             self.assertEqual(str(context.exception), "Domain not known")
-            mock_get.assert_called_once()
+            mock_request.assert_called_once()
 
     def test_delete_txt_record_with_not_found_record_does_nothing(self):
         get_zones_response = Mock()
@@ -181,13 +203,9 @@ class TestIONOSClient(unittest.TestCase):
 
         responses = [get_zones_response, get_records_response]
 
-        with patch("requests.get", side_effect=responses) as mock_get:
-            with patch("requests.delete", return_value={}) as mock_delete:
-                self.client.del_txt_record(
-                    test_domain, test_record_name, test_record_content
-                )
-                mock_delete.assert_not_called()
-                assert mock_get.call_count == 2
+        with self._patch_request(*responses) as mock_request:
+            self.client.del_txt_record(test_domain, test_record_name, test_record_content)
+            assert self._methods(mock_request) == ["GET", "GET"]
 
     def test_delete_txt_record_with_existing_record_and_different_content_does_nothing(
         self,
@@ -215,13 +233,9 @@ class TestIONOSClient(unittest.TestCase):
 
         responses = [get_zones_response, get_records_response]
 
-        with patch("requests.get", side_effect=responses) as mock_get:
-            with patch("requests.delete", return_value={}) as mock_delete:
-                self.client.del_txt_record(
-                    test_domain, test_record_name, test_record_content
-                )
-                mock_delete.assert_not_called()
-                assert mock_get.call_count == 2
+        with self._patch_request(*responses) as mock_request:
+            self.client.del_txt_record(test_domain, test_record_name, test_record_content)
+            assert self._methods(mock_request) == ["GET", "GET"]
 
     def test_delete_txt_record_with_existing_record_and_same_content_succeeds(self):
         get_zones_response = Mock()
@@ -250,13 +264,975 @@ class TestIONOSClient(unittest.TestCase):
         delete_response = Mock()
         delete_response.status_code = 202
 
-        with patch("requests.get", side_effect=responses) as mock_get:
-            with patch("requests.delete", return_value=delete_response) as mock_delete:
+        with self._patch_request(*responses, delete_response) as mock_request:
+            self.client.del_txt_record(test_domain, test_record_name, test_record_content)
+            assert self._methods(mock_request) == ["GET", "GET", "DELETE"]
+
+    def test_requests_use_configured_timeout(self):
+        client = _IONOSClient("test_token", timeout=(1, 2))
+        self.mock_response.status_code = 200
+        self.mock_response.json.return_value = {"items": []}
+
+        with patch.object(
+            client.session, "request", return_value=self.mock_response
+        ) as mock_request:
+            client.get_existing_txt_acme_record(zone_id, "_acme-challenge")
+            self.assertEqual(mock_request.call_args.kwargs["timeout"], (1, 2))
+
+    @patch("time.sleep")
+    def test_connection_error_raises_plugin_error_after_retries(self, mock_sleep):
+        with patch.object(
+            self.client.session,
+            "request",
+            side_effect=requests.exceptions.ConnectTimeout("timed out"),
+        ) as mock_request:
+            with self.assertRaises(errors.PluginError) as context:
                 self.client.del_txt_record(
                     test_domain, test_record_name, test_record_content
                 )
-                assert mock_delete.call_count == 1
-                assert mock_get.call_count == 2
+            self.assertEqual(
+                str(context.exception), "Error communicating with IONOS API: timed out"
+            )
+            self.assertEqual(mock_request.call_count, 6)
+        self.assertEqual(self.client.retry_count, 5)
+
+    @patch("time.sleep")
+    def test_rate_limited_request_is_retried_after_retry_after(self, mock_sleep):
+        rate_limited_response = Mock()
+        rate_limited_response.status_code = 429
+        rate_limited_response.headers = {"Retry-After": "3"}
+        server_error_response = Mock()
+        server_error_response.status_code = 503
+        server_error_response.headers = {}
+
+        with self._patch_request(
+            rate_limited_response,
+            server_error_response,
+            self._zones_response(),
+            self._records_response(),
+        ) as mock_request:
+            self.client.del_txt_record(test_domain, test_record_name, test_record_content)
+            assert self._methods(mock_request) == ["GET", "GET", "GET", "GET"]
+        self.assertEqual(mock_sleep.call_args_list[0].args, (3.0,))
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(self.client.retry_count, 2)
+
+    @patch("time.sleep")
+    def test_failed_post_is_retried_only_if_record_was_not_created(self, mock_sleep):
+        server_error_response = Mock()
+        server_error_response.status_code = 502
+        server_error_response.headers = {}
+        insert_response = Mock()
+        insert_response.status_code = 202
+
+        with self._patch_request(
+            self._zones_response(),
+            self._records_response(),
+            server_error_response,
+            self._records_response(),
+            insert_response,
+        ) as mock_request:
+            self.client.add_txt_record(test_domain, test_record_name, test_record_content)
+            assert self._methods(mock_request) == ["GET", "GET", "POST", "GET", "POST"]
+
+    @patch("time.sleep")
+    def test_failed_post_is_not_repeated_if_record_was_created(self, mock_sleep):
+        server_error_response = Mock()
+        server_error_response.status_code = 504
+        server_error_response.headers = {}
+
+        with self._patch_request(
+            self._zones_response(),
+            self._records_response(),
+            server_error_response,
+            self._records_response(("1", "_acme-challenge", test_record_content)),
+        ) as mock_request:
+            self.client.add_txt_record(test_domain, test_record_name, test_record_content)
+            assert self._methods(mock_request) == ["GET", "GET", "POST", "GET"]
+
+    def test_empty_response_body_is_accepted(self):
+        delete_response = Mock()
+        delete_response.status_code = 202
+        delete_response.content = b""
+
+        with self._patch_request(
+            self._zones_response(),
+            self._records_response(("1", "_acme-challenge", test_record_content)),
+            delete_response,
+        ) as mock_request:
+            self.client.del_txt_record(test_domain, test_record_name, test_record_content)
+            assert self._methods(mock_request) == ["GET", "GET", "DELETE"]
+        delete_response.json.assert_not_called()
+
+    @patch("time.sleep")
+    def test_calls_are_recorded_with_status_and_retries(self, mock_sleep):
+        client = _IONOSClient("test_token", max_retries=2)
+        unavailable_response = Mock()
+        unavailable_response.status_code = 503
+        unavailable_response.headers = {}
+
+        with patch.object(
+            client.session,
+            "request",
+            side_effect=[
+                unavailable_response,
+                self._zones_response(),
+                self._records_response(),
+            ],
+        ):
+            list(client.iter_zones())
+            client.get_existing_txt_acme_record(zone_id, test_record_name)
+
+        calls = client.metrics.calls
+        self.assertEqual(
+            [(c.method, c.endpoint, c.status, c.retries) for c in calls],
+            [("GET", "/zones", 200, 1), ("GET", "/records", 200, 0)],
+        )
+
+    def test_session_mounts_pool_of_configured_size(self):
+        client = _IONOSClient("test_token", pool_size=25)
+        adapter = client.session.get_adapter("https://dns.de-fra.ionos.com")
+        self.assertEqual(adapter._pool_maxsize, 25)
+        self.assertEqual(client.session.headers["Authorization"], "Bearer test_token")
+
+    def test_add_txt_record_with_cached_zone_skips_zone_lookup(self):
+        self.client.zone_cache.set(test_domain, zone_id, test_domain)
+        get_records_response = Mock()
+        get_records_response.status_code = 200
+        get_records_response.json.return_value = {"items": []}
+        insert_response = Mock()
+        insert_response.status_code = 202
+
+        with self._patch_request(get_records_response, insert_response) as mock_request:
+            self.client.add_txt_record(test_domain, test_record_name, test_record_content)
+            assert self._methods(mock_request) == ["GET", "POST"]
+            self.assertEqual(
+                mock_request.call_args.args[1],
+                f"https://dns.de-fra.ionos.com/zones/{zone_id}/records",
+            )
+
+    def test_add_txt_record_with_stale_cached_zone_looks_up_zone_again(self):
+        self.client.zone_cache.set(test_domain, "stale", test_domain)
+        get_records_response = Mock()
+        get_records_response.status_code = 200
+        get_records_response.json.return_value = {"items": []}
+        not_found_response = Mock()
+        not_found_response.status_code = 404
+        get_zones_response = Mock()
+        get_zones_response.status_code = 200
+        get_zones_response.json.return_value = {
+            "items": [{"id": zone_id, "properties": {"zoneName": test_domain}}]
+        }
+        insert_response = Mock()
+        insert_response.status_code = 202
+
+        with self._patch_request(
+            get_records_response,
+            not_found_response,
+            get_zones_response,
+            get_records_response,
+            insert_response,
+        ) as mock_request:
+            self.client.add_txt_record(test_domain, test_record_name, test_record_content)
+            assert self._methods(mock_request) == ["GET", "POST", "GET", "GET", "POST"]
+        self.assertEqual(self.client.zone_cache.get(test_domain), (zone_id, test_domain))
+
+    def test_add_txt_record_for_subdomain_uses_parent_zone(self):
+        get_zones_response = Mock()
+        get_zones_response.status_code = 200
+        get_zones_response.json.return_value = {
+            "items": [
+                {"id": "other", "properties": {"zoneName": "de"}},
+                {"id": zone_id, "properties": {"zoneName": test_domain}},
+            ]
+        }
+        get_records_response = Mock()
+        get_records_response.status_code = 200
+        get_records_response.json.return_value = {"items": []}
+        insert_response = Mock()
+        insert_response.status_code = 202
+
+        with self._patch_request(
+            get_zones_response, get_records_response, insert_response
+        ) as mock_request:
+            self.client.add_txt_record(
+                "api.eu." + test_domain,
+                "_acme-challenge.api.eu." + test_domain,
+                test_record_content,
+            )
+            self.assertEqual(
+                mock_request.call_args.args[1],
+                f"https://dns.de-fra.ionos.com/zones/{zone_id}/records",
+            )
+            self.assertEqual(
+                mock_request.call_args.kwargs["json"]["properties"]["name"],
+                "_acme-challenge.api.eu",
+            )
+
+    def test_zones_are_listed_once_across_pages(self):
+        first_page = Mock()
+        first_page.status_code = 200
+        first_page.json.return_value = {
+            "items": [{"id": "other", "properties": {"zoneName": "other.de"}}],
+            "_links": {"next": "/zones?offset=1"},
+        }
+        second_page = Mock()
+        second_page.status_code = 200
+        second_page.json.return_value = {
+            "items": [{"id": zone_id, "properties": {"zoneName": test_domain}}],
+            "_links": {},
+        }
+
+        with self._patch_request(first_page, second_page) as mock_request:
+            self.assertEqual(
+                self.client._find_zone("a." + test_domain), (zone_id, test_domain)
+            )
+            self.assertEqual(
+                self.client._find_zone("b." + test_domain), (zone_id, test_domain)
+            )
+            self.assertEqual(self.client._find_zone("other.de"), ("other", "other.de"))
+            self.assertEqual(
+                [c.kwargs["params"]["offset"] for c in mock_request.call_args_list],
+                [0, 1],
+            )
+
+    def test_zone_listing_stops_at_exact_match(self):
+        first_page = Mock()
+        first_page.status_code = 200
+        first_page.json.return_value = {
+            "items": [{"id": zone_id, "properties": {"zoneName": test_domain}}],
+            "_links": {"next": "/zones?offset=1"},
+        }
+
+        with self._patch_request(first_page) as mock_request:
+            self.assertEqual(self.client._find_zone(test_domain), (zone_id, test_domain))
+            self.assertEqual(mock_request.call_count, 1)
+
+    def test_page_size_is_sent_as_limit(self):
+        self.client.page_size = 2
+        full_page = Mock()
+        full_page.status_code = 200
+        full_page.json.return_value = {
+            "items": [
+                {"id": "r1", "properties": {"name": "a"}},
+                {"id": "r2", "properties": {"name": "b"}},
+            ]
+        }
+        last_page = Mock()
+        last_page.status_code = 200
+        last_page.json.return_value = {
+            "items": [{"id": "r3", "properties": {"name": "c"}}]
+        }
+
+        with self._patch_request(full_page, last_page) as mock_request:
+            records = list(self.client.iter_records(zone_id))
+            self.assertEqual([r["id"] for r in records], ["r1", "r2", "r3"])
+            self.assertEqual(
+                [
+                    (c.kwargs["params"]["offset"], c.kwargs["params"]["limit"])
+                    for c in mock_request.call_args_list
+                ],
+                [(0, 2), (2, 2)],
+            )
+
+    def _zones_response(self):
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {
+            "items": [{"id": zone_id, "properties": {"zoneName": test_domain}}]
+        }
+        return response
+
+    def _records_response(self, *records):
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {
+            "items": [
+                {
+                    "id": record_id,
+                    "properties": {"name": name, "content": content},
+                    "metadata": {"state": "AVAILABLE"},
+                }
+                for record_id, name, content in records
+            ]
+        }
+        return response
+
+    def test_add_txt_records_lists_each_zone_once(self):
+        names = [f"host{i}.{test_domain}" for i in range(5)]
+        insert_response = Mock()
+        insert_response.status_code = 202
+
+        with self._patch_request(
+            self._zones_response(),
+            self._records_response(("1", "_acme-challenge.host0", "value0")),
+            *[insert_response] * 4,
+        ) as mock_request:
+            self.client.add_txt_records(
+                [
+                    (name, "_acme-challenge." + name, f"value{i}")
+                    for i, name in enumerate(names)
+                ]
+            )
+            assert self._methods(mock_request) == ["GET", "GET"] + ["POST"] * 4
+
+    def test_add_txt_records_with_same_name_keeps_both_values(self):
+        insert_response = Mock()
+        insert_response.status_code = 202
+
+        with self._patch_request(
+            self._zones_response(),
+            self._records_response(),
+            insert_response,
+            insert_response,
+        ) as mock_request:
+            self.client.add_txt_records(
+                [
+                    (test_domain, test_record_name, "apex"),
+                    (test_domain, test_record_name, "wildcard"),
+                ]
+            )
+            assert self._methods(mock_request) == ["GET", "GET", "POST", "POST"]
+            self.assertEqual(
+                [
+                    c.kwargs["json"]["properties"]["content"]
+                    for c in mock_request.call_args_list[2:]
+                ],
+                ["apex", "wildcard"],
+            )
+
+    def test_del_txt_records_deletes_matching_records_only(self):
+        delete_response = Mock()
+        delete_response.status_code = 202
+        not_found_response = Mock()
+        not_found_response.status_code = 404
+
+        with self._patch_request(
+            self._zones_response(),
+            self._records_response(
+                ("1", "_acme-challenge.a", "value-a"),
+                ("2", "_acme-challenge.b", "other"),
+                ("3", "_acme-challenge.c", "value-c"),
+            ),
+            delete_response,
+            not_found_response,
+        ) as mock_request:
+            self.client.del_txt_records(
+                [
+                    ("a." + test_domain, "_acme-challenge.a." + test_domain, "value-a"),
+                    ("b." + test_domain, "_acme-challenge.b." + test_domain, "value-b"),
+                    ("c." + test_domain, "_acme-challenge.c." + test_domain, "value-c"),
+                ]
+            )
+            assert self._methods(mock_request) == ["GET", "GET", "DELETE", "DELETE"]
+            self.assertEqual(
+                [c.args[1].rsplit("/", 1)[1] for c in mock_request.call_args_list[2:]],
+                ["1", "3"],
+            )
+
+    def test_add_txt_records_returns_created_records(self):
+        with self._patch_request(
+            self._zones_response(),
+            self._records_response(("1", "_acme-challenge.a", "a")),
+            self._created_response("AVAILABLE", "2"),
+        ):
+            created = self.client.add_txt_records(
+                [
+                    ("a." + test_domain, "_acme-challenge.a." + test_domain, "a"),
+                    ("b." + test_domain, "_acme-challenge.b." + test_domain, "b"),
+                ]
+            )
+        self.assertEqual(
+            created,
+            {
+                ("b." + test_domain, "_acme-challenge.b." + test_domain, "b"): (
+                    zone_id,
+                    "2",
+                )
+            },
+        )
+
+    def test_del_txt_records_deletes_created_records_without_lookup(self):
+        delete_response = Mock()
+        delete_response.status_code = 202
+        created = ("a." + test_domain, "_acme-challenge.a." + test_domain, "a")
+        unknown = ("b." + test_domain, "_acme-challenge.b." + test_domain, "b")
+
+        with self._patch_request(
+            self._zones_response(),
+            self._records_response(("2", "_acme-challenge.b", "b")),
+            delete_response,
+            delete_response,
+        ) as mock_request:
+            self.client.del_txt_records([created, unknown], {created: (zone_id, "1")})
+            assert self._methods(mock_request) == ["GET", "GET", "DELETE", "DELETE"]
+            self.assertEqual(
+                [
+                    c.args[1].rsplit("/", 1)[1]
+                    for c in mock_request.call_args_list
+                    if c.args[0] == "DELETE"
+                ],
+                ["1", "2"],
+            )
+
+    def test_del_txt_records_with_only_created_records_sends_deletes_only(self):
+        delete_response = Mock()
+        delete_response.status_code = 202
+        created = (test_domain, test_record_name, test_record_content)
+
+        with self._patch_request(delete_response) as mock_request:
+            self.client.del_txt_records([created], {created: (zone_id, record_id)})
+            assert self._methods(mock_request) == ["DELETE"]
+            self.assertEqual(
+                mock_request.call_args.args[1],
+                f"https://dns.de-fra.ionos.com/zones/{zone_id}/records/{record_id}",
+            )
+
+    def test_add_txt_records_reports_every_failed_challenge(self):
+        client = _IONOSClient("test_token", max_concurrency=3, max_retries=0)
+        ok_response = Mock()
+        ok_response.status_code = 202
+        error_response = Mock()
+        error_response.status_code = 500
+
+        def respond(method, url, **kwargs):
+            if method == "GET" and url.endswith("/zones"):
+                return self._zones_response()
+            if method == "GET":
+                return self._records_response()
+            name = kwargs["json"]["properties"]["name"]
+            return error_response if name.endswith(("a", "c")) else ok_response
+
+        with patch.object(client.session, "request", side_effect=respond) as mock_request:
+            with self.assertRaises(errors.PluginError) as context:
+                client.add_txt_records(
+                    [
+                        (f"{h}.{test_domain}", f"_acme-challenge.{h}.{test_domain}", h)
+                        for h in ["a", "b", "c"]
+                    ]
+                )
+            self.assertEqual(self._methods(mock_request).count("POST"), 3)
+
+        error = "Received non OK status from IONOS API 500"
+        self.assertEqual(
+            str(context.exception),
+            "2 TXT record operations failed:\n"
+            f"_acme-challenge.a.{test_domain}: {error}\n"
+            f"_acme-challenge.c.{test_domain}: {error}",
+        )
+
+    def test_add_txt_records_reports_unknown_domains_with_other_failures(self):
+        self.mock_response.status_code = 200
+        self.mock_response.json.return_value = {"items": []}
+
+        with self._patch_request(self.mock_response):
+            with self.assertRaises(errors.PluginError) as context:
+                self.client.add_txt_records(
+                    [
+                        ("a.example", "_acme-challenge.a.example", "a"),
+                        ("b.example", "_acme-challenge.b.example", "b"),
+                    ]
+                )
+        self.assertEqual(
+            str(context.exception),
+            "2 TXT record operations failed:\n"
+            "_acme-challenge.a.example: Domain not known\n"
+            "_acme-challenge.b.example: Domain not known",
+        )
+
+    def test_get_nameservers_uses_zone_listing_metadata(self):
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {
+            "items": [
+                {
+                    "id": zone_id,
+                    "properties": {"zoneName": test_domain},
+                    "metadata": {"nameservers": ["ns1.example", "ns2.example"]},
+                }
+            ]
+        }
+
+        with self._patch_request(response) as mock_request:
+            self.assertEqual(
+                self.client.get_nameservers(test_domain), ["ns1.example", "ns2.example"]
+            )
+            mock_request.assert_called_once()
+
+    def test_get_nameservers_of_cached_zone_fetches_zone(self):
+        self.client.zone_cache.set(test_domain, zone_id, test_domain)
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {
+            "id": zone_id,
+            "metadata": {"nameservers": ["ns1.example"]},
+        }
+
+        with self._patch_request(response) as mock_request:
+            self.assertEqual(self.client.get_nameservers(test_domain), ["ns1.example"])
+            self.assertEqual(
+                mock_request.call_args.args[1],
+                f"https://dns.de-fra.ionos.com/zones/{zone_id}",
+            )
+
+    def _created_response(self, state, created_id="new"):
+        response = Mock()
+        response.status_code = 202
+        response.json.return_value = {"id": created_id, "metadata": {"state": state}}
+        return response
+
+    def _states_response(self, *states):
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {
+            "items": [
+                {"id": created_id, "metadata": {"state": state}}
+                for created_id, state in states
+            ]
+        }
+        return response
+
+    @patch("time.sleep")
+    def test_add_txt_records_waits_until_records_are_available(self, mock_sleep):
+        with self._patch_request(
+            self._zones_response(),
+            self._records_response(),
+            self._created_response("PROVISIONING", "1"),
+            self._created_response("AVAILABLE", "2"),
+            self._states_response(("1", "PROVISIONING"), ("2", "AVAILABLE")),
+            self._states_response(("1", "AVAILABLE"), ("2", "AVAILABLE")),
+        ) as mock_request:
+            self.client.add_txt_records(
+                [
+                    ("a." + test_domain, "_acme-challenge.a." + test_domain, "a"),
+                    ("b." + test_domain, "_acme-challenge.b." + test_domain, "b"),
+                ]
+            )
+            assert self._methods(mock_request) == [
+                "GET",
+                "GET",
+                "POST",
+                "POST",
+                "GET",
+                "GET",
+            ]
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    @patch("time.sleep")
+    def test_add_txt_records_raises_when_provisioning_failed(self, mock_sleep):
+        with self._patch_request(
+            self._zones_response(),
+            self._records_response(),
+            self._created_response("PROVISIONING"),
+            self._states_response(("new", "FAILED")),
+        ):
+            with self.assertRaises(errors.PluginError) as context:
+                self.client.add_txt_record(
+                    test_domain, test_record_name, test_record_content
+                )
+        self.assertEqual(
+            str(context.exception),
+            f"Provisioning of TXT record {test_record_name} failed",
+        )
+
+    @patch("time.monotonic", side_effect=[0, 0, 61])
+    @patch("time.sleep")
+    def test_add_txt_records_gives_up_waiting_after_timeout(
+        self, mock_sleep, unused_mock_monotonic
+    ):
+        with self._patch_request(
+            self._zones_response(),
+            self._records_response(),
+            self._created_response("PROVISIONING"),
+            self._states_response(("new", "PROVISIONING")),
+        ) as mock_request:
+            with self.assertLogs("certbot_dns_ionos_cloud.ionos", "WARNING"):
+                self.client.add_txt_record(
+                    test_domain, test_record_name, test_record_content
+                )
+            assert self._methods(mock_request) == ["GET", "GET", "POST", "GET"]
+
+
+class SharedClientLogicTest(unittest.TestCase):
+    def test_read_page_follows_next_link(self):
+        response = {"items": [{}, {}], "_links": {"next": "/zones?offset=2"}}
+        self.assertEqual(_read_page(response, 4, 10), ([{}, {}], 6))
+        self.assertEqual(_read_page({"items": [{}, {}], "_links": {}}, 4, 2)[1], None)
+
+    def test_read_page_without_links_stops_at_a_short_page(self):
+        self.assertEqual(_read_page({"items": [{}, {}]}, 0, 2)[1], 2)
+        self.assertEqual(_read_page({"items": [{}]}, 0, 2)[1], None)
+        self.assertEqual(_read_page({}, 0, 2), ([], None))
+
+    @patch("certbot_dns_ionos_cloud.throttle.backoff_delay", return_value=1.5)
+    def test_retries_stop_after_max_retries(self, unused_mock_backoff):
+        retries = _Retries("GET", "/zones", max_retries=2, can_check=False)
+        self.assertEqual(retries.next_delay(None, errors.PluginError()), 1.5)
+        self.assertEqual(retries.next_delay(None, errors.PluginError()), 1.5)
+        self.assertIsNone(retries.next_delay(None, errors.PluginError()))
+        self.assertEqual(retries.attempt, 2)
+
+    def test_retries_honour_retry_after(self):
+        retries = _Retries("GET", "/zones", max_retries=2, can_check=False)
+        resp = Mock(status_code=429, headers={"Retry-After": "7"})
+        self.assertEqual(retries.next_delay(resp, None), 7)
+
+    def test_post_is_only_retried_if_it_can_be_checked(self):
+        self.assertIsNone(
+            _Retries("POST", "/", 2, can_check=False).next_delay(None, None)
+        )
+        self.assertIsNotNone(
+            _Retries("POST", "/", 2, can_check=True).next_delay(None, None)
+        )
+
+    def test_zone_index_is_stale_after_relist_interval(self):
+        index = _ZoneIndex(relist_interval=0)
+        index.add({"id": "z", "properties": {"zoneName": "a.de"}})
+        self.assertTrue(index.needs_listing(["www.a.de", "a.de", "de"]))
+        self.assertEqual(index.find(["www.a.de", "a.de", "de"]), ("z", "a.de"))
+        self.assertFalse(index.is_stale())
+        index.finish()
+        self.assertFalse(index.needs_listing(["www.a.de", "a.de", "de"]))
+        self.assertTrue(index.is_stale())
+        index.reset()
+        self.assertIsNone(index.find(["a.de", "de"]))
+        self.assertFalse(_ZoneIndex().is_stale())
+
+    def test_provisioning_wait_tracks_zones_separately(self):
+        written = [
+            (_Write(("a.de", "_acme-challenge.a.de", "a"), "za", Mock()), {"id": "1"}),
+            (_Write(("b.de", "_acme-challenge.b.de", "b"), "zb", Mock()), {"id": "2"}),
+        ]
+        wait = _ProvisioningWait(written, timeout=60, record_prefix="_acme-challenge")
+        self.assertEqual(wait.pending(), 2)
+        self.assertEqual([zone for zone, _ in wait.polls()], ["za", "zb"])
+
+        available = {"id": "1", "metadata": {"state": "AVAILABLE"}}
+        self.assertFalse(wait.check("za", available))
+        self.assertEqual([zone for zone, _ in wait.polls()], ["zb"])
+        with self.assertRaisesRegex(errors.PluginError, "_acme-challenge.b.de"):
+            wait.check("zb", {"id": "2", "metadata": {"state": "FAILED"}})
+
+    @patch("time.monotonic", side_effect=[0, 0, 0, 61])
+    def test_provisioning_wait_backs_off_until_timeout(self, unused_mock_monotonic):
+        written = [(_Write(("a.de", "a", "a"), "za", Mock()), {"id": "1"})]
+        wait = _ProvisioningWait(written, timeout=60, record_prefix="_acme-challenge")
+        self.assertEqual(wait.next_delay(), 0.5)
+        self.assertEqual(wait.next_delay(), 1)
+        with self.assertLogs("certbot_dns_ionos_cloud.ionos", "WARNING"):
+            self.assertIsNone(wait.next_delay())
+
+
+class AuthenticatorTest(test_util.TempDirTestCase, dns_test_common.BaseAuthenticatorTest):
+    def setUp(self):
+        super().setUp()
+
+        path = os.path.join(self.tempdir, "file.ini")
+        dns_test_common.write({"ionos_cloud_token": "test_token"}, path)
+
+        self.config = Mock(
+            ionos_cloud_credentials=path,
+            ionos_cloud_propagation_seconds=0,
+            ionos_cloud_endpoint="https://dns.example.test",
+            ionos_cloud_endpoints=None,
+            ionos_cloud_endpoint_cache_ttl=0,
+            ionos_cloud_pool_size=10,
+            ionos_cloud_connect_timeout=10,
+            ionos_cloud_read_timeout=30,
+            ionos_cloud_zone_cache_ttl=0,
+            ionos_cloud_zone_cache_size=1000,
+            ionos_cloud_max_concurrency=4,
+            ionos_cloud_provisioning_timeout=60,
+            ionos_cloud_max_retries=5,
+            ionos_cloud_rate_limit=0,
+            ionos_cloud_page_size=1000,
+            ionos_cloud_wait_until_visible=False,
+            ionos_cloud_nameservers=None,
+            ionos_cloud_challenge_zone=None,
+            ionos_cloud_follow_cname=False,
+            ionos_cloud_async=False,
+            ionos_cloud_preflight=False,
+            ionos_cloud_metrics_file=None,
+            ionos_cloud_prometheus_file=None,
+            work_dir=self.tempdir,
+        )
+        self.auth = Authenticator(self.config, "ionos-cloud")
+
+    @test_util.patch_display_util()
+    @patch("time.sleep")
+    @patch("certbot_dns_ionos_cloud.propagation.wait_for_txt_records")
+    def test_perform_waits_until_visible_on_zone_nameservers(
+        self, mock_wait, mock_sleep, unused_mock_get_utility
+    ):
+        self.config.ionos_cloud_wait_until_visible = True
+        self.config.ionos_cloud_propagation_seconds = 120
+
+        with patch("certbot_dns_ionos_cloud.ionos._IONOSClient") as client_class:
+            client_class.return_value.get_nameservers.return_value = ["ns1.example"]
+            self.auth.perform([self.achall])
+
+        validation = self.achall.validation(self.achall.account_key)
+        mock_wait.assert_called_once_with(
+            {"_acme-challenge." + DOMAIN: {validation}},
+            {"_acme-challenge." + DOMAIN: [("ns1.example", 53)]},
+            timeout=120,
+        )
+        mock_sleep.assert_not_called()
+
+    @test_util.patch_display_util()
+    @patch("time.sleep")
+    @patch("certbot_dns_ionos_cloud.propagation.wait_for_txt_records")
+    def test_perform_sleeps_when_nameservers_are_unknown(
+        self, mock_wait, mock_sleep, unused_mock_get_utility
+    ):
+        self.config.ionos_cloud_wait_until_visible = True
+        self.config.ionos_cloud_propagation_seconds = 120
+
+        with patch("certbot_dns_ionos_cloud.ionos._IONOSClient") as client_class:
+            client_class.return_value.get_nameservers.return_value = []
+            self.auth.perform([self.achall])
+
+        mock_wait.assert_not_called()
+        mock_sleep.assert_called_once_with(120)
+
+    @test_util.patch_display_util()
+    def test_challenge_zone_receives_all_records(self, unused_mock_get_utility):
+        self.config.ionos_cloud_challenge_zone = "acme.example.net."
+
+        with patch("certbot_dns_ionos_cloud.ionos._IONOSClient") as client_class:
+            client_class.return_value.add_txt_records.return_value = {}
+            self.auth.perform([self.achall])
+            self.auth.cleanup([self.achall])
+
+        expected = [
+            (
+                "acme.example.net",
+                "_acme-challenge." + DOMAIN + ".acme.example.net",
+                ANY,
+            )
+        ]
+        client = client_class.return_value
+        client.add_txt_records.assert_called_once_with(expected)
+        client.del_txt_records.assert_called_once_with(expected, {})
+
+    @test_util.patch_display_util()
+    @patch("certbot_dns_ionos_cloud.propagation.system_resolvers")
+    @patch("certbot_dns_ionos_cloud.propagation.query_cname")
+    def test_follow_cname_writes_to_target_once_looked_up(
+        self, mock_query_cname, mock_system_resolvers, unused_mock_get_utility
+    ):
+        self.config.ionos_cloud_follow_cname = True
+        mock_system_resolvers.return_value = [("192.0.2.1", 53), ("192.0.2.2", 53)]
+        mock_query_cname.side_effect = [
+            propagation.DNSQueryError("timeout"),
+            "Token.ACME.example.net.",
+        ]
+
+        with patch("certbot_dns_ionos_cloud.ionos._IONOSClient") as client_class:
+            client_class.return_value.add_txt_records.return_value = {}
+            self.auth.perform([self.achall])
+            self.auth.cleanup([self.achall])
+
+        expected = [("token.acme.example.net", "token.acme.example.net", ANY)]
+        client = client_class.return_value
+        client.add_txt_records.assert_called_once_with(expected)
+        client.del_txt_records.assert_called_once_with(expected, {})
+        self.assertEqual(mock_query_cname.call_count, 2)
+        self.assertEqual(client_class.call_args.kwargs["record_prefix"], "")
+
+    @patch("certbot_dns_ionos_cloud.propagation.system_resolvers")
+    @patch("certbot_dns_ionos_cloud.propagation.query_cname")
+    def test_cname_outside_challenge_zone_raises_error(
+        self, mock_query_cname, mock_system_resolvers
+    ):
+        self.config.ionos_cloud_follow_cname = True
+        self.config.ionos_cloud_challenge_zone = "acme.example.net"
+        mock_system_resolvers.return_value = [("192.0.2.1", 53)]
+        mock_query_cname.return_value = "token.example.org"
+
+        with patch("certbot_dns_ionos_cloud.ionos._IONOSClient"):
+            with self.assertRaises(errors.PluginError):
+                self.auth.perform([self.achall])
+
+    @test_util.patch_display_util()
+    def test_cleanup_writes_metrics_reports(self, unused_mock_get_utility):
+        self.config.ionos_cloud_metrics_file = os.path.join(self.tempdir, "run.json")
+        self.config.ionos_cloud_prometheus_file = os.path.join(self.tempdir, "run.prom")
+
+        with patch("certbot_dns_ionos_cloud.ionos._IONOSClient") as client_class:
+            client_class.return_value.add_txt_records.return_value = {}
+            self.auth.perform([self.achall])
+            self.auth.cleanup([self.achall])
+
+        with open(self.config.ionos_cloud_metrics_file) as f:
+            phases = json.load(f)["phases"]
+        self.assertEqual(sorted(phases), ["cleanup", "perform", "propagation_wait"])
+        self.assertTrue(os.path.exists(self.config.ionos_cloud_prometheus_file))
+
+    def test_preflight_lists_every_unresolvable_domain(self):
+        self.config.ionos_cloud_preflight = True
+        self.config.domains = ["*.example.com", "example.com", "a.test", "b.test"]
+
+        with patch("certbot_dns_ionos_cloud.ionos._IONOSClient") as client_class:
+            client = client_class.return_value
+            client.resolve_zones.return_value = {
+                "example.com": ("zone", "example.com"),
+                "a.test": errors.PluginError("Domain not known"),
+                "b.test": errors.PluginError("Domain not known"),
+            }
+            with self.assertRaises(errors.PluginError) as context:
+                self.auth.prepare()
+
+        client.check_token.assert_called_once_with()
+        client.resolve_zones.assert_called_once_with(["a.test", "b.test", "example.com"])
+        self.assertIn("2 domains", str(context.exception))
+        self.assertIn("a.test: Domain not known", str(context.exception))
+        self.assertIn("b.test: Domain not known", str(context.exception))
+
+    @unittest.skipIf(DNSName is None, "certbot passes domains as strings")
+    def test_preflight_accepts_certbot_name_objects(self):
+        self.config.ionos_cloud_preflight = True
+        self.config.domains = [DNSName("*.example.com"), DNSName("example.com")]
+
+        with patch("certbot_dns_ionos_cloud.ionos._IONOSClient") as client_class:
+            client = client_class.return_value
+            client.resolve_zones.return_value = {"example.com": ("zone", "example.com")}
+            self.auth.prepare()
+
+        client.resolve_zones.assert_called_once_with(["example.com"])
+
+    @test_util.patch_display_util()
+    def test_preflight_client_is_reused_by_perform(self, unused_mock_get_utility):
+        self.config.ionos_cloud_preflight = True
+        self.config.domains = [DOMAIN]
+
+        with patch("certbot_dns_ionos_cloud.ionos._IONOSClient") as client_class:
+            client = client_class.return_value
+            client.resolve_zones.return_value = {DOMAIN: ("zone", DOMAIN)}
+            client.add_txt_records.return_value = {}
+            self.auth.prepare()
+            self.auth.perform([self.achall])
+
+        client_class.assert_called_once()
+        client.zone_cache.save.assert_called_once_with()
+
+    def test_preflight_is_skipped_by_default(self):
+        self.config.domains = [DOMAIN]
+
+        with patch("certbot_dns_ionos_cloud.ionos._IONOSClient") as client_class:
+            self.auth.prepare()
+
+        client_class.assert_not_called()
+
+    @test_util.patch_display_util()
+    def test_challenges_are_split_by_token(self, unused_mock_get_utility):
+        dns_test_common.write(
+            {
+                "ionos_cloud_token": "test_token",
+                "ionos_cloud_token_tenant": "tenant_token",
+                "ionos_cloud_zones_tenant": "tenant.example",
+            },
+            self.config.ionos_cloud_credentials,
+        )
+        tenant_achall = achallenges.KeyAuthorizationAnnotatedChallenge(
+            challb=acme_util.DNS01,
+            identifier=messages.Identifier(
+                typ=messages.IDENTIFIER_FQDN, value="www.tenant.example"
+            ),
+            account_key=dns_test_common.KEY,
+        )
+        clients = {"test_token": Mock(), "tenant_token": Mock()}
+        for client in clients.values():
+            client.add_txt_records.return_value = {}
+            client.retry_count = 0
+            client.throttle_seconds = 0.0
+
+        with patch("certbot_dns_ionos_cloud.ionos._IONOSClient") as client_class:
+            client_class.side_effect = lambda token, **kwargs: clients[token]
+            self.auth.perform([self.achall, tenant_achall])
+            self.auth.cleanup([self.achall, tenant_achall])
+
+        self.assertEqual(client_class.call_count, 2)
+        zone_caches = {call.kwargs["zone_cache"] for call in client_class.call_args_list}
+        self.assertEqual(len(zone_caches), 1)
+        clients["test_token"].add_txt_records.assert_called_once_with(
+            [(DOMAIN, "_acme-challenge." + DOMAIN, ANY)]
+        )
+        clients["tenant_token"].add_txt_records.assert_called_once_with(
+            [("www.tenant.example", "_acme-challenge.www.tenant.example", ANY)]
+        )
+        clients["tenant_token"].del_txt_records.assert_called_once_with(
+            [("www.tenant.example", "_acme-challenge.www.tenant.example", ANY)], {}
+        )
+
+    def test_endpoint_of_credentials_file_is_used_without_option(self):
+        self.config.ionos_cloud_endpoint = None
+        dns_test_common.write(
+            {
+                "ionos_cloud_token": "test_token",
+                "ionos_cloud_endpoint": "https://proxy.example.test",
+            },
+            self.config.ionos_cloud_credentials,
+        )
+        self.auth._setup_credentials()
+
+        self.assertEqual(self.auth._get_endpoint(), "https://proxy.example.test")
+
+    @patch("certbot_dns_ionos_cloud.endpoints.select_endpoint")
+    def test_endpoint_candidates_are_probed(self, mock_select_endpoint):
+        self.config.ionos_cloud_endpoint = None
+        self.config.ionos_cloud_endpoints = (
+            "https://a.example.test, https://b.example.test"
+        )
+        mock_select_endpoint.return_value = "https://b.example.test"
+        self.auth._setup_credentials()
+
+        self.assertEqual(self.auth._get_endpoint(), "https://b.example.test")
+        mock_select_endpoint.assert_called_once_with(
+            ["https://a.example.test", "https://b.example.test"],
+            "test_token",
+            cache_path=os.path.join(self.tempdir, "ionos-cloud-endpoint.json"),
+            ttl=0,
+            timeout=10,
+        )
+
+    def test_default_endpoint_is_used_without_settings(self):
+        self.config.ionos_cloud_endpoint = None
+        self.auth._setup_credentials()
+
+        self.assertEqual(self.auth._get_endpoint(), dns_api_base_url)
+
+    @test_util.patch_display_util()
+    def test_perform_and_cleanup_reuse_one_client(self, unused_mock_get_utility):
+        with patch("certbot_dns_ionos_cloud.ionos._IONOSClient") as client_class:
+            created = {(DOMAIN, "_acme-challenge." + DOMAIN, "value"): ("zone", "record")}
+            client_class.return_value.add_txt_records.return_value = created
+            self.auth.perform([self.achall])
+            self.auth.cleanup([self.achall])
+
+        client_class.assert_called_once_with(
+            "test_token",
+            base_url="https://dns.example.test",
+            pool_size=10,
+            timeout=(10, 30),
+            zone_cache=ANY,
+            max_concurrency=4,
+            provisioning_timeout=60,
+            max_retries=5,
+            rate_limit=0,
+            page_size=1000,
+            metrics=ANY,
+            record_prefix="_acme-challenge",
+        )
+        client = client_class.return_value
+        client.add_txt_records.assert_called_once_with(
+            [(DOMAIN, "_acme-challenge." + DOMAIN, ANY)]
+        )
+        client.del_txt_records.assert_called_once_with(
+            [(DOMAIN, "_acme-challenge." + DOMAIN, ANY)], created
+        )
+        client.close.assert_called_once_with()
+        self.assertIsNone(self.auth._client)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+import time
+import unittest
+
+from certbot.tests import util as test_util
+from certbot_dns_ionos_cloud.metrics import Metrics, endpoint_of
+
+
+class TestMetrics(test_util.TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.metrics = Metrics()
+        self.metrics.record_call("GET", "/zones", 200, 0.1, 0, response_bytes=100)
+        self.metrics.record_call("POST", "/zones/z1/records", 202, 0.3, 2, 50, 80)
+        self.metrics.record_call("POST", "/zones/z2/records", None, 0.5, 5, 50, 0)
+        with self.metrics.phase("write"):
+            pass
+
+    def test_ids_are_removed_from_endpoints(self):
+        self.assertEqual(endpoint_of("/zones"), "/zones")
+        self.assertEqual(endpoint_of("/zones/1234"), "/zones/{zoneId}")
+        self.assertEqual(
+            endpoint_of("/zones/1234/records/5678"), "/zones/{zoneId}/records/{recordId}"
+        )
+
+    def test_summary_groups_calls_by_endpoint(self):
+        summary = self.metrics.summary()
+
+        self.assertEqual(summary["calls"], 3)
+        self.assertEqual(summary["retries"], 7)
+        self.assertEqual(summary["errors"], 1)
+        self.assertIn("write", summary["phases"])
+        post = summary["endpoints"][1]
+        self.assertEqual(
+            (post["method"], post["endpoint"], post["count"]),
+            ("POST", "/zones/{zoneId}/records", 2),
+        )
+        self.assertEqual(post["statuses"], {"202": 1, "error": 1})
+        self.assertEqual(post["latency_max"], 0.5)
+        self.assertEqual(post["request_bytes"], 100)
+
+    def test_overlapping_phases_count_once(self):
+        metrics = Metrics()
+        both_running = threading.Barrier(2)
+
+        def write():
+            with metrics.phase("write"):
+                both_running.wait()
+                time.sleep(0.2)
+
+        threads = [threading.Thread(target=write) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with metrics.phase("write"):
+            time.sleep(0.1)
+
+        self.assertGreaterEqual(metrics.phases["write"], 0.3)
+        self.assertLess(metrics.phases["write"], 0.45)
+
+    def test_json_report_lists_every_call(self):
+        path = os.path.join(self.tempdir, "report", "metrics.json")
+        self.metrics.write_json(path)
+
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(len(report["requests"]), 3)
+        self.assertEqual(report["requests"][1]["endpoint"], "/zones/{zoneId}/records")
+
+    def test_prometheus_report_uses_textfile_format(self):
+        path = os.path.join(self.tempdir, "ionos.prom")
+        self.metrics.write_prometheus(path)
+
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertIn("# TYPE certbot_dns_ionos_cloud_api_calls gauge", lines)
+        self.assertIn(
+            "certbot_dns_ionos_cloud_api_calls"
+            '{method="GET",endpoint="/zones",status="200"} 1',
+            lines,
+        )
+        self.assertIn(
+            'certbot_dns_ionos_cloud_api_retries{method="POST",'
+            'endpoint="/zones/{zoneId}/records"} 7',
+            lines,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+from certbot_dns_ionos_cloud import plan
+
+
+def _item(record_id, name, content, type="TXT"):
+    return {
+        "id": record_id,
+        "properties": {"name": name, "type": type, "content": content},
+    }
+
+
+class RecordIndexTest(unittest.TestCase):
+    def test_only_challenge_records_are_kept(self):
+        index = plan.RecordIndex("_acme-challenge")
+        index.add("z", _item("1", "_acme-challenge", "a"))
+        index.add("z", _item("2", "_acme-challenge.www", "b"))
+        index.add("z", _item("3", "www", "c"))
+        index.add("z", _item("4", "_acme-challenge", "d", type="CNAME"))
+        index.add("z", {"properties": {"name": "_acme-challenge", "type": "TXT"}})
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(
+            [r.record_id for r in index.get("z", "_acme-challenge", "a")], ["1"]
+        )
+        self.assertEqual(index.get("other", "_acme-challenge", "a"), [])
+        self.assertEqual(index.get("z", "_acme-challenge", "b"), [])
+
+
+class PlanChangesTest(unittest.TestCase):
+    def setUp(self):
+        self.index = plan.RecordIndex("_acme-challenge")
+        self.index.add("z", _item("1", "_acme-challenge", "old"))
+        self.index.add("z", _item("2", "_acme-challenge", "old"))
+
+    def test_create_skips_existing_and_duplicate_records(self):
+        challenges = [
+            ("example.com", "_acme-challenge.example.com", "old"),
+            ("example.com", "_acme-challenge.example.com", "new"),
+            ("*.example.com", "_acme-challenge.example.com", "new"),
+        ]
+
+        changes = plan.plan_changes(
+            self.index, "z", "example.com", challenges, plan.CREATE
+        )
+
+        self.assertEqual(
+            [(c.action, c.name, c.content) for c in changes],
+            [(plan.CREATE, "_acme-challenge", "new")],
+        )
+        self.assertEqual(
+            changes[0].describe(), "create TXT _acme-challenge.example.com 'new'"
+        )
+
+    def test_delete_removes_every_matching_record(self):
+        challenges = [
+            ("example.com", "_acme-challenge.example.com", "old"),
+            ("example.com", "_acme-challenge.example.com", "missing"),
+        ]
+
+        changes = plan.plan_changes(
+            self.index, "z", "example.com", challenges, plan.DELETE
+        )
+
+        self.assertEqual([c.record_id for c in changes], ["1", "2"])
+        self.assertEqual(
+            changes[0].describe(), "delete TXT _acme-challenge.example.com 'old' (id 1)"
+        )
+
+    def test_record_name_is_relative_to_the_zone(self):
+        self.assertEqual(
+            plan.relative_record_name("_acme-challenge.www.example.com", "example.com"),
+            "_acme-challenge.www",
+        )
+        self.assertEqual(plan.relative_record_name("example.com", "example.com"), "")
+
+    def test_names_are_listed_by_their_longest_common_label(self):
+        self.assertEqual(
+            plan.name_filters(
+                ["_acme-challenge.www", "_acme-challenge", "_acme-challenge"]
+            ),
+            ["_acme-challenge"],
+        )
+        self.assertEqual(plan.name_filters(["token.a", "token.b"]), ["token"])
+        self.assertEqual(plan.name_filters(["a", "b"]), ["a", "b"])
+        self.assertEqual(plan.name_filters(["a", ""]), [""])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from certbot_dns_ionos_cloud import propagation
+
+
+class StubDNSServer(object):
+    """Answers TXT and CNAME queries on localhost from dicts of name to values."""
+
+    def __init__(self, records=None, truncate=False, cnames=None):
+        self.records = records if records is not None else {}
+        self.cnames = cnames if cnames is not None else {}
+        self.truncate = truncate
+        self.queries = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.tcp.bind(self.sock.getsockname())
+        self.tcp.listen()
+        self.address = self.sock.getsockname()
+        threading.Thread(target=self._serve_udp, daemon=True).start()
+        threading.Thread(target=self._serve_tcp, daemon=True).start()
+
+    def close(self):
+        self.sock.close()
+        self.tcp.close()
+
+    def _serve_udp(self):
+        while True:
+            try:
+                query, client = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            self.sock.sendto(self._answer(query, self.truncate), client)
+
+    def _serve_tcp(self):
+        while True:
+            try:
+                conn, _ = self.tcp.accept()
+            except OSError:
+                return
+            with conn:
+                length = struct.unpack("!H", conn.recv(2))[0]
+                answer = self._answer(conn.recv(length), truncate=False)
+                conn.sendall(struct.pack("!H", len(answer)) + answer)
+
+    def _answer(self, query, truncate):
+        offset, labels = 12, []
+        while query[offset]:
+            length = query[offset]
+            offset += 1
+            labels.append(query[offset:][:length].decode())
+            offset += length
+        # name terminator, type and class
+        question = query[12:][: offset - 7]
+        name = ".".join(labels)
+        qtype = struct.unpack_from("!H", query, offset + 1)[0]
+        self.queries.append(name)
+
+        if qtype == 5:
+            rdatas = [
+                # the target shares the zone of the query, so it is compressed
+                (5, _encode_cname(target, name))
+                for target in ([self.cnames[name]] if name in self.cnames else [])
+            ]
+        else:
+            values = [] if truncate else self.records.get(name, [])
+            rdatas = [(16, bytes([len(value)]) + value.encode()) for value in values]
+        flags = 0x8400 | (0x0200 if truncate else 0)
+        answer = query[:2] + struct.pack("!HHHHH", flags, 1, len(rdatas), 0, 0)
+        answer += question
+        for rtype, rdata in rdatas:
+            answer += b"\xc0\x0c" + struct.pack("!HHIH", rtype, 1, 60, len(rdata)) + rdata
+        return answer
+
+
+def _encode_cname(target, name):
+    # labels of the target, followed by a pointer to the query name, less
+    # its first label, when the target ends with that parent
+    parent = name.split(".", 1)[1]
+    if target.endswith("." + parent):
+        prefix = target[: -len(parent) - 1]
+        pointer = struct.pack("!H", 0xC000 | (12 + len(name.split(".")[0]) + 1))
+    else:
+        prefix, pointer = target, b"\x00"
+    return b"".join(
+        bytes([len(label)]) + label.encode() for label in prefix.split(".")
+    ) + (pointer)
+
+
+class TestQueryTXT(unittest.TestCase):
+    def setUp(self):
+        self.server = StubDNSServer({"_acme-challenge.example.com": ["a", "b"]})
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_returns_all_values(self):
+        self.assertEqual(
+            propagation.query_txt(self.server.address, "_acme-challenge.example.com"),
+            {"a", "b"},
+        )
+
+    def test_unknown_name_returns_no_values(self):
+        self.assertEqual(
+            propagation.query_txt(self.server.address, "_acme-challenge.example.org"),
+            set(),
+        )
+
+    def test_truncated_answer_is_retried_over_tcp(self):
+        self.server.truncate = True
+
+        self.assertEqual(
+            propagation.query_txt(self.server.address, "_acme-challenge.example.com"),
+            {"a", "b"},
+        )
+
+    def test_unreachable_server_raises_error(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        with sock, self.assertRaises(propagation.DNSQueryError):
+            propagation.query_txt(sock.getsockname(), "example.com", timeout=0.1)
+
+
+class TestQueryCNAME(unittest.TestCase):
+    def setUp(self):
+        self.server = StubDNSServer(
+            cnames={
+                "_acme-challenge.example.com": "example.com.acme.example.net",
+                "_acme-challenge.www.example.com": "challenges.www.example.com",
+            }
+        )
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_returns_target(self):
+        self.assertEqual(
+            propagation.query_cname(self.server.address, "_acme-challenge.example.com"),
+            "example.com.acme.example.net",
+        )
+
+    def test_follows_compression_pointers(self):
+        self.assertEqual(
+            propagation.query_cname(
+                self.server.address, "_acme-challenge.www.example.com"
+            ),
+            "challenges.www.example.com",
+        )
+
+    def test_name_without_cname_returns_none(self):
+        self.assertIsNone(
+            propagation.query_cname(self.server.address, "_acme-challenge.example.org")
+        )
+
+
+class TestSystemResolvers(unittest.TestCase):
+    def test_reads_nameserver_lines(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".conf") as f:
+            f.write("# comment\nsearch example.com\nnameserver 10.0.0.1\n")
+            f.write("nameserver fe80::1%eth0\n")
+            f.flush()
+            self.assertEqual(
+                propagation.system_resolvers(f.name), [("10.0.0.1", 53), ("fe80::1", 53)]
+            )
+
+    def test_missing_file_returns_no_resolvers(self):
+        self.assertEqual(propagation.system_resolvers("/nonexistent/resolv.conf"), [])
+
+
+class TestWaitForTXTRecords(unittest.TestCase):
+    def setUp(self):
+        self.servers = [StubDNSServer(), StubDNSServer()]
+        self.nameservers = {
+            "_acme-challenge.example.com": [s.address for s in self.servers]
+        }
+
+    def tearDown(self):
+        for server in self.servers:
+            server.close()
+
+    def test_returns_once_all_nameservers_serve_the_values(self):
+        expected = {"_acme-challenge.example.com": {"a", "b"}}
+        self.servers[0].records["_acme-challenge.example.com"] = ["a", "b"]
+        self.servers[1].records["_acme-challenge.example.com"] = ["a"]
+
+        def publish(delay):
+            self.servers[1].records["_acme-challenge.example.com"] = ["a", "b", "c"]
+
+        with patch("time.sleep", side_effect=publish) as mock_sleep:
+            self.assertTrue(
+                propagation.wait_for_txt_records(expected, self.nameservers, timeout=60)
+            )
+        mock_sleep.assert_called_once_with(propagation.DEFAULT_INITIAL_DELAY)
+        self.assertEqual(len(self.servers[0].queries), 1)
+        self.assertEqual(len(self.servers[1].queries), 2)
+
+    def test_gives_up_after_timeout(self):
+        expected = {"_acme-challenge.example.com": {"a"}}
+
+        with patch("time.sleep") as mock_sleep:
+            self.assertFalse(
+                propagation.wait_for_txt_records(
+                    expected, self.nameservers, timeout=0.3, initial_delay=0.1
+                )
+            )
+        self.assertTrue(mock_sleep.called)
+
+
+class TestParseNameserver(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(propagation.parse_nameserver("ns1.example"), ("ns1.example", 53))
+        self.assertEqual(
+            propagation.parse_nameserver("127.0.0.1:5353"), ("127.0.0.1", 5353)
+        )
+        self.assertEqual(propagation.parse_nameserver("2001:db8::1"), ("2001:db8::1", 53))
+        self.assertEqual(propagation.parse_nameserver("[::1]:5353"), ("::1", 5353))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import datetime
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+
+from certbot.plugins import dns_test_common
+from certbot.tests import util as test_util
+from certbot_dns_ionos_cloud import sweeper
+from certbot_dns_ionos_cloud.fake_api import FakeIONOSServer
+from certbot_dns_ionos_cloud.ionos import _IONOSClient
+
+now = datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc)
+old = "2024-01-01T00:00:00Z"
+recent = "2024-01-01T23:30:00Z"
+
+
+class TestSweeper(test_util.TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = FakeIONOSServer(["a.de", "b.de"], max_page_size=2).start()
+        self.addCleanup(self.server.stop)
+        self.client = _IONOSClient("test_token", base_url=self.server.url)
+        self.addCleanup(self.client.close)
+
+        zone_ids = {
+            z["properties"]["zoneName"]: z["id"] for z in self.server.zones.values()
+        }
+        for zone_name, name, record_type, created in [
+            ("a.de", "_acme-challenge", "TXT", old),
+            ("a.de", "_acme-challenge.www", "TXT", old),
+            ("a.de", "_acme-challenge.api", "TXT", recent),
+            ("a.de", "www", "TXT", old),
+            ("b.de", "_acme-challenge", "TXT", old),
+            ("b.de", "_acme-challenge", "CNAME", old),
+        ]:
+            zone_id = zone_ids[zone_name]
+            record = self.server._new_record(
+                zone_id, {"name": name, "type": record_type, "content": "x"}
+            )
+            record["metadata"]["createdDate"] = created
+            self.server.records[zone_id][record["id"]] = record
+
+    def _remaining(self):
+        return sorted(
+            (r["metadata"]["fqdn"], r["properties"]["type"])
+            for records in self.server.records.values()
+            for r in records.values()
+        )
+
+    def test_sweep_deletes_old_challenge_records_only(self):
+        result = sweeper.sweep(self.client, 3600, now=now)
+
+        self.assertEqual(result.zones, 2)
+        self.assertEqual(
+            sorted(f"{r.name}.{r.zone_name}" for r in result.deleted),
+            ["_acme-challenge.a.de", "_acme-challenge.b.de", "_acme-challenge.www.a.de"],
+        )
+        self.assertEqual(
+            self._remaining(),
+            [
+                ("_acme-challenge.api.a.de", "TXT"),
+                ("_acme-challenge.b.de", "CNAME"),
+                ("www.a.de", "TXT"),
+            ],
+        )
+
+    def test_dry_run_deletes_nothing(self):
+        before = self._remaining()
+        result = sweeper.sweep(self.client, 3600, dry_run=True, now=now)
+
+        self.assertEqual(len(result.stale), 3)
+        self.assertEqual(result.deleted, [])
+        self.assertEqual(self._remaining(), before)
+        self.assertNotIn("DELETE /zones/{zoneId}/records/{recordId}", self.server.calls)
+
+    def test_sweep_can_be_limited_to_zones(self):
+        result = sweeper.sweep(self.client, 3600, zone_names=["b.de"], now=now)
+
+        self.assertEqual(result.zones, 1)
+        self.assertEqual([r.zone_name for r in result.deleted], ["b.de"])
+
+    def test_zone_names_are_matched_exactly(self):
+        zone_id = self.server.add_zone("data.de")
+        record = self.server._new_record(
+            zone_id, {"name": "_acme-challenge", "type": "TXT", "content": "x"}
+        )
+        record["metadata"]["createdDate"] = old
+        self.server.records[zone_id][record["id"]] = record
+
+        result = sweeper.sweep(self.client, 3600, zone_names=["a.de", "A.de."], now=now)
+
+        self.assertEqual(result.zones, 1)
+        self.assertEqual({r.zone_name for r in result.deleted}, {"a.de"})
+        self.assertEqual(len(self.server.records[zone_id]), 1)
+
+    def test_main_prints_summary(self):
+        path = os.path.join(self.tempdir, "credentials.ini")
+        dns_test_common.write({"dns_ionos_cloud_token": "test_token"}, path)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            code = sweeper.main(
+                [
+                    "--credentials",
+                    path,
+                    "--endpoint",
+                    self.server.url,
+                    "--older-than",
+                    "0",
+                ]
+            )
+
+        self.assertEqual(code, 0)
+        self.assertIn(
+            "Deleted 4 stale records in 2 of 2 zones", output.getvalue().splitlines()
+        )
+
+    def test_main_sweeps_each_zone_with_its_token(self):
+        path = os.path.join(self.tempdir, "credentials.ini")
+        dns_test_common.write(
+            {
+                "dns_ionos_cloud_token": "test_token",
+                "dns_ionos_cloud_token_b": "b_token",
+                "dns_ionos_cloud_zones_b": "b.de",
+                "dns_ionos_cloud_endpoint": self.server.url,
+            },
+            path,
+        )
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            code = sweeper.main(["--credentials", path, "--older-than", "0"])
+
+        self.assertEqual(code, 0)
+        self.assertIn(
+            "Deleted 4 stale records in 2 of 2 zones", output.getvalue().splitlines()
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
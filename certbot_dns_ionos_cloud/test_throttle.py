@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import patch
+
+from certbot_dns_ionos_cloud import throttle
+
+
+class TestTokenBucket(unittest.TestCase):
+    @patch("time.sleep")
+    @patch("time.monotonic", return_value=100.0)
+    def test_waits_once_burst_is_used(self, unused_mock_monotonic, mock_sleep):
+        bucket = throttle.TokenBucket(rate=2, burst=2)
+
+        self.assertEqual(bucket.acquire(), 0)
+        self.assertEqual(bucket.acquire(), 0)
+        self.assertEqual(bucket.acquire(), 0.5)
+        self.assertEqual(bucket.acquire(), 1.0)
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list], [0.5, 1.0])
+
+    @patch("time.sleep")
+    def test_tokens_refill_over_time(self, mock_sleep):
+        with patch("time.monotonic", return_value=100.0):
+            bucket = throttle.TokenBucket(rate=1, burst=1)
+            bucket.acquire()
+        with patch("time.monotonic", return_value=101.0):
+            self.assertEqual(bucket.acquire(), 0)
+        mock_sleep.assert_not_called()
+
+
+class TestBackoff(unittest.TestCase):
+    def test_retry_after_wins(self):
+        self.assertEqual(throttle.backoff_delay(3, retry_after=2.0), 2.0)
+        self.assertEqual(
+            throttle.backoff_delay(0, retry_after=1000.0), throttle.RETRY_AFTER_MAX
+        )
+
+    def test_backoff_grows_with_jitter(self):
+        with patch("random.uniform", side_effect=lambda low, high: high):
+            self.assertEqual(
+                [throttle.backoff_delay(attempt) for attempt in range(8)],
+                [0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 30.0, 30.0],
+            )
+
+    def test_parse_retry_after(self):
+        self.assertEqual(throttle.parse_retry_after("7"), 7.0)
+        self.assertIsNone(throttle.parse_retry_after("soon"))
+        self.assertIsNone(throttle.parse_retry_after(None))
+        with patch("time.time", return_value=784111777.0):
+            self.assertEqual(
+                throttle.parse_retry_after("Sun, 06 Nov 1994 08:49:47 GMT"), 10.0
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
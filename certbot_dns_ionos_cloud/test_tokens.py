@@ -0,0 +1,81 @@
+import os
+import unittest
+
+from certbot import errors
+from certbot.plugins import dns_common, dns_test_common
+from certbot.tests import util as test_util
+
+from certbot_dns_ionos_cloud import tokens
+
+
+class TokenRoutesTest(test_util.TempDirTestCase):
+    def _credentials(self, values):
+        path = os.path.join(self.tempdir, "credentials.ini")
+        dns_test_common.write(values, path)
+        return dns_common.CredentialsConfiguration(
+            path, lambda var: "dns_ionos_cloud_" + var
+        )
+
+    def test_routes_are_read_in_file_order(self):
+        credentials = self._credentials(
+            {
+                "dns_ionos_cloud_token": "default",
+                "dns_ionos_cloud_token_tenant_a": "token-a",
+                "dns_ionos_cloud_zones_tenant_a": "a.example, *.a.test.",
+                "dns_ionos_cloud_token_b": "token-b",
+                "dns_ionos_cloud_zones_b": "B.example",
+            }
+        )
+
+        self.assertEqual(
+            tokens.token_routes(credentials),
+            [
+                tokens.TokenRoute("tenant_a", "token-a", ["a.example", "*.a.test"]),
+                tokens.TokenRoute("b", "token-b", ["b.example"]),
+            ],
+        )
+
+    def test_single_token_has_no_routes(self):
+        credentials = self._credentials({"dns_ionos_cloud_token": "default"})
+
+        self.assertEqual(tokens.token_routes(credentials), [])
+
+    def test_token_without_zones_raises_error(self):
+        credentials = self._credentials(
+            {"dns_ionos_cloud_token": "default", "dns_ionos_cloud_token_a": "token-a"}
+        )
+
+        with self.assertRaises(errors.PluginError):
+            tokens.token_routes(credentials)
+
+    def test_zones_without_token_raise_error(self):
+        credentials = self._credentials(
+            {"dns_ionos_cloud_token": "default", "dns_ionos_cloud_zones_a": "a.example"}
+        )
+
+        with self.assertRaises(errors.PluginError):
+            tokens.token_routes(credentials)
+
+
+class RouteDomainTest(unittest.TestCase):
+    routes = [
+        tokens.TokenRoute("a", "token-a", ["a.example"]),
+        tokens.TokenRoute("b", "token-b", ["*.b.example", "a.example"]),
+    ]
+
+    def test_names_inside_a_zone_are_routed_to_its_token(self):
+        self.assertEqual(tokens.route_domain(self.routes, "www.A.example."), "a")
+
+    def test_first_matching_route_wins(self):
+        self.assertEqual(tokens.route_domain(self.routes, "a.example"), "a")
+
+    def test_wildcard_patterns_match(self):
+        self.assertEqual(tokens.route_domain(self.routes, "x.sub.b.example"), "b")
+        self.assertEqual(tokens.route_domain(self.routes, "b.example"), "default")
+
+    def test_unmatched_domains_use_default_token(self):
+        self.assertEqual(tokens.route_domain(self.routes, "c.example"), "default")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+from certbot.tests import util as test_util
+from certbot_dns_ionos_cloud.zone_cache import ZoneCache
+
+
+class TestZoneCache(test_util.TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tempdir, "zones.json")
+
+    def test_without_ttl_keeps_entries_in_memory_only(self):
+        cache = ZoneCache(self.path)
+        cache.set("example.com", "zone-1", "example.com")
+        cache.save()
+
+        self.assertEqual(cache.get("example.com"), ("zone-1", "example.com"))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_entries_are_shared_through_file(self):
+        cache = ZoneCache(self.path, ttl=60)
+        cache.set("example.com", "zone-1", "example.com")
+        cache.save()
+
+        self.assertEqual(
+            ZoneCache(self.path, ttl=60).get("example.com"), ("zone-1", "example.com")
+        )
+
+    def test_expired_entries_are_ignored(self):
+        with patch("time.time", return_value=1000):
+            cache = ZoneCache(self.path, ttl=60)
+            cache.set("example.com", "zone-1", "example.com")
+            cache.save()
+
+        with patch("time.time", return_value=1061):
+            self.assertIsNone(ZoneCache(self.path, ttl=60).get("example.com"))
+
+    def test_oldest_entries_are_evicted(self):
+        cache = ZoneCache(self.path, ttl=60, max_entries=2)
+        for i, domain in enumerate(["a.com", "b.com", "c.com"]):
+            with patch("time.time", return_value=1000 + i):
+                cache.set(domain, domain, domain)
+        cache.save()
+
+        with open(self.path) as f:
+            self.assertEqual(sorted(json.load(f)), ["b.com", "c.com"])
+
+    def test_invalidate_removes_entry_from_file(self):
+        cache = ZoneCache(self.path, ttl=60)
+        cache.set("example.com", "zone-1", "example.com")
+        cache.save()
+        cache.invalidate("example.com")
+        cache.save()
+
+        self.assertIsNone(ZoneCache(self.path, ttl=60).get("example.com"))
+
+    def test_unreadable_file_is_ignored(self):
+        with open(self.path, "w") as f:
+            f.write("not json")
+
+        self.assertIsNone(ZoneCache(self.path, ttl=60).get("example.com"))
+
+    def test_malformed_file_is_ignored(self):
+        for content in ("[]", "null", '{"example.com": {"id": 1, "name": 2, "ts": "x"}}'):
+            with open(self.path, "w") as f:
+                f.write(content)
+
+            self.assertIsNone(ZoneCache(self.path, ttl=60).get("example.com"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Rate limiting and retry backoff for calls to the IONOS Cloud DNS API."""
+
+import email.utils
+import random
+import threading
+import time
+
+RETRYABLE_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_AFTER_MAX = 120.0
+
+
+class TokenBucket(object):
+    """
+    Limits calls to a steady rate, allowing bursts of up to ``burst`` calls.
+
+    Tokens are handed out in order, so concurrent callers are queued fairly
+    instead of retrying against each other.
+    """
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take a token, sleeping until it is available.
+
+        :returns: The number of seconds waited.
+        :rtype: float
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def reserve(self) -> float:
+        """
+        Take a token without waiting for it, e.g. to wait in an event loop.
+
+        :returns: The number of seconds until the token is available.
+        :rtype: float
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """
+    Compute how long to wait before retrying a call.
+
+    A ``Retry-After`` given by the server wins. Otherwise the delay grows
+    exponentially with the attempt, with full jitter so that parallel
+    clients do not retry in lockstep.
+
+    :param int attempt: The number of retries done so far.
+    :param float retry_after: The delay requested by the server, if any.
+    :returns: The delay in seconds.
+    :rtype: float
+    """
+    if retry_after is not None:
+        return min(retry_after, RETRY_AFTER_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def parse_retry_after(value: object) -> float | None:
+    """
+    Parse a ``Retry-After`` header, given in seconds or as an HTTP date.
+
+    :returns: The delay in seconds, or None if the value is not usable.
+    :rtype: float
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
@@ -0,0 +1,82 @@
+"""Routes zones to one of several IONOS API tokens of a credentials file."""
+
+import fnmatch
+from typing import NamedTuple
+
+from certbot import errors
+from certbot.plugins import dns_common
+
+DEFAULT_LABEL = "default"
+
+
+class TokenRoute(NamedTuple):
+    """A token and the patterns of the zone names it manages."""
+
+    label: str
+    token: str
+    patterns: list[str]
+
+
+def token_routes(credentials: dns_common.CredentialsConfiguration) -> list[TokenRoute]:
+    """
+    Read the extra tokens of a credentials file.
+
+    Besides the default ``token``, the file may hold pairs of ``token_<label>``
+    and ``zones_<label>`` properties. The latter is a comma separated list of
+    shell-style patterns of zone names, e.g. ``example.com, *.example.net``.
+
+    :param credentials: The credentials file.
+    :returns: The routes, in the order of the file.
+    :rtype: list
+    :raises certbot.errors.PluginError: if a token has no zone patterns, or
+    zone patterns have no token.
+    """
+    token_prefix = credentials.mapper("token_")
+    zones_prefix = credentials.mapper("zones_")
+    routes = []
+    for key in credentials.confobj:
+        if key.startswith(zones_prefix):
+            label = key.removeprefix(zones_prefix)
+            if credentials.mapper(f"token_{label}") not in credentials.confobj:
+                raise errors.PluginError(
+                    'Property "{0}" has no matching "{1}" token'.format(
+                        key, credentials.mapper(f"token_{label}")
+                    )
+                )
+        if not key.startswith(token_prefix):
+            continue
+        label = key.removeprefix(token_prefix)
+        token = credentials.conf(f"token_{label}")
+        zones: str | list[str] = credentials.conf(f"zones_{label}") or []
+        if isinstance(zones, str):
+            # configobj only splits values with a comma into lists
+            zones = zones.split(",")
+        patterns = [p.strip().strip(".").lower() for p in zones if p.strip()]
+        if label == DEFAULT_LABEL or not token or not patterns:
+            raise errors.PluginError(
+                'Property "{0}" needs a token and a "{1}" property listing the'
+                " zones it manages".format(key, credentials.mapper(f"zones_{label}"))
+            )
+        routes.append(TokenRoute(label, token, patterns))
+    return routes
+
+
+def route_domain(routes: list[TokenRoute], domain: str) -> str:
+    """
+    Find the token that manages a domain.
+
+    The domain and each of its parents are matched against the patterns, so
+    that a pattern naming a zone also covers the names inside of it. The
+    first matching route wins.
+
+    :param list routes: The routes, as returned by `token_routes`.
+    :param str domain: The domain.
+    :returns: The label of the route, or `DEFAULT_LABEL` if none matches.
+    :rtype: str
+    """
+    guesses = dns_common.base_domain_name_guesses(domain.strip(".").lower())
+    for route in routes:
+        for pattern in route.patterns:
+            if any(fnmatch.fnmatchcase(guess, pattern) for guess in guesses):
+                return route.label
+    return DEFAULT_LABEL
@@ -0,0 +1,125 @@
+"""Zone ID cache for the IONOS Cloud DNS Authenticator."""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class ZoneCache(object):
+    """
+    Maps domains to the ID and name of the zone managing them.
+
+    Entries are always kept in memory for the lifetime of the cache. If a
+    path and a positive TTL are given, entries are also persisted to a JSON
+    file by `save`, so that later certbot runs can skip the zone lookup.
+    The cache may be used from several threads at once.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        ttl: float = 0,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.path = path if ttl > 0 else None
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: dict[str, dict] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if self.path:
+            self._load()
+
+    def get(self, domain: str) -> tuple[str, str] | None:
+        """
+        Get the cached zone for a domain.
+
+        :param str domain: The domain to look up.
+        :returns: The zone ID and name, or None if not cached or expired.
+        :rtype: tuple
+        """
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is None:
+                return None
+            if self.path and entry["ts"] + self.ttl < time.time():
+                del self._entries[domain]
+                return None
+            return entry["id"], entry["name"]
+
+    def set(self, domain: str, zone_id: str, zone_name: str) -> None:
+        """
+        Cache the zone of a domain.
+
+        :param str domain: The domain.
+        :param str zone_id: The ID of the zone managing the domain.
+        :param str zone_name: The name of the zone managing the domain.
+        """
+        with self._lock:
+            self._entries[domain] = {"id": zone_id, "name": zone_name, "ts": time.time()}
+            self._evict()
+            self._dirty = True
+
+    def invalidate(self, domain: str) -> None:
+        """
+        Drop the cached zone of a domain, e.g. because it went stale.
+
+        :param str domain: The domain.
+        """
+        with self._lock:
+            if self._entries.pop(domain, None) is not None:
+                self._dirty = True
+
+    def _evict(self) -> None:
+        overflow = len(self._entries) - self.max_entries
+        if overflow > 0:
+            oldest = sorted(self._entries, key=lambda d: self._entries[d]["ts"])
+            for domain in oldest[:overflow]:
+                del self._entries[domain]
+
+    def _load(self) -> None:
+        assert self.path
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable zone cache %s: %s", self.path, e)
+            return
+        if not isinstance(entries, dict):
+            logger.warning("Ignoring malformed zone cache %s", self.path)
+            return
+
+        now = time.time()
+        for domain, entry in entries.items():
+            if (
+                isinstance(entry, dict)
+                and {"id", "name", "ts"} <= entry.keys()
+                and isinstance(entry["ts"], (int, float))
+                and entry["ts"] + self.ttl >= now
+            ):
+                self._entries[domain] = entry
+        self._evict()
+
+    def save(self) -> None:
+        """Write the entries to the cache file, if they changed."""
+        if not self.path or not self._dirty:
+            return
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".zone-cache")
+            with os.fdopen(fd, "w") as f, self._lock:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning("Could not write zone cache %s: %s", self.path, e)
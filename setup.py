@@ -45,10 +45,15 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=install_requires,
+    extras_require={"async": ["httpx[http2]"]},
     entry_points={
         "certbot.plugins": [
             "dns-ionos-cloud = certbot_dns_ionos_cloud.ionos:Authenticator"
-        ]
+        ],
+        "console_scripts": [
+            "certbot-dns-ionos-cloud-sweep = certbot_dns_ionos_cloud.sweeper:main",
+            "certbot-dns-ionos-cloud-hook = certbot_dns_ionos_cloud.hook:main",
+        ],
     },
     test_suite="certbot-dns-ionos-cloud",
 )
\ No newline at end of file